@@ -0,0 +1,298 @@
+from collections import Counter
+from datetime import timedelta
+
+from App import constants
+from App.indexes import TimestampIndex, PerformanceIndex
+from App.helpers import format_timedelta, format_percentage, parse_timestamp, current_timestamp, \
+    timestamp_month_index, month_range, month_labels, cumulate_counts, rank_category_counts, format_time_percentiles, \
+    top_n_by_key
+from App.sketches import QuantileSketch, QUANTILE_SKETCH_SIZE
+
+# Default number of claims kept in the 'last five unclosed/closed claims' lists, and the key they are sorted on.
+LAST_CLAIMS_COUNT = 5
+LAST_CLAIMS_KEY = constants.ID
+
+# Number of claims received between two selections of the last claims lists.
+LAST_CLAIMS_BATCH = 1024
+
+
+class DashboardAggregator:
+    """
+    Single-pass aggregation engine computing every dashboard statistic from the upstream payload.
+
+    Parameters:
+        performance_hours_offset (int): The offset in hours for performance calculations.
+        total_employees (int): The total number of employees configured.
+        top_categories (int or None): The number of categories of the categories rankings. Default is None,
+                                      which ranks all the categories.
+        last_claims_count (int): The number of claims of the last unclosed and closed claims lists. Default is 5.
+        last_claims_key (str): The key the last claims are selected on, highest first. Default is 'id'.
+        now (int): The reference UTC timestamp of the performance window, in microseconds since the epoch.
+                   Default is the current timestamp.
+        months (range): The month indexes of the bar and line charts, as returned by 'helpers.month_range'.
+                        Default is the current year, from January up to the current month.
+        performance_offsets (iterable): The offsets in hours of the performance curve. Default is no curve.
+        distinct_counter (callable): The factory of the distinct counters of the activated employees and units,
+                                     e.g. a HyperLogLog sketch factory (see 'App.sketches'). Default is 'set',
+                                     which counts exactly.
+        time_percentiles (iterable): The percentiles of the response and ending times (e.g. 50, 90, 99). Default
+                                     is no percentile.
+        sketch_size (int): The size 'k' of the quantile sketches of the response and ending times. Default is 200.
+
+    The aggregator walks the claims and users of the payload exactly once. Each record updates
+    every statistic it contributes to (activation counts, mean times, category occurrences,
+    monthly buckets, performance timestamps, time sketches and last claims lists), so no filtered copy of the
+    claims list is ever built. Each date-time of a claim is parsed once into a UTC timestamp,
+    shared by all the statistics using it.
+
+    The 'result()' method returns the dictionary rendered by the dashboard template, with the
+    same keys and values as the per-statistic functions of the 'services' module.
+    """
+
+    def __init__(self, performance_hours_offset, total_employees, top_categories=None,
+                 last_claims_count=LAST_CLAIMS_COUNT, last_claims_key=LAST_CLAIMS_KEY, now=None, months=None,
+                 performance_offsets=(), distinct_counter=set, time_percentiles=(),
+                 sketch_size=QUANTILE_SKETCH_SIZE):
+        self.performance_hours_offset = performance_hours_offset
+        self.total_employees = total_employees
+        self.top_categories = top_categories
+        self.last_claims_count = last_claims_count
+        self.last_claims_key = last_claims_key
+
+        # Performance windows: [now - offset, now].
+        self.now = now if now is not None else current_timestamp()
+        self.performance_offsets = performance_offsets
+        self.months = months if months is not None else month_range()
+
+        # Claims counters.
+        self.published_count = 0
+        self.closed_count = 0
+
+        # Publish dates of the published claims and close dates of the closed claims, indexed by 'result()'.
+        self.publish_timestamps = []
+        self.close_timestamps = []
+
+        # Distinct employees having published a claim and distinct departments of the users.
+        self.employees = distinct_counter()
+        self.units = distinct_counter()
+
+        # Summed durations used by the mean response and ending times, in microseconds.
+        self.response_time_total = 0
+        self.started_count = 0
+        self.ending_time_total = 0
+        self.ended_count = 0
+
+        # Quantile sketches of the response and ending times, in microseconds.
+        self.time_percentiles = time_percentiles
+        self.response_time_sketch = QuantileSketch(sketch_size)
+        self.ending_time_sketch = QuantileSketch(sketch_size)
+
+        # Occurrences of each category among published and closed claims.
+        self.opened_category_counts = Counter()
+        self.closed_category_counts = Counter()
+
+        # Published claims counted by month index (year and month) of the publish date.
+        self.monthly_counts = Counter()
+
+        # Candidates of the last claims lists: the claims selected so far, followed by the claims received since.
+        self.last_unclosed_claims = []
+        self.last_closed_claims = []
+
+        self.categories = []
+        self.total_units = 0
+
+    def feed(self, data):
+        """
+        Feed the whole upstream payload to the aggregator.
+
+        Parameters:
+            data (dict): The JSON payload returned by the API, containing claims, users,
+                         categories and departments.
+
+        Returns:
+            DashboardAggregator: The aggregator itself, to allow chaining with 'result()'.
+        """
+        for claim in data[constants.CLAIMS]:
+            self.add_claim(claim)
+
+        for user in data[constants.USERS]:
+            self.add_user(user)
+
+        self.categories = data[constants.CATEGORIES]
+        self.total_units = len(data[constants.DEPARTMENTS])
+
+        return self
+
+    def feed_records(self, records):
+        """
+        Feed the payload to the aggregator record by record.
+
+        Parameters:
+            records (iterable): (resource, record) tuples, e.g. ('claims', {...}), as yielded by
+                                'repositories.stream_records_from_api()'.
+
+        Returns:
+            DashboardAggregator: The aggregator itself, to allow chaining with 'result()'.
+
+        The records are not kept, except the last claims lists and the categories, so the payload can be
+        streamed without being held in memory.
+        """
+        for resource, record in records:
+            self.add_record(resource, record)
+
+        return self
+
+    def add_record(self, resource, record):
+        """
+        Update the statistics with a single record of the payload.
+
+        Parameters:
+            resource (str): The resource of the record: 'claims', 'users', 'categories' or 'departments'.
+            record (dict): The record.
+        """
+        if resource == constants.CLAIMS:
+            self.add_claim(record)
+        elif resource == constants.USERS:
+            self.add_user(record)
+        elif resource == constants.CATEGORIES:
+            self.categories.append(record)
+        elif resource == constants.DEPARTMENTS:
+            self.total_units += 1
+
+    def add_claim(self, claim):
+        """
+        Update every statistic with a single claim.
+
+        Parameters:
+            claim (dict): A dictionary containing claim data.
+        """
+        # Parse the publish date once: it is shared by the mean times, the monthly buckets and the window.
+        publish_date = claim[constants.PUBLISH_DATE]
+        published_at = parse_timestamp(publish_date) if publish_date else None
+
+        # Started and ended claims are not required to be published.
+        if claim[constants.START_DATE]:
+            response_time = parse_timestamp(claim[constants.START_DATE]) - published_at
+            self.response_time_total += response_time
+            self.started_count += 1
+            self.response_time_sketch.add(response_time)
+
+        if claim[constants.END_DATE]:
+            ending_time = parse_timestamp(claim[constants.END_DATE]) - published_at
+            self.ending_time_total += ending_time
+            self.ended_count += 1
+            self.ending_time_sketch.add(ending_time)
+
+        if not publish_date:
+            return
+
+        self.published_count += 1
+        self.employees.add(claim[constants.EMPLOYEE])
+        self.opened_category_counts[claim[constants.CATEGORY]] += 1
+        self.monthly_counts[timestamp_month_index(published_at)] += 1
+
+        self.publish_timestamps.append(published_at)
+
+        if claim[constants.CLOSE]:
+            self.closed_count += 1
+            self.closed_category_counts[claim[constants.CATEGORY]] += 1
+
+            self.close_timestamps.append(parse_timestamp(claim[constants.CLOSE_DATE]))
+            self._push_last_claim(self.last_closed_claims, claim)
+        else:
+            self._push_last_claim(self.last_unclosed_claims, claim)
+
+    def add_user(self, user):
+        """
+        Update the activated units with a single user.
+
+        Parameters:
+            user (dict): A dictionary containing user data.
+        """
+        self.units.add(user[constants.DEPARTMENT])
+
+    def result(self):
+        """
+        Build the dashboard statistics from the aggregated values.
+
+        Returns:
+            dict: A dictionary containing all the statistics rendered by the dashboard.
+        """
+        activated_employees = len(self.employees)
+        most_opened_claim_category = self._most_occurred_category(self.opened_category_counts, self.published_count)
+        most_closed_claim_category = self._most_occurred_category(self.closed_category_counts, self.closed_count)
+
+        # Only the months of the charts range are displayed, the line chart being the running total of the bars.
+        month_keys = month_labels(self.months)
+        monthly_counts = [self.monthly_counts[index] for index in self.months]
+        grouped_data = dict(zip(month_keys, monthly_counts))
+        cumulated_data = dict(zip(month_keys, cumulate_counts(monthly_counts)))
+
+        # Every performance window is answered with binary searches over the sorted timestamps.
+        performance_index = PerformanceIndex(TimestampIndex(self.publish_timestamps),
+                                             TimestampIndex(self.close_timestamps))
+
+        return {
+            'activated_employees': activated_employees,
+            'activated_employees_percentage': self._percentage(activated_employees, self.total_employees),
+            'total_employees': self.total_employees,
+            'activated_units': self._activated_units(),
+            'activated_units_percentage': self._activated_units_percentage(),
+            'total_units': self.total_units,
+            'mean_response_time': self._mean_time(self.response_time_total, self.started_count),
+            'mean_ending_time': self._mean_time(self.ending_time_total, self.ended_count),
+            'response_time_percentiles': format_time_percentiles(self.response_time_sketch, self.time_percentiles),
+            'ending_time_percentiles': format_time_percentiles(self.ending_time_sketch, self.time_percentiles),
+            'most_opened_claim_category': most_opened_claim_category['category']['name'],
+            'most_opened_claim_category_times': most_opened_claim_category['times'],
+            'last_five_unclosed_claims': self._sorted_last_claims(self.last_unclosed_claims),
+            'most_closed_claim_category': most_closed_claim_category['category']['name'],
+            'most_closed_claim_category_times': most_closed_claim_category['times'],
+            'last_five_closed_claims': self._sorted_last_claims(self.last_closed_claims),
+            'opened_categories_ranking': rank_category_counts(self.opened_category_counts, self.categories,
+                                                              self.top_categories, others=True),
+            'closed_categories_ranking': rank_category_counts(self.closed_category_counts, self.categories,
+                                                              self.top_categories, others=True),
+            'performance': performance_index.performance(self.performance_hours_offset, self.now),
+            'performance_curve': performance_index.curve(self.performance_offsets, self.now),
+            'bar_chart': {'data': list(grouped_data.values()), 'labels': list(grouped_data.keys())},
+            'line_chart': {'data': list(cumulated_data.values()), 'labels': list(cumulated_data.keys())}
+        }
+
+    def _push_last_claim(self, candidates, claim):
+        # The candidates are narrowed down to the last claims once per batch, so they stay bounded. The selection
+        # keeps the first received claim when two claims share the same key, like the stable sort of 'sort_by_key'.
+        candidates.append(claim)
+        if len(candidates) >= self.last_claims_count + LAST_CLAIMS_BATCH:
+            candidates[:] = self._sorted_last_claims(candidates)
+
+    def _sorted_last_claims(self, candidates):
+        return top_n_by_key(candidates, self.last_claims_count, self.last_claims_key)
+
+    def _most_occurred_category(self, category_counts, claims_count):
+        if not (claims_count and self.categories):
+            return {'category': {'name': 'No Category Found'}, 'times': -1}
+
+        ranking = rank_category_counts(category_counts, self.categories, k=1)
+        if not ranking:
+            return {'category': {}, 'times': 0}
+
+        return {'category': ranking[0]['category'], 'times': ranking[0]['times']}
+
+    def _activated_units(self):
+        return len(self.units) if self.total_units > 0 else self.total_units
+
+    def _activated_units_percentage(self):
+        if self.total_units > 0:
+            return self._percentage(len(self.units), self.total_units)
+        return f"{self.total_units}%"
+
+    @staticmethod
+    def _mean_time(total, count):
+        if not count:
+            return format_timedelta(timedelta())
+        return format_timedelta(timedelta(microseconds=total) / count)
+
+    @staticmethod
+    def _percentage(number, total):
+        return str(format_percentage((number / total) * 100)) + "%"
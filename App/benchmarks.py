@@ -0,0 +1,307 @@
+import gc
+import time
+import tracemalloc
+from collections import deque
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.test import override_settings
+
+from App import constants, helpers, repositories, services
+from App.sketches import QuantileSketch
+from App.synthetic import synthetic_payload, iter_synthetic_records
+from App.tables import compact_records
+
+# Number of days counted by the benchmarks of the date ranges.
+RANGE_DAYS = 30
+
+# Largest payload held in memory by the benchmarks of 'BENCHMARKS', about 1 GiB per million claims. The benchmarks
+# of 'STREAMED_BENCHMARKS' consume the records one by one, and run at any size.
+MAX_PAYLOAD_CLAIMS = 1_000_000
+
+# Statistics recomputed by the benchmark of 'recompute_configuration_statistics'.
+CONFIGURATION_KEYS = {'total_employees', 'activated_employees_percentage', 'performance'}
+
+
+class BenchmarkInputs:
+    """
+    Arguments of the benchmarked functions, derived once from a synthetic payload so that the benchmarks only
+    time the functions themselves.
+
+    Parameters:
+        data (dict): The payload, see 'synthetic.synthetic_payload()'.
+        config (Configuration): The configuration of the dashboard.
+    """
+
+    def __init__(self, data, config):
+        self.data = data
+        self.config = config
+        self.claims = data[constants.CLAIMS]
+        self.categories = data[constants.CATEGORIES]
+        self.users = data[constants.USERS]
+        self.total_units = len(data[constants.DEPARTMENTS])
+        self.published = [claim for claim in self.claims if claim[constants.PUBLISH_DATE]]
+        self.closed = [claim for claim in self.published if claim[constants.CLOSE]]
+        self.started = [claim for claim in self.claims if claim[constants.START_DATE]]
+
+        self.now = helpers.current_timestamp()
+        self.range_start = self.now - RANGE_DAYS * helpers.MICROSECONDS_PER_DAY
+        self.publish_timestamps = [helpers.parse_timestamp(claim[constants.PUBLISH_DATE]) for claim in self.published]
+        self.publish_datetimes = [helpers.timestamp_to_datetime(timestamp) for timestamp in self.publish_timestamps]
+        self.month_indexes = [helpers.timestamp_month_index(timestamp) for timestamp in self.publish_timestamps]
+        self.months = helpers.month_range()
+        self.response_times = [helpers.parse_timestamp(claim[constants.START_DATE])
+                               - helpers.parse_timestamp(claim[constants.PUBLISH_DATE]) for claim in self.started]
+        self.response_time_sketch = QuantileSketch(settings.QUANTILE_SKETCH_SIZE)
+        self.response_time_sketch.update(self.response_times)
+        self.category_counts = services.count_claims_by_category(self.published)
+
+    def cached_payload(self):
+        """
+        Store a copy of the payload in the payload cache, so the indexes built per payload are built again.
+        """
+        repositories.set_cached_data(dict(self.data))
+
+
+class StreamedInputs:
+    """
+    Arguments of the streamed benchmarks: the synthetic records of a payload, generated again for each call
+    instead of being held in memory.
+
+    Parameters:
+        claims_count (int): The number of claims of the payload.
+        config (Configuration): The configuration of the dashboard.
+        seed (int): The seed of the synthetic records. Default is 0.
+    """
+
+    def __init__(self, claims_count, config, seed=0):
+        self.claims_count = claims_count
+        self.config = config
+        self.seed = seed
+        # The same records are generated for each call.
+        self.now = helpers.current_timestamp()
+        self._compact_payload = None
+
+    def records(self):
+        """
+        Return a new iterator over the records of the payload, see 'synthetic.iter_synthetic_records()'.
+        """
+        return iter_synthetic_records(self.claims_count, self.seed, self.now)
+
+    def compact_payload(self):
+        """
+        Return the compact form of the payload (see 'tables.compact_records()'), built on the first call.
+        """
+        if self._compact_payload is None:
+            self._compact_payload = compact_records(self.records())
+        return self._compact_payload
+
+
+# Benchmarked functions of the 'services' and 'helpers' modules, called with the inputs of a payload. The helpers
+# working on a single value are called once per claim, so their throughput is comparable to the other functions.
+BENCHMARKS = {
+    'services.dashboard_data': lambda inputs: (inputs.cached_payload(), services.dashboard_data()),
+    'services.alatest_dashboard_data': lambda inputs: (
+        inputs.cached_payload(), async_to_sync(services.alatest_dashboard_data)()),
+    'services.aggregate_dashboard_data': lambda inputs: services.aggregate_dashboard_data(inputs.data, inputs.config),
+    'services.range_dashboard_data': lambda inputs: (
+        inputs.cached_payload(), services.range_dashboard_data(inputs.range_start, inputs.now)),
+    'services.recent_claims_page': lambda inputs: (inputs.cached_payload(), services.recent_claims_page('closed', 1)),
+    'services.get_recent_claims_index': lambda inputs: services.get_recent_claims_index(dict(inputs.data)),
+    'services.get_claims_range_index': lambda inputs: services.get_claims_range_index(dict(inputs.data)),
+    'services.recompute_configuration_statistics': lambda inputs: (
+        inputs.cached_payload(), services.recompute_configuration_statistics(
+            {'activated_employees': len(inputs.users)}, inputs.config, CONFIGURATION_KEYS)),
+    'services.configuration_dependent_statistics': lambda inputs: services.configuration_dependent_statistics(
+        inputs.config, inputs.config),
+    'services.create_dashboard_aggregator': lambda inputs: services.create_dashboard_aggregator(inputs.config),
+    'services.dashboard_fake_data': lambda inputs: services.dashboard_fake_data(),
+    'services.collect_metrics': lambda inputs: services.collect_metrics(),
+    'services.time_percentiles': lambda inputs: services.time_percentiles(inputs.response_times),
+    'services.count_activated_employees': lambda inputs: services.count_activated_employees(
+        inputs.published, inputs.config.total_employees),
+    'services.group_activated_employees': lambda inputs: services.group_activated_employees(
+        inputs.published, lambda claim: claim[constants.CATEGORY]),
+    'services.count_activated_units': lambda inputs: services.count_activated_units(inputs.users, inputs.total_units),
+    'services.find_most_occurred_claim_category': lambda inputs: services.find_most_occurred_claim_category(
+        inputs.published, inputs.categories),
+    'services.count_claims_by_category': lambda inputs: services.count_claims_by_category(inputs.published),
+    'services.rank_claim_categories': lambda inputs: services.rank_claim_categories(
+        inputs.published, inputs.categories, settings.DASHBOARD_TOP_CATEGORIES, others=True),
+    'services.calculate_best_performances_by_hours': lambda inputs: services.calculate_best_performances_by_hours(
+        inputs.closed, inputs.published, inputs.config.performance_hours_offset),
+    'services.calculate_performance_curve': lambda inputs: services.calculate_performance_curve(
+        inputs.closed, inputs.published, settings.DASHBOARD_PERFORMANCE_OFFSETS),
+    'services.count_claims_between': lambda inputs: services.count_claims_between(
+        inputs.closed, constants.CLOSE_DATE, inputs.range_start, inputs.now),
+    'services.group_claims_by_publish_date': lambda inputs: services.group_claims_by_publish_date(inputs.published),
+    'services.group_claims_by_publish_date_cumuli': lambda inputs: services.group_claims_by_publish_date_cumuli(
+        inputs.published),
+
+    'helpers.parse_timestamp': lambda inputs: [
+        helpers.parse_timestamp(claim[constants.PUBLISH_DATE]) for claim in inputs.published],
+    'helpers.parse_string_datetime': lambda inputs: [
+        helpers.parse_string_datetime(claim[constants.PUBLISH_DATE]) for claim in inputs.published],
+    'helpers.parse_date_range': lambda inputs: [
+        helpers.parse_date_range(claim[constants.PUBLISH_DATE], None) for claim in inputs.published],
+    'helpers.calculate_delta_datetime': lambda inputs: [
+        helpers.calculate_delta_datetime(claim[constants.PUBLISH_DATE], claim[constants.START_DATE])
+        for claim in inputs.started],
+    'helpers.calculate_mean_multiple_delta_datetime': lambda inputs: helpers.calculate_mean_multiple_delta_datetime(
+        inputs.started, constants.PUBLISH_DATE, constants.START_DATE),
+    'helpers.calculate_mean_multiple_delta_datetime_formatted': lambda inputs: (
+        helpers.calculate_mean_multiple_delta_datetime_formatted(
+            inputs.started, constants.PUBLISH_DATE, constants.START_DATE)),
+    'helpers.current_timestamp': lambda inputs: [helpers.current_timestamp() for _ in inputs.claims],
+    'helpers.timestamp_to_datetime': lambda inputs: [
+        helpers.timestamp_to_datetime(timestamp) for timestamp in inputs.publish_timestamps],
+    'helpers.format_timestamp': lambda inputs: [
+        helpers.format_timestamp(timestamp) for timestamp in inputs.publish_timestamps],
+    'helpers.timestamp_month': lambda inputs: [
+        helpers.timestamp_month(timestamp) for timestamp in inputs.publish_timestamps],
+    'helpers.timestamp_month_index': lambda inputs: [
+        helpers.timestamp_month_index(timestamp) for timestamp in inputs.publish_timestamps],
+    'helpers.sub_hours_from_datetime': lambda inputs: [
+        helpers.sub_hours_from_datetime(date, inputs.config.performance_hours_offset)
+        for date in inputs.publish_datetimes],
+    'helpers.is_datetime_between': lambda inputs: [
+        helpers.is_datetime_between(date, inputs.publish_datetimes[0], inputs.publish_datetimes[-1])
+        for date in inputs.publish_datetimes],
+    'helpers.format_timedelta': lambda inputs: [
+        helpers.format_timedelta(timedelta(microseconds=duration)) for duration in inputs.response_times],
+    'helpers.format_time_percentiles': lambda inputs: helpers.format_time_percentiles(
+        inputs.response_time_sketch, settings.DASHBOARD_TIME_PERCENTILES),
+    'helpers.format_percentage': lambda inputs: [
+        helpers.format_percentage(claim[constants.ID] / len(inputs.claims) * 100) for claim in inputs.claims],
+    'helpers.sort_by_key': lambda inputs: helpers.sort_by_key(inputs.published),
+    'helpers.top_n_by_key': lambda inputs: helpers.top_n_by_key(inputs.published),
+    'helpers.month_index': lambda inputs: [
+        helpers.month_index(date.year, date.month) for date in inputs.publish_datetimes],
+    'helpers.month_index_timestamp': lambda inputs: [
+        helpers.month_index_timestamp(index) for index in inputs.month_indexes],
+    'helpers.month_index_date': lambda inputs: [helpers.month_index_date(index) for index in inputs.month_indexes],
+    'helpers.month_range': lambda inputs: [
+        helpers.month_range(timestamp, inputs.now) for timestamp in inputs.publish_timestamps],
+    'helpers.month_labels': lambda inputs: [helpers.month_labels(inputs.months) for _ in inputs.claims],
+    'helpers.current_year_month_keys': lambda inputs: [helpers.current_year_month_keys() for _ in inputs.claims],
+    'helpers.count_timestamps_by_month': lambda inputs: helpers.count_timestamps_by_month(
+        inputs.publish_timestamps, inputs.months),
+    'helpers.cumulate_counts': lambda inputs: helpers.cumulate_counts(inputs.month_indexes),
+    'helpers.group_data_by_month': lambda inputs: helpers.group_data_by_month(inputs.published,
+                                                                              constants.PUBLISH_DATE),
+    'helpers.rank_category_counts': lambda inputs: helpers.rank_category_counts(
+        inputs.category_counts, inputs.categories, settings.DASHBOARD_TOP_CATEGORIES, others=True),
+}
+
+# Benchmarks consuming the synthetic records one by one, called with the StreamedInputs of a payload. Their times
+# include the generation of the records, timed alone by 'synthetic.iter_synthetic_records'.
+STREAMED_BENCHMARKS = {
+    'synthetic.iter_synthetic_records': lambda inputs: deque(inputs.records(), maxlen=0),
+    'services.stream_dashboard_data': lambda inputs: services.stream_dashboard_data(inputs.config, inputs.records()),
+    'tables.compact_records': lambda inputs: compact_records(inputs.records()),
+    'services.table_dashboard_data': lambda inputs: services.table_dashboard_data(
+        inputs.compact_payload()[constants.CLAIMS], inputs.compact_payload()[constants.CATEGORIES],
+        len(inputs.compact_payload()[constants.DEPARTMENTS]), inputs.config),
+}
+
+# Streamed benchmarks reading the compact payload, which is built before they are timed.
+COMPACT_BENCHMARKS = {'services.table_dashboard_data'}
+
+# Functions of the 'services' module which are not benchmarked, and why.
+EXCLUDED = {
+    'services.adashboard_data': "Asynchronous counterpart of 'dashboard_data', with the same computation.",
+    'services.refresh_dashboard_snapshot': "Fetches the payload from the API.",
+    'services.stored_dashboard_data': "Reads the claims synchronized by 'sync_claims' from the database.",
+    'services.refresh_configuration_statistics': "Saves a snapshot; its computation is benchmarked by "
+                                                 "'recompute_configuration_statistics'.",
+    'services.init_configuration_form': "Builds the configuration form, whatever the size of the payload.",
+    'services.save_or_update_configuration': "Handles the configuration form, whatever the size of the payload.",
+}
+
+
+def run_benchmark(function, inputs, repeat=3):
+    """
+    Time a benchmarked function and measure its peak memory.
+
+    Parameters:
+        function (callable): The function, called with the inputs.
+        inputs (BenchmarkInputs or StreamedInputs): The inputs of the payload.
+        repeat (int): The number of timed calls. Default is 3.
+
+    Returns:
+        tuple: The (seconds, peak bytes) of the function: the fastest of the timed calls, and the highest memory
+               allocated during an additional call on top of the memory allocated before it.
+
+    The memory is traced with 'tracemalloc' during a separate call, since tracing slows down the allocations.
+    """
+    seconds = None
+    for _ in range(repeat):
+        gc.collect()
+        started_at = time.perf_counter()
+        function(inputs)
+        elapsed = time.perf_counter() - started_at
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        function(inputs)
+        peak_bytes = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+    return seconds, peak_bytes
+
+
+def run_benchmarks(sizes, config, names=None, repeat=3, seed=0):
+    """
+    Benchmark the functions of the 'services' and 'helpers' modules on synthetic payloads of several sizes.
+
+    Parameters:
+        sizes (iterable): The numbers of claims of the payloads.
+        config (Configuration): The configuration of the dashboard, saved so the functions reading it find it.
+        names (iterable): The names of the benchmarks to run, see 'BENCHMARKS' and 'STREAMED_BENCHMARKS'. Default
+                          is every benchmark.
+        repeat (int): The number of timed calls of each function. Default is 3.
+        seed (int): The seed of the synthetic payloads. Default is 0.
+
+    Yields:
+        dict: The 'function', the number of 'claims' of the payload, the 'seconds' of the fastest call, the
+              'claims_per_second' and the 'peak_memory' in bytes, for each function and size.
+
+    The payload of each size is generated once, before its first benchmark of 'BENCHMARKS', and stored in the
+    payload cache, so the functions reading the payload or the configuration never call the API. The cache is
+    cleared at the end. Above 'MAX_PAYLOAD_CLAIMS' claims, the payload would not fit in memory: only the
+    benchmarks of 'STREAMED_BENCHMARKS' run.
+    """
+    names = [*BENCHMARKS, *STREAMED_BENCHMARKS] if names is None else list(names)
+    # The dashboard is computed from the cached payload, never from a snapshot or from the local store.
+    with override_settings(DASHBOARD_SOURCE='api', UPSTREAM_CACHE_TTL=365 * 24 * 3600, DASHBOARD_SNAPSHOT_MAX_AGE=-1):
+        try:
+            for size in sizes:
+                streamed_inputs = StreamedInputs(size, config, seed)
+                inputs = None
+                for name in names:
+                    if name in STREAMED_BENCHMARKS:
+                        function, function_inputs = STREAMED_BENCHMARKS[name], streamed_inputs
+                        if name in COMPACT_BENCHMARKS:
+                            streamed_inputs.compact_payload()
+                    elif size > MAX_PAYLOAD_CLAIMS:
+                        continue
+                    else:
+                        if inputs is None:
+                            inputs = BenchmarkInputs(synthetic_payload(size, seed), config)
+                        function, function_inputs = BENCHMARKS[name], inputs
+
+                    seconds, peak_bytes = run_benchmark(function, function_inputs, repeat)
+                    yield {
+                        'function': name,
+                        'claims': size,
+                        'seconds': seconds,
+                        'claims_per_second': size / seconds if seconds else None,
+                        'peak_memory': peak_bytes,
+                    }
+        finally:
+            repositories.clear_cached_data()
@@ -0,0 +1,162 @@
+import asyncio
+import threading
+import time
+import uuid
+
+from django.core.cache import cache
+
+# Delay in seconds between two reads of the shared cache while waiting for another worker.
+SHARED_POLL_INTERVAL = 0.05
+
+_MISSING = object()
+
+
+class _Call:
+    """
+    An in-flight call of a 'SingleFlight' group, shared by the caller running it and the callers waiting for it.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls sharing the same key into a single execution.
+
+    The first caller of a key runs the function, and the callers arriving while it runs wait for it and
+    receive the same result (or the same exception) instead of running the function again. Once the call
+    is over, the next caller of the key runs the function again: results are not cached.
+
+    Calls can also be coalesced across the worker processes sharing the default Django cache, by passing a
+    'shared_timeout' to 'do()'.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, shared_timeout=0):
+        """
+        Run 'fn', or wait for the in-flight call of the same key and return its result.
+
+        Parameters:
+            key (str): The key identifying the calls to coalesce.
+            fn (callable): The function to run, without arguments.
+            shared_timeout (float): If greater than 0, the maximum number of seconds to wait for another
+                                    worker process running the same key. Default is 0 (in-process only).
+
+        Returns:
+            The result of 'fn'.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+
+        if not is_leader:
+            # Wait for the leader and share its outcome.
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if shared_timeout > 0:
+                call.result = _do_shared(key, fn, shared_timeout)
+            else:
+                call.result = fn()
+            return call.result
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """
+    Coalesce concurrent coroutine calls sharing the same key into a single execution, like 'SingleFlight'.
+
+    The waiting callers await the future of the in-flight call instead of blocking a thread, so an event
+    loop keeps serving other requests while a call is running. Calls are coalesced per event loop.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, fn):
+        """
+        Await 'fn()', or the in-flight call of the same key, and return its result.
+
+        Parameters:
+            key (str): The key identifying the calls to coalesce.
+            fn (callable): The coroutine function to run, without arguments.
+
+        Returns:
+            The result of 'fn()'.
+        """
+        loop = asyncio.get_running_loop()
+        future = self._calls.get((loop, key))
+
+        if future is not None:
+            # Shielded, so a cancelled waiter does not cancel the call of the other callers.
+            return await asyncio.shield(future)
+
+        future = self._calls[(loop, key)] = loop.create_future()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as error:
+            future.set_exception(error)
+            # Mark the exception as retrieved when no other caller was waiting for it.
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._calls[(loop, key)]
+
+
+def _do_shared(key, fn, timeout):
+    """
+    Coalesce a call across the worker processes sharing the default cache.
+
+    The worker adding the lock key runs 'fn' and publishes its result under a key tagged with a flight token,
+    the other workers poll that key until the result shows up, the lock is released or 'timeout' expires.
+    A worker which did not get the result runs 'fn' itself.
+    """
+    lock_key = f'single_flight:{key}:lock'
+    token = uuid.uuid4().hex
+
+    if cache.add(lock_key, token, timeout):
+        try:
+            result = fn()
+            cache.set(f'single_flight:{key}:{token}', result, timeout)
+            return result
+        finally:
+            cache.delete(lock_key)
+
+    leader_token = cache.get(lock_key)
+    deadline = time.monotonic() + timeout
+    while leader_token is not None and time.monotonic() < deadline:
+        result = cache.get(f'single_flight:{key}:{leader_token}', _MISSING)
+        if result is not _MISSING:
+            return result
+        if cache.get(lock_key) != leader_token:
+            # The leader released the lock: either the result was just published, or the call failed.
+            result = cache.get(f'single_flight:{key}:{leader_token}', _MISSING)
+            if result is not _MISSING:
+                return result
+            break
+        time.sleep(SHARED_POLL_INTERVAL)
+
+    return fn()
@@ -3,7 +3,15 @@ BASE_URL = 'BASE_URL'
 
 DATA = 'data'
 CLAIMS = 'claims'
+USERS = 'users'
+CATEGORIES = 'categories'
+DEPARTMENTS = 'departments'
+ID = 'id'
+CATEGORY = 'category'
+EMPLOYEE = 'employee'
+DEPARTMENT = 'department'
 PUBLISH_DATE = 'publish_date'
 END_DATE = 'end_date'
 START_DATE = 'start_date'
+CLOSE_DATE = 'close_date'
 CLOSE = 'close'
@@ -1,6 +1,31 @@
 import calendar
+import heapq
+import time
+from itertools import accumulate
+from operator import itemgetter
+from datetime import MAXYEAR
+from datetime import date
 from datetime import datetime
 from datetime import timedelta
+from datetime import timezone
+
+from App.timing import timed_function
+
+# Timestamps are handled as integer numbers of microseconds since the UTC epoch.
+MICROSECONDS_PER_SECOND = 1_000_000
+MICROSECONDS_PER_HOUR = 3600 * MICROSECONDS_PER_SECOND
+MICROSECONDS_PER_DAY = 24 * MICROSECONDS_PER_HOUR
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_EPOCH_ORDINAL = _EPOCH.toordinal()
+_ONE_MICROSECOND = timedelta(microseconds=1)
+
+# First and last microseconds representable by 'datetime' (years 1 to 9999), as UTC timestamps.
+_MIN_TIMESTAMP = (datetime.min.replace(tzinfo=timezone.utc) - _EPOCH) // _ONE_MICROSECOND
+_MAX_TIMESTAMP = (datetime.max.replace(tzinfo=timezone.utc) - _EPOCH) // _ONE_MICROSECOND
+
+# Days of a cycle of 400 years of the Gregorian calendar.
+_DAYS_PER_400_YEARS = 146097
 
 
 def sub_hours_from_datetime(datetime_obj, hours_to_sub):
@@ -48,6 +73,100 @@ def is_datetime_between(datetime_obj, start_datetime, end_datetime):
     return start_datetime <= datetime_obj <= end_datetime
 
 
+def parse_timestamp(date_str):
+    """
+    Parse an ISO 8601 date-time string into a UTC timestamp.
+
+    Parameters:
+        date_str (str): A string representing a date-time, e.g. '2023-08-03T12:34:56.789Z'.
+
+    Returns:
+        int: The number of microseconds elapsed since the UTC epoch (1970-01-01T00:00:00Z).
+
+    Raises:
+        ValueError: If the input string is not an ISO 8601 date-time with a 'T' separator.
+
+    The function is the single parser of the date-times returned by the API. It accepts the 'Z' suffix, any
+    '+HH:MM' offset and fractions of seconds of any number of digits (beyond microseconds, the digits are
+    truncated), and it relies on the C implementation of 'fromisoformat', which is several times faster than
+    'strptime'. Strings without an offset are considered as UTC.
+
+    Returning an integer number of microseconds makes durations exact, and makes comparisons with the
+    current time independent of the timezone of the server.
+    """
+    try:
+        if date_str[10] != 'T':
+            raise ValueError
+        if date_str[-1] == 'Z':
+            date_str = date_str[:-1] + '+00:00'
+        if date_str[19:20] == '.':
+            # Before Python 3.11, 'fromisoformat' only accepts fractions of 3 or 6 digits: pad or trim them to 6.
+            fraction = date_str[20:]
+            offset = fraction.lstrip('0123456789')
+            digits = len(fraction) - len(offset)
+            if digits != 6:
+                if not digits:
+                    raise ValueError
+                date_str = date_str[:20] + fraction[:digits].ljust(6, '0')[:6] + offset
+        date_obj = datetime.fromisoformat(date_str)
+    except (IndexError, TypeError, ValueError):
+        raise ValueError("Invalid date format")
+
+    if date_obj.tzinfo is None:
+        date_obj = date_obj.replace(tzinfo=timezone.utc)
+
+    return (date_obj - _EPOCH) // _ONE_MICROSECOND
+
+
+def current_timestamp():
+    """
+    Return the current UTC timestamp.
+
+    Returns:
+        int: The number of microseconds elapsed since the UTC epoch.
+    """
+    return time.time_ns() // 1000
+
+
+def timestamp_to_datetime(timestamp):
+    """
+    Convert a UTC timestamp into a naive datetime object expressed in UTC.
+
+    Parameters:
+        timestamp (int): The number of microseconds elapsed since the UTC epoch.
+
+    Returns:
+        datetime: The naive datetime object, in UTC.
+    """
+    return datetime(1970, 1, 1) + timedelta(microseconds=timestamp)
+
+
+def format_timestamp(timestamp):
+    """
+    Format a UTC timestamp as an ISO 8601 string, like the API does (e.g. '2023-08-03T12:34:56.789000Z').
+
+    Parameters:
+        timestamp (int): The number of microseconds elapsed since the UTC epoch.
+
+    Returns:
+        str: The formatted date-time.
+    """
+    return timestamp_to_datetime(timestamp).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def timestamp_month(timestamp):
+    """
+    Return the month (1 to 12) of a UTC timestamp.
+
+    Parameters:
+        timestamp (int): The number of microseconds elapsed since the UTC epoch.
+
+    Returns:
+        int: The month of the timestamp, in UTC.
+    """
+    return date.fromordinal(_EPOCH_ORDINAL + timestamp // MICROSECONDS_PER_DAY).month
+
+
 def calculate_delta_datetime(start_date_str, end_date_str):
     """
     Calculate the time difference (delta) between two date-time strings.
@@ -60,20 +179,17 @@ def calculate_delta_datetime(start_date_str, end_date_str):
         timedelta: The time difference (delta) between the start and end date-time.
 
     The function takes two date-time strings and calculates the time difference (delta) between them.
-    It first converts the input date-time strings to datetime objects by replacing 'Z' with the timezone offset.
-    Then, it calculates the time difference by subtracting the start datetime from the end datetime.
+    It first converts the input date-time strings to UTC timestamps using the 'parse_timestamp' function.
+    Then, it calculates the time difference by subtracting the start timestamp from the end timestamp.
     The result is returned as a timedelta object representing the time difference.
     """
-    # Convert the start_date_str to a datetime object and replace 'Z' with timezone offset '+00:00'.
-    start_date = datetime.fromisoformat(start_date_str.replace('Z', '+00:00'))
-    # Convert the end_date_str to a datetime object and replace 'Z' with timezone offset '+00:00'.
-    end_date = datetime.fromisoformat(end_date_str.replace('Z', '+00:00'))
-    # Calculate the time difference (delta) by subtracting the start datetime from the end datetime.
-    response_time = end_date - start_date
+    # Convert both date-time strings to UTC timestamps and subtract them.
+    delta = parse_timestamp(end_date_str) - parse_timestamp(start_date_str)
     # Return the time difference (delta) as a timedelta object.
-    return response_time
+    return timedelta(microseconds=delta)
 
 
+@timed_function()
 def calculate_mean_multiple_delta_datetime(obj_list, start_date, end_date):
     """
     Calculate the mean delta time between start date and end date for a list of objects.
@@ -91,15 +207,11 @@ def calculate_mean_multiple_delta_datetime(obj_list, start_date, end_date):
     It then calculates the total delta time and divides it by the number of objects to obtain
     the mean delta time, which is returned as a timedelta object.
     """
-    # Calculate the delta times between start date and end date for each object in the list.
-    delta_times = [calculate_delta_datetime(obj[start_date], obj[end_date]) for obj in obj_list]
-
-    # Calculate the total delta time by summing all the delta times.
-    # The initial value for the sum is set to timedelta() to handle an empty list.
-    total_delta_time = sum(delta_times, timedelta())
+    # Sum the delta times between start date and end date of each object, in microseconds.
+    total_delta_time = sum(parse_timestamp(obj[end_date]) - parse_timestamp(obj[start_date]) for obj in obj_list)
 
     # Calculate the mean delta time by dividing the total delta time by the number of objects.
-    mean_delta_time = total_delta_time / len(delta_times)
+    mean_delta_time = timedelta(microseconds=total_delta_time) / len(obj_list)
 
     # Return the mean delta time as a timedelta object.
     return mean_delta_time
@@ -134,6 +246,24 @@ def format_timedelta(td):
     return {'days': days, 'hours': hours, 'minutes': minutes}
 
 
+def format_time_percentiles(sketch, percentiles):
+    """
+    Format the percentiles of durations estimated by a quantile sketch.
+
+    Parameters:
+        sketch (QuantileSketch): The sketch of the durations, in microseconds.
+        percentiles (iterable): The percentiles to format, between 0 and 100 (e.g. 50, 90 and 99).
+
+    Returns:
+        list: A dictionary for each percentile, with the 'percentile' and the 'days', 'hours' and 'minutes'
+              of its duration, like 'format_timedelta()'. The durations are zero if the sketch is empty.
+    """
+    percentiles = list(percentiles)
+    durations = sketch.quantiles([percentile / 100 for percentile in percentiles])
+    return [{'percentile': percentile, **format_timedelta(timedelta(microseconds=duration or 0))}
+            for percentile, duration in zip(percentiles, durations)]
+
+
 def sort_by_key(the_list, key='id', desc=True):
     """
     Sort a list of dictionaries based on a specified key.
@@ -158,6 +288,31 @@ def sort_by_key(the_list, key='id', desc=True):
     return the_list
 
 
+def top_n_by_key(the_list, n=5, key='id', desc=True):
+    """
+    Select the first n dictionaries of a list sorted on a specified key, without sorting the whole list.
+
+    Parameters:
+        the_list (iterable): An iterable of dictionaries, or of any items when 'key' is a function.
+        n (int): The number of dictionaries to select. Default is 5.
+        key (str or callable): The key to be used for sorting, or a function returning the sort value of an
+                               item (e.g. the value of a column for a row index). Default is 'id'.
+        desc (bool): A boolean flag indicating whether to select the highest values. Default is True.
+
+    Returns:
+        list: The selected dictionaries, sorted on the key.
+
+    Unlike 'sort_by_key', the function does not modify the input list. It keeps a heap of n dictionaries
+    while scanning the list, in O(len(the_list) * log(n)), and returns the same dictionaries as
+    'sort_by_key(the_list, key, desc)[0:n]', including the order of dictionaries sharing the same value.
+    Since the order of equal values is kept, selections can be chained: the top n of the concatenation of
+    several selections, in the order of the items, is the top n of all their items.
+    """
+    # Select the dictionaries with a heap, 'heapq' keeps the order of equal values like 'sort' does.
+    select = heapq.nlargest if desc else heapq.nsmallest
+    return select(n, the_list, key=key if callable(key) else itemgetter(key))
+
+
 def calculate_mean_multiple_delta_datetime_formatted(my_list, start_date_key, end_date_key):
     """
     Calculate the mean response time from a list of datetime objects based on the specified keys.
@@ -186,84 +341,226 @@ def calculate_mean_multiple_delta_datetime_formatted(my_list, start_date_key, en
         return format_timedelta(timedelta())
 
 
-def group_data_by_month(data_list, date_key):
+def month_index(year, month):
+    """
+    Return the index of a month, counted in months since January of the year 0 (year * 12 + month - 1).
+
+    Consecutive months have consecutive indexes, across years, so a range of months is a 'range' of indexes.
+    """
+    return year * 12 + month - 1
+
+
+def timestamp_month_index(timestamp):
+    """
+    Return the month index (see 'month_index') of a UTC timestamp.
+
+    Parameters:
+        timestamp (int): The number of microseconds elapsed since the UTC epoch.
+
+    Returns:
+        int: The index of the month of the timestamp, in UTC.
+    """
+    day = date.fromordinal(_EPOCH_ORDINAL + timestamp // MICROSECONDS_PER_DAY)
+    return month_index(day.year, day.month)
+
+
+def month_index_timestamp(index):
+    """
+    Return the UTC timestamp of the first microsecond of a month index.
+
+    Months after December 9999, the last month of 'datetime', are supported too, since the month following the
+    last month of a range bounds the range: they are shifted back by whole cycles of 400 years.
+    """
+    year, month = divmod(index, 12)
+    cycles = max(0, (year - MAXYEAR + 399) // 400)
+    ordinal = date(year - 400 * cycles, month + 1, 1).toordinal() + cycles * _DAYS_PER_400_YEARS
+    return (ordinal - _EPOCH_ORDINAL) * MICROSECONDS_PER_DAY
+
+
+def month_index_date(index):
+    """
+    Return the date of the first day of a month index.
+    """
+    year, month = divmod(index, 12)
+    return date(year, month + 1, 1)
+
+
+def month_range(start_timestamp=None, end_timestamp=None):
+    """
+    Build the range of month indexes displayed by the charts.
+
+    Parameters:
+        start_timestamp (int): A UTC timestamp of the first month. Default is January of the year of the last month.
+        end_timestamp (int): A UTC timestamp of the last month. Default is the current timestamp.
+
+    Returns:
+        range: The indexes of the months from the first month to the last month, both included.
+
+    Without any argument, the range covers the current year, from January up to the current month.
+    Any range of months is supported, including ranges spanning several years.
+    """
+    end = timestamp_month_index(current_timestamp() if end_timestamp is None else end_timestamp)
+    start = end - end % 12 if start_timestamp is None else timestamp_month_index(start_timestamp)
+    return range(start, end + 1)
+
+
+def month_labels(months):
+    """
+    Build the chart labels of a range of month indexes.
+
+    Parameters:
+        months (range): The month indexes, as returned by 'month_range'.
+
+    Returns:
+        list: The abbreviated month names (e.g. 'Jan'), suffixed with the year (e.g. 'Jan 2024') when the
+              range spans several years.
+    """
+    several_years = len(months) > 0 and months[0] // 12 != months[-1] // 12
+    names = calendar.month_abbr
+    if several_years:
+        return [f"{names[index % 12 + 1]} {index // 12}" for index in months]
+    return [names[index % 12 + 1] for index in months]
+
+
+def current_year_month_keys():
+    """
+    Build the month keys of the current year, from January up to the current month.
+
+    Returns:
+        list: The abbreviated month names (e.g. 'Jan', 'Feb') from January to the current month.
+
+    The keys are used by the bar chart and line chart as labels, and as the keys of the dictionaries
+    returned by the month grouping functions.
+    """
+    return month_labels(month_range())
+
+
+def count_timestamps_by_month(timestamps, months):
+    """
+    Count UTC timestamps by month over a range of months.
+
+    Parameters:
+        timestamps (iterable): The UTC timestamps to count, in microseconds since the epoch.
+        months (range): The month indexes of the buckets, as returned by 'month_range'.
+
+    Returns:
+        list: The number of timestamps of each month of the range. Timestamps outside of the range are ignored.
+
+    The bounds of the range are computed once, so timestamps outside of it are discarded with two
+    comparisons; the month of the others is computed in constant time. The counting is linear in
+    the number of timestamps.
+    """
+    counts = [0] * len(months)
+    if not counts:
+        return counts
+
+    # Precomputed bucket boundaries: [first microsecond of the range, first microsecond after the range).
+    first = months[0]
+    lower = month_index_timestamp(first)
+    upper = month_index_timestamp(months[-1] + 1)
+
+    for timestamp in timestamps:
+        if lower <= timestamp < upper:
+            counts[timestamp_month_index(timestamp) - first] += 1
+    return counts
+
+
+def cumulate_counts(counts):
+    """
+    Return the running totals (prefix sums) of a list of counts.
+    """
+    return list(accumulate(counts))
+
+
+def group_data_by_month(data_list, date_key, start_timestamp=None, end_timestamp=None):
     """
     Group data from a list of dictionaries by month and count occurrences for each month.
 
     Parameters:
         data_list (list): A list of dictionaries containing data to be grouped.
         date_key (str): The key representing the date in each dictionary.
+        start_timestamp (int): A UTC timestamp of the first month. Default is January of the year of the last month.
+        end_timestamp (int): A UTC timestamp of the last month. Default is the current timestamp.
 
     Returns:
         dict: A dictionary containing the count of occurrences for each month.
 
     The function takes a list of dictionaries and groups them based on the month and year
-    extracted from the specified 'date_key'. It then counts the occurrences for each month
-    and returns a dictionary with the counts as values and month names as keys.
+    extracted from the specified 'date_key'. Months are identified by their year and month, so
+    dates of another year are never counted in a month of the displayed range. It then returns
+    a dictionary with the counts as values and month labels as keys (see 'month_labels').
+    """
+    months = month_range(start_timestamp, end_timestamp)
+
+    # Parse each date string once into a UTC timestamp, and count the timestamps by month.
+    counts = count_timestamps_by_month((parse_timestamp(obj[date_key]) for obj in data_list), months)
+
+    # Return the dictionary with counts for each month.
+    return dict(zip(month_labels(months), counts))
+
+
+def parse_date_range(start_str, end_str):
     """
-    current_month = datetime.now().month
-    current_year = datetime.now().year
+    Parse the bounds of a date range, e.g. the 'from' and 'to' query parameters of the dashboard.
 
-    start_month = 1
-    start_year = current_year
+    Parameters:
+        start_str (str or None): The start of the range, as a date ('2024-01-31') or an ISO 8601 date-time.
+        end_str (str or None): The end of the range, as a date or an ISO 8601 date-time.
 
-    start_date = datetime(start_year, start_month, 1)
-    current_date = datetime(current_year, current_month, 1)
+    Returns:
+        tuple: The UTC timestamps of the start and the end of the range (both inclusive), None for a missing bound.
 
-    # Generate a list of month and year keys in the format 'Jan 2023'.
-    month_year_keys = [m for m in list(calendar.month_name)[1:]]
-    month_year_keys = [key[0:3] for key in month_year_keys if
-                       start_date <= datetime.strptime(f"{key} {current_year}", "%B %Y") <= current_date]
+    Raises:
+        ValueError: If a bound is not a valid date or date-time, if it is outside of the years 1 to 9999 in UTC
+                    (e.g. '9999-12-31T23:00:00-05:00'), or if the start is after the end.
 
-    # Create a dictionary with month and year keys and initial count as 0 for each month.
-    date_list = {key: 0 for key in month_year_keys}
+    A date covers the whole day in UTC: a start date begins at midnight, and an end date ends at the last
+    microsecond of the day.
+    """
+    start = _parse_range_bound(start_str, 0)
+    end = _parse_range_bound(end_str, MICROSECONDS_PER_DAY - 1)
 
-    for obj in data_list:
-        date_str = obj[date_key]
+    if start is not None and end is not None and start > end:
+        raise ValueError("Invalid date range")
 
-        # Parse the date string into a datetime object.
-        date_obj = parse_string_datetime(date_str)
+    return start, end
 
-        # Get the month and year key for the current date object.
-        month_year_key = list(date_list.keys())[date_obj.month - 1]
 
-        # Increment the count for the corresponding month in the dictionary.
-        if month_year_key in date_list:
-            date_list[month_year_key] += 1
+def _parse_range_bound(date_str, day_offset):
+    if not date_str:
+        return None
 
-    # Return the dictionary with counts for each month.
-    return date_list
+    # A date without time is parsed as the midnight of the day, shifted by 'day_offset'.
+    if len(date_str) == 10:
+        timestamp = parse_timestamp(date_str + 'T00:00:00Z') + day_offset
+    else:
+        timestamp = parse_timestamp(date_str)
+
+    # The months and the datetimes of the range must stay representable once converted to UTC.
+    if not _MIN_TIMESTAMP <= timestamp <= _MAX_TIMESTAMP:
+        raise ValueError("Date out of range")
+    return timestamp
 
 
 def parse_string_datetime(date_str):
     """
-    Parse a string representing a datetime in the specified formats.
+    Parse a string representing an ISO 8601 datetime.
 
     Parameters:
         date_str (str): A string representing a datetime.
 
     Returns:
-        datetime: A datetime object parsed from the input string.
+        datetime: A naive datetime object, expressed in UTC, parsed from the input string.
 
-    The function tries to parse the input string into a datetime object using two formats:
-    - '%Y-%m-%dT%H:%M:%SZ' (e.g., '2023-08-03T12:34:56Z')
-    - '%Y-%m-%dT%H:%M:%S.%fZ' (e.g., '2023-08-03T12:34:56.789Z')
+    The function parses the input string using the 'parse_timestamp' function, which accepts for instance:
+    - '2023-08-03T12:34:56Z'
+    - '2023-08-03T12:34:56.789Z'
+    - '2023-08-03T14:34:56.789+02:00'
 
-    If the input string does not match any of the formats, a ValueError is raised.
+    If the input string is not a valid ISO 8601 datetime, a ValueError is raised.
     """
-    try:
-        # Try parsing the date string using the format '%Y-%m-%dT%H:%M:%SZ'.
-        date_obj = datetime.strptime(date_str, '%Y-%m-%dT%H:%M:%SZ')
-    except ValueError:
-        try:
-            # If the first format fails, try parsing using the format '%Y-%m-%dT%H:%M:%S.%fZ'.
-            date_obj = datetime.strptime(date_str, '%Y-%m-%dT%H:%M:%S.%fZ')
-        except ValueError:
-            # If both formats fail, raise a ValueError with an error message.
-            raise ValueError("Invalid date format")
-
-    # Return the parsed datetime object.
-    return date_obj
+    # Parse the date string into a UTC timestamp and convert it back to a datetime object.
+    return timestamp_to_datetime(parse_timestamp(date_str))
 
 
 def format_percentage(number):
@@ -291,3 +588,47 @@ def format_percentage(number):
 
     # Return the formatted number as a string.
     return formatted_number
+
+
+def rank_category_counts(category_counts, categories, k=None, others=False):
+    """
+    Rank the categories by their number of claims.
+
+    Parameters:
+        category_counts (dict): The number of claims by category id.
+        categories (list): A list of dictionaries representing claim categories.
+        k (int or None): The maximum number of categories to return. Default is None, which returns all of them.
+        others (bool): Whether to append an 'Others' entry summing the categories left out of the top k.
+                       Default is False.
+
+    Returns:
+        list: The ranked categories, as dictionaries containing the category, its number of claims ('times')
+              and its share of the claims ('share', e.g. '40%').
+
+    Categories without claims are left out. Categories with the same number of claims keep the order of the
+    'categories' list, so the first entry is the category found by 'find_most_occurred_claim_category'.
+    Selecting the top k entries uses a heap, in O(categories * log(k)).
+    """
+    # Keep the position of each category to break ties.
+    counted = [(-category_counts.get(cat['id'], 0), position, cat) for position, cat in enumerate(categories)]
+    counted = [entry for entry in counted if entry[0] < 0]
+
+    total = sum(category_counts.values())
+    top = heapq.nsmallest(k, counted) if k is not None else sorted(counted)
+
+    ranking = [
+        {'category': cat, 'times': -count, 'share': format_percentage(-count / total * 100) + "%"}
+        for count, position, cat in top
+    ]
+
+    if others:
+        # Claims of the categories left out of the ranking, including the unknown categories.
+        others_count = total - sum(entry['times'] for entry in ranking)
+        if others_count > 0:
+            ranking.append({
+                'category': {'name': 'Others'},
+                'times': others_count,
+                'share': format_percentage(others_count / total * 100) + "%"
+            })
+
+    return ranking
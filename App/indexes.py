@@ -0,0 +1,584 @@
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from operator import itemgetter
+
+from App import constants
+from App.helpers import parse_timestamp, current_timestamp, format_percentage, month_index_timestamp, \
+    top_n_by_key, MICROSECONDS_PER_HOUR
+from App.sketches import QuantileSketch, QUANTILE_SKETCH_SIZE
+from App.tables import ClaimTable, TableRows, STARTED, ENDED, CLOSED, NULL_CODE
+
+# Number of claims of the blocks summarized by a RangeSummaryTree.
+RANGE_BLOCK_SIZE = 512
+
+
+class RecentClaimsIndex:
+    """
+    Sorted index of the published claims of a payload, split into unclosed and closed claims.
+
+    Parameters:
+        claims (list or ClaimTable): A list of dictionaries containing claim data, or a ClaimTable.
+        key (str): The key the claims are sorted on, highest first. Default is 'id'.
+
+    The index is built once per payload, in O(n log n). Afterwards, any page of the most recent unclosed or
+    closed claims is a slice of an already sorted list, so paging through the claims does not sort them again.
+    For a ClaimTable, the sorted lists are 'TableRows', rebuilding the claims of a page only.
+    """
+
+    def __init__(self, claims, key=constants.ID):
+        self.key = key
+
+        if isinstance(claims, ClaimTable):
+            column = claims.sort_column(key)
+            self.unclosed = TableRows(claims, claims.unclosed().sorted_rows(column, descending=True))
+            self.closed = TableRows(claims, claims.closed().sorted_rows(column, descending=True))
+            return
+
+        published = [claim for claim in claims if claim[constants.PUBLISH_DATE]]
+        self.unclosed = sorted((claim for claim in published if not claim[constants.CLOSE]),
+                               key=itemgetter(key), reverse=True)
+        self.closed = sorted((claim for claim in published if claim[constants.CLOSE]),
+                             key=itemgetter(key), reverse=True)
+
+    def claims(self, status):
+        """
+        Return the sorted claims of a status.
+
+        Parameters:
+            status (str): 'unclosed' or 'closed'.
+
+        Returns:
+            list: The claims of the status, highest key first.
+
+        Raises:
+            KeyError: If the status is unknown.
+        """
+        return {'unclosed': self.unclosed, 'closed': self.closed}[status]
+
+
+class TimestampIndex:
+    """
+    Sorted list of UTC timestamps, answering window counts with two binary searches.
+
+    Parameters:
+        timestamps (iterable): The UTC timestamps, in microseconds since the epoch, in any order.
+
+    The timestamps are sorted once, in O(n log n). Afterwards, counting the timestamps of any window costs
+    O(log n), instead of a scan of every claim.
+    """
+
+    def __init__(self, timestamps):
+        self.timestamps = sorted(timestamps)
+
+    @classmethod
+    def from_claims(cls, claims, date_key):
+        """
+        Build the index of a date of the claims.
+
+        Parameters:
+            claims (list or ClaimTable): A list of dictionaries containing claim data, or a ClaimTable.
+            date_key (str): The key of the date to index (e.g. 'publish_date').
+
+        Returns:
+            TimestampIndex: The index of the dates of the claims.
+        """
+        if isinstance(claims, ClaimTable):
+            return cls(claims.sorted_timestamps(date_key))
+
+        return cls(parse_timestamp(claim[date_key]) for claim in claims)
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def count_between(self, start_timestamp, end_timestamp):
+        """
+        Count the timestamps between two UTC timestamps (inclusive).
+        """
+        return max(0, bisect_right(self.timestamps, end_timestamp) - bisect_left(self.timestamps, start_timestamp))
+
+
+class PerformanceIndex:
+    """
+    Timestamp indexes of the publish dates of the published claims and the close dates of the closed claims.
+
+    Parameters:
+        published (TimestampIndex): The index of the publish dates of the published claims.
+        closed (TimestampIndex): The index of the close dates of the closed claims.
+
+    The performance over the last hours is the share of the claims published in the window which were closed
+    in the same window. With both dates indexed, it costs four binary searches whatever the number of claims,
+    so the performance can be evaluated for many windows at once, e.g. to draw a performance curve.
+    """
+
+    def __init__(self, published, closed):
+        self.published = published
+        self.closed = closed
+
+    @classmethod
+    def from_claims(cls, closed_claims, published_claims):
+        """
+        Build the indexes of the closed and published claims (lists of dictionaries or ClaimTables).
+        """
+        return cls(TimestampIndex.from_claims(published_claims, constants.PUBLISH_DATE),
+                   TimestampIndex.from_claims(closed_claims, constants.CLOSE_DATE))
+
+    def performance(self, performance_hour_offset, now=None):
+        """
+        Calculate the performance of the last hours.
+
+        Parameters:
+            performance_hour_offset (int): The number of hours of the window.
+            now (int): The UTC timestamp of the end of the window. Default is the current timestamp.
+
+        Returns:
+            dict: The counted closed claims, the counted published claims, the percentage of closed claims
+                  and the hours of the window, like 'services.calculate_best_performances_by_hours'.
+        """
+        if not len(self.closed):
+            return _performance(None, len(self.published), performance_hour_offset)
+
+        now = now if now is not None else current_timestamp()
+        window_start = now - performance_hour_offset * MICROSECONDS_PER_HOUR
+        count_closed_claims = self.closed.count_between(window_start, now)
+        count_published_claims = self.published.count_between(window_start, now)
+        return _performance(count_closed_claims, count_published_claims, performance_hour_offset)
+
+    def curve(self, performance_hour_offsets, now=None):
+        """
+        Calculate the performance of several windows ending at the same time.
+
+        Parameters:
+            performance_hour_offsets (iterable): The numbers of hours of the windows (e.g. 24, 48, 168, 720).
+            now (int): The UTC timestamp of the end of the windows. Default is the current timestamp.
+
+        Returns:
+            list: The performance of each window, in the order of the offsets.
+        """
+        now = now if now is not None else current_timestamp()
+        return [self.performance(offset, now) for offset in performance_hour_offsets]
+
+    def hourly(self, now=None):
+        """
+        Count the publish and close dates by hours before a timestamp, see 'HourlyPerformanceIndex'.
+
+        Parameters:
+            now (int): The UTC timestamp the hours are counted from. Default is the current timestamp.
+
+        Returns:
+            HourlyPerformanceIndex: The counts, answering the performance of any window ending at 'now'.
+        """
+        now = now if now is not None else current_timestamp()
+        return HourlyPerformanceIndex(now, _hourly_counts(self.published.timestamps, now),
+                                      _hourly_counts(self.closed.timestamps, now), len(self.published),
+                                      len(self.closed))
+
+
+class HourlyPerformanceIndex:
+    """
+    Numbers of claims published and closed in the hours preceding a timestamp, answering the performance of the
+    windows ending at that timestamp.
+
+    Parameters:
+        now (int): The UTC timestamp the hours are counted from, in microseconds since the epoch.
+        published (list): The cumulative numbers of publish dates, as [hours, count] pairs by increasing hours,
+                          'count' being the number of dates at most 'hours' hours before 'now'.
+        closed (list): The cumulative numbers of close dates, like 'published'.
+        published_total (int): The number of published claims, including the dates after 'now'.
+        closed_total (int): The number of closed claims, including the dates after 'now'.
+
+    A window of whole hours ending at 'now' holds the dates of its first hours, so it is counted with a binary
+    search over the hours, with the same result as 'PerformanceIndex.performance()'. There is one pair per hour
+    holding a date instead of one timestamp per claim, so the index is small enough to be saved with the dashboard
+    snapshot (see 'as_dict()') and to recompute the performance of another offset without the payload.
+    """
+
+    def __init__(self, now, published, closed, published_total, closed_total):
+        self.now = now
+        self.published = published
+        self.closed = closed
+        self.published_total = published_total
+        self.closed_total = closed_total
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Rebuild an index saved with 'as_dict()'.
+        """
+        return cls(data['now'], data['published'], data['closed'], data['published_total'], data['closed_total'])
+
+    def as_dict(self):
+        """
+        Return the index as a JSON-serializable dictionary, see 'from_dict()'.
+        """
+        return {'now': self.now, 'published': self.published, 'closed': self.closed,
+                'published_total': self.published_total, 'closed_total': self.closed_total}
+
+    def performance(self, performance_hour_offset):
+        """
+        Calculate the performance of the hours preceding 'now'.
+
+        Parameters:
+            performance_hour_offset (int): The number of hours of the window.
+
+        Returns:
+            dict: The performance of the window, like 'PerformanceIndex.performance()'.
+        """
+        if not self.closed_total:
+            return _performance(None, self.published_total, performance_hour_offset)
+
+        return _performance(_count_hours(self.closed, performance_hour_offset),
+                            _count_hours(self.published, performance_hour_offset), performance_hour_offset)
+
+
+def _performance(count_closed_claims, count_published_claims, performance_hour_offset):
+    # The performance of a window, like 'services.calculate_best_performances_by_hours'. Without any closed claim
+    # (None), the published claims are all counted and the percentage is 0.
+    if count_closed_claims is None:
+        return {
+            'counted_closed_claims': 0,
+            'counted_published_claims': count_published_claims,
+            'percentage': "0%",
+            'hours': performance_hour_offset
+        }
+
+    # To avoid division by zero when there was no published date in the window.
+    if count_published_claims == 0:
+        percentage = 0
+    else:
+        percentage = (count_closed_claims / count_published_claims) * 100
+
+    return {
+        'counted_closed_claims': count_closed_claims,
+        'counted_published_claims': count_published_claims,
+        'percentage': str(format_percentage(percentage)) + "%",
+        'hours': performance_hour_offset
+    }
+
+
+def _hourly_counts(timestamps, now):
+    # Cumulative [hours, count] pairs of the sorted timestamps up to 'now', a timestamp being in the window of
+    # 'hours' hours once it is at most 'hours' hours before 'now', i.e. after the ceiling of its age in hours.
+    pairs = []
+    for timestamp in reversed(timestamps[:bisect_right(timestamps, now)]):
+        hours = -((timestamp - now) // MICROSECONDS_PER_HOUR)
+        if pairs and pairs[-1][0] == hours:
+            pairs[-1][1] += 1
+        else:
+            pairs.append([hours, pairs[-1][1] + 1 if pairs else 1])
+    return pairs
+
+
+def _count_hours(pairs, hours):
+    # The cumulative count of the last pair within the hours, with a binary search.
+    position = bisect_right(pairs, hours, key=itemgetter(0))
+    return pairs[position - 1][1] if position else 0
+
+
+class RangeSummaryTree:
+    """
+    Tree of summaries of consecutive blocks of claims, answering the time percentiles and the last claims of any
+    range of positions.
+
+    Parameters:
+        response_times (list): The response time of each claim, in microseconds, or None if it is not started.
+        ending_times (list): The ending time of each claim, in microseconds, or None if it is not ended.
+        closed (list): Whether each claim is closed.
+        keys (list): The value of the key the last claims are selected on, for each claim.
+        last_claims_count (int): The number of claims of the last unclosed and closed claims lists. Default is 5.
+        sketch_size (int): The size 'k' of the quantile sketches. Default is 200.
+        block_size (int): The number of claims of the blocks. Default is 512.
+
+    A summary holds the quantile sketches of the response and ending times of some claims, and the positions of
+    their last unclosed and closed claims. The claims are split into blocks of 'block_size' positions, each level
+    of the tree merging the summaries of pairs of nodes of the level below, so any range of whole blocks is
+    covered by O(log n) nodes. A range of positions is answered by merging those nodes with the summaries of the
+    claims of the partial blocks at both ends, in O(block_size + k * log n) whatever the length of the range.
+    The sketches of the nodes merge without loss below 'k' values, so the percentiles of small ranges are exact.
+    """
+
+    def __init__(self, response_times, ending_times, closed, keys, last_claims_count=5,
+                 sketch_size=QUANTILE_SKETCH_SIZE, block_size=RANGE_BLOCK_SIZE):
+        self.response_times = response_times
+        self.ending_times = ending_times
+        self.closed = closed
+        self.keys = keys
+        self.last_claims_count = last_claims_count
+        self.sketch_size = sketch_size
+        self.block_size = block_size
+
+        # Summaries of the whole blocks, then of pairs of nodes of the level below, up to a single root.
+        self.levels = [[self.scan(i * block_size, (i + 1) * block_size) for i in range(len(keys) // block_size)]]
+        while len(self.levels[-1]) > 1:
+            nodes = self.levels[-1]
+            self.levels.append([self.merge(nodes[i:i + 2]) for i in range(0, len(nodes) - 1, 2)])
+
+    def query(self, start, stop):
+        """
+        Summarize the claims of a range of positions.
+
+        Parameters:
+            start (int): The position of the first claim.
+            stop (int): The position after the last claim.
+
+        Returns:
+            tuple: The quantile sketches of the response and ending times, and the positions of the last unclosed
+                   and closed claims, highest key first.
+        """
+        # Whole blocks of the range, between the partial blocks at both ends.
+        first_block = -(-start // self.block_size)
+        stop_block = stop // self.block_size
+        if first_block >= stop_block:
+            return self.scan(start, stop)
+
+        # Nodes covering the whole blocks, from the lowest level up, kept in the order of their positions.
+        left_nodes, right_nodes = [], []
+        lower, upper = first_block, stop_block
+        for nodes in self.levels:
+            if lower >= upper:
+                break
+            if lower & 1:
+                left_nodes.append(nodes[lower])
+                lower += 1
+            if upper & 1:
+                upper -= 1
+                right_nodes.append(nodes[upper])
+            lower >>= 1
+            upper >>= 1
+
+        return self.merge([self.scan(start, first_block * self.block_size), *left_nodes, *reversed(right_nodes),
+                           self.scan(stop_block * self.block_size, stop)])
+
+    def scan(self, start, stop):
+        """
+        Summarize the claims of a range of positions by scanning them.
+        """
+        response_sketch = QuantileSketch(self.sketch_size)
+        response_sketch.update(time for time in self.response_times[start:stop] if time is not None)
+        ending_sketch = QuantileSketch(self.sketch_size)
+        ending_sketch.update(time for time in self.ending_times[start:stop] if time is not None)
+
+        positions = range(start, stop)
+        closed = self.closed
+        return (response_sketch, ending_sketch,
+                top_n_by_key((i for i in positions if not closed[i]), self.last_claims_count, self.keys.__getitem__),
+                top_n_by_key((i for i in positions if closed[i]), self.last_claims_count, self.keys.__getitem__))
+
+    def merge(self, summaries):
+        """
+        Merge the summaries of consecutive ranges of positions, given in the order of their positions.
+        """
+        response_sketch = QuantileSketch(self.sketch_size)
+        ending_sketch = QuantileSketch(self.sketch_size)
+        for summary in summaries:
+            response_sketch.merge(summary[0])
+            ending_sketch.merge(summary[1])
+
+        # The selections are chained in the order of the positions, so equal keys keep the first claims.
+        return (response_sketch, ending_sketch,
+                top_n_by_key((i for summary in summaries for i in summary[2]), self.last_claims_count,
+                             self.keys.__getitem__),
+                top_n_by_key((i for summary in summaries for i in summary[3]), self.last_claims_count,
+                             self.keys.__getitem__))
+
+
+class ClaimsRangeIndex:
+    """
+    Index of the published claims of a payload by publish date, answering the dashboard statistics of any
+    date range.
+
+    Parameters:
+        claims (list): A list of dictionaries containing claim data.
+        last_claims_count (int): The number of claims of the last unclosed and closed claims lists. Default is 5.
+        last_claims_key (str): The key the last claims are selected on, highest first. Default is 'id'.
+        sketch_size (int): The size 'k' of the quantile sketches of the response and ending times. Default is 200.
+
+    The published claims are sorted by publish date once per payload. The claims of a date range are then a
+    contiguous slice of the sorted claims, located with two binary searches, and the statistics summed over
+    the claims (closed claims, response and ending times) are differences of prefix sums. The categories and
+    the employees keep the sorted publish dates of their claims, so their counts over a range are binary
+    searches as well. The time percentiles and the last claims, which are not sums, come from a
+    RangeSummaryTree over the sorted claims. Changing the range therefore never filters the claims of the
+    payload again.
+    """
+
+    def __init__(self, claims, last_claims_count=5, last_claims_key=constants.ID, sketch_size=QUANTILE_SKETCH_SIZE):
+        if isinstance(claims, ClaimTable):
+            columns = self._table_columns(claims, last_claims_key)
+        else:
+            columns = self._claim_columns(claims, last_claims_key)
+        self.claims, publish_timestamps, start_timestamps, end_timestamps, close_timestamps, categories, \
+            employees, keys = columns
+        self.publish_timestamps = TimestampIndex(publish_timestamps)
+
+        # Response and ending times of the sorted claims, None when the claim is not started or ended.
+        response_times = [None if started_at is None else started_at - published_at
+                          for published_at, started_at in zip(publish_timestamps, start_timestamps)]
+        ending_times = [None if ended_at is None else ended_at - published_at
+                        for published_at, ended_at in zip(publish_timestamps, end_timestamps)]
+        closed = [closed_at is not None for closed_at in close_timestamps]
+
+        # Prefix sums over the sorted claims: 'prefix[i]' is the sum over the first i claims.
+        self.closed_prefix = list(accumulate(closed, initial=0))
+        self.started_prefix = list(accumulate((time is not None for time in response_times), initial=0))
+        self.response_time_prefix = list(accumulate((time or 0 for time in response_times), initial=0))
+        self.ended_prefix = list(accumulate((time is not None for time in ending_times), initial=0))
+        self.ending_time_prefix = list(accumulate((time or 0 for time in ending_times), initial=0))
+
+        # Sorted publish dates of the claims of each category, employee and closed claims category.
+        self.category_timestamps = {}
+        self.closed_category_timestamps = {}
+        self.employee_timestamps = {}
+        for published_at, category, employee, is_closed in zip(publish_timestamps, categories, employees, closed):
+            self.category_timestamps.setdefault(category, []).append(published_at)
+            self.employee_timestamps.setdefault(employee, []).append(published_at)
+            if is_closed:
+                self.closed_category_timestamps.setdefault(category, []).append(published_at)
+
+        self.close_timestamps = TimestampIndex(closed_at for closed_at in close_timestamps if closed_at is not None)
+        self.summaries = RangeSummaryTree(response_times, ending_times, closed, keys, last_claims_count, sketch_size)
+
+    @staticmethod
+    def _claim_columns(claims, last_claims_key):
+        # Columns of the published claims of a list of dictionaries, sorted by publish date. The close date is
+        # None for the claims which are not closed.
+        published = sorted(((parse_timestamp(claim[constants.PUBLISH_DATE]), claim)
+                            for claim in claims if claim[constants.PUBLISH_DATE]), key=itemgetter(0))
+        claims = [claim for _, claim in published]
+        return (claims, [timestamp for timestamp, _ in published],
+                [_parse_optional(claim[constants.START_DATE]) for claim in claims],
+                [_parse_optional(claim[constants.END_DATE]) for claim in claims],
+                [parse_timestamp(claim[constants.CLOSE_DATE]) if claim[constants.CLOSE] else None
+                 for claim in claims],
+                [claim[constants.CATEGORY] for claim in claims], [claim[constants.EMPLOYEE] for claim in claims],
+                [claim[last_claims_key] for claim in claims])
+
+    @staticmethod
+    def _table_columns(table, last_claims_key):
+        # Same columns from the published rows of a ClaimTable, sorted and gathered by the NumPy kernels when they
+        # are available. The sorted claims are read as dictionaries through 'TableRows'.
+        rows = table.published().sorted_rows(table.publish_dates)
+        view = table.view(rows)
+        flags = view.gather(table.flags)
+        category_values = table.category_codes.values
+        return (TableRows(table, rows), view.gather(table.publish_dates),
+                _flagged(view.gather(table.start_dates), flags, STARTED),
+                _flagged(view.gather(table.end_dates), flags, ENDED),
+                _flagged(view.gather(table.close_dates), flags, CLOSED),
+                [None if code == NULL_CODE else category_values[code] for code in view.gather(table.categories)],
+                view.gather(table.employees), view.gather(table.sort_column(last_claims_key)))
+
+    def bounds(self, start_timestamp=None, end_timestamp=None):
+        """
+        Return the positions of the first claim and after the last claim published in a range.
+
+        Parameters:
+            start_timestamp (int): The start of the range (inclusive), None for no start.
+            end_timestamp (int): The end of the range (inclusive), None for no end.
+
+        Returns:
+            tuple: The slice (start, stop) of the sorted claims published in the range.
+        """
+        timestamps = self.publish_timestamps.timestamps
+        start = 0 if start_timestamp is None else bisect_left(timestamps, start_timestamp)
+        stop = len(timestamps) if end_timestamp is None else bisect_right(timestamps, end_timestamp)
+        return start, max(start, stop)
+
+    def summary(self, start_timestamp=None, end_timestamp=None):
+        """
+        Summarize the claims published in a range, without scanning them.
+
+        Returns:
+            tuple: The quantile sketches of the response and ending times (in microseconds), and the last
+                   unclosed and closed claims, highest key first.
+        """
+        start, stop = self.bounds(start_timestamp, end_timestamp)
+        response_sketch, ending_sketch, unclosed, closed = self.summaries.query(start, stop)
+        return response_sketch, ending_sketch, [self.claims[i] for i in unclosed], [self.claims[i] for i in closed]
+
+    def published_count(self, start_timestamp=None, end_timestamp=None):
+        start, stop = self.bounds(start_timestamp, end_timestamp)
+        return stop - start
+
+    def closed_count(self, start_timestamp=None, end_timestamp=None):
+        return self._prefix_sum(self.closed_prefix, start_timestamp, end_timestamp)
+
+    def response_time(self, start_timestamp=None, end_timestamp=None):
+        """
+        Return the summed response times (in microseconds) and the number of started claims published in a range.
+        """
+        return (self._prefix_sum(self.response_time_prefix, start_timestamp, end_timestamp),
+                self._prefix_sum(self.started_prefix, start_timestamp, end_timestamp))
+
+    def ending_time(self, start_timestamp=None, end_timestamp=None):
+        """
+        Return the summed ending times (in microseconds) and the number of ended claims published in a range.
+        """
+        return (self._prefix_sum(self.ending_time_prefix, start_timestamp, end_timestamp),
+                self._prefix_sum(self.ended_prefix, start_timestamp, end_timestamp))
+
+    def category_counts(self, start_timestamp=None, end_timestamp=None, closed=False):
+        """
+        Count the claims of each category published in a range.
+
+        Parameters:
+            start_timestamp (int): The start of the range (inclusive), None for no start.
+            end_timestamp (int): The end of the range (inclusive), None for no end.
+            closed (bool): True to count the closed claims only. Default is False.
+
+        Returns:
+            dict: The number of claims by category id, for the categories having claims in the range.
+        """
+        timestamps = self.closed_category_timestamps if closed else self.category_timestamps
+        counts = {category: self._count(category_timestamps, start_timestamp, end_timestamp)
+                  for category, category_timestamps in timestamps.items()}
+        return {category: count for category, count in counts.items() if count}
+
+    def employees_count(self, start_timestamp=None, end_timestamp=None):
+        """
+        Count the distinct employees having published a claim in a range.
+        """
+        return sum(1 for employee_timestamps in self.employee_timestamps.values()
+                   if self._count(employee_timestamps, start_timestamp, end_timestamp))
+
+    def month_counts(self, months, start_timestamp=None, end_timestamp=None):
+        """
+        Count the claims published in each month of a range of month indexes, within the date range.
+
+        Returns:
+            list: The number of claims of each month, with two binary searches per month.
+        """
+        counts = []
+        for index in months:
+            month_start = month_index_timestamp(index)
+            month_end = month_index_timestamp(index + 1) - 1
+            if start_timestamp is not None:
+                month_start = max(month_start, start_timestamp)
+            if end_timestamp is not None:
+                month_end = min(month_end, end_timestamp)
+            counts.append(self.publish_timestamps.count_between(month_start, month_end))
+        return counts
+
+    def performance_index(self):
+        """
+        Return the PerformanceIndex of the claims, sharing the sorted timestamps of this index.
+        """
+        return PerformanceIndex(self.publish_timestamps, self.close_timestamps)
+
+    def _prefix_sum(self, prefix, start_timestamp, end_timestamp):
+        start, stop = self.bounds(start_timestamp, end_timestamp)
+        return prefix[stop] - prefix[start]
+
+    @staticmethod
+    def _count(timestamps, start_timestamp, end_timestamp):
+        start = 0 if start_timestamp is None else bisect_left(timestamps, start_timestamp)
+        stop = len(timestamps) if end_timestamp is None else bisect_right(timestamps, end_timestamp)
+        return max(0, stop - start)
+
+
+def _parse_optional(date_str):
+    return parse_timestamp(date_str) if date_str else None
+
+
+def _flagged(timestamps, flags, flag):
+    # The timestamps of the rows having the flag, None for the others.
+    return [timestamp if row_flags & flag else None for timestamp, row_flags in zip(timestamps, flags)]
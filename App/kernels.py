@@ -0,0 +1,157 @@
+# NumPy implementations of the statistics computed over the columns of a ClaimTable.
+# NumPy is optional: when it is not installed, or when 'ENABLED' is False, the ClaimTable falls back to its
+# pure Python loops, which return the same results.
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+from App.helpers import month_index_timestamp
+
+# Allows to switch back to the pure Python implementations, e.g. to compare both.
+ENABLED = True
+
+MICROSECONDS_PER_SECOND = 1_000_000
+
+# Month index (year * 12 + month - 1) of January 1970.
+FIRST_EPOCH_MONTH = 1970 * 12
+
+
+def available():
+    """
+    Return True if the NumPy kernels can be used.
+    """
+    return ENABLED and np is not None
+
+
+def column(values):
+    """
+    Return a NumPy view of an 'array' column, without copying it.
+
+    Parameters:
+        values (array): A column of a ClaimTable.
+
+    Returns:
+        numpy.ndarray: A read-only array sharing the memory of the column.
+    """
+    return np.frombuffer(values, dtype=np.dtype(values.typecode))
+
+
+def select(values, rows):
+    """
+    Return the values of a column at the given rows, or the whole column if 'rows' is None.
+    """
+    values = column(values)
+    return values if rows is None else values[np.asarray(rows, dtype=np.intp)]
+
+
+def flag_rows(flags, rows, all_flags, no_flags):
+    """
+    Return the indexes of the rows having all the 'all_flags' bits and none of the 'no_flags' bits.
+
+    Returns:
+        numpy.ndarray: The indexes of the matching rows, in ascending order.
+    """
+    values = select(flags, rows)
+    mask = (values & all_flags) == all_flags
+    if no_flags:
+        mask &= (values & no_flags) == 0
+
+    matching = np.flatnonzero(mask)
+    return matching if rows is None else np.asarray(rows, dtype=np.intp)[matching]
+
+
+def distinct_count(codes, rows, null_code):
+    """
+    Count the distinct non-null codes of a code column with 'np.unique'.
+    """
+    values = np.unique(select(codes, rows))
+    return int(np.count_nonzero(values != null_code))
+
+
+def value_counts(codes, rows, size):
+    """
+    Count the rows of each code with 'np.bincount'.
+
+    Returns:
+        list: The number of rows of each code, from 0 to size - 1.
+    """
+    values = select(codes, rows)
+    return np.bincount(values[values >= 0], minlength=size).tolist()
+
+
+def count_between(timestamps, rows, start, end):
+    """
+    Count the timestamps between 'start' and 'end' (inclusive) with a boolean mask.
+    """
+    values = select(timestamps, rows)
+    return int(np.count_nonzero((values >= start) & (values <= end)))
+
+
+def sorted_values(values, rows):
+    """
+    Sort the values of a column with 'np.sort'.
+
+    Returns:
+        list: The values in ascending order, as Python integers.
+    """
+    return np.sort(select(values, rows)).tolist()
+
+
+def argsort(values, rows, descending=False):
+    """
+    Sort the rows by the values of a column with a stable 'np.argsort'.
+
+    Returns:
+        numpy.ndarray: The indexes of the rows, in ascending (or descending) order of their values. Rows sharing
+                       the same value keep their order, like with 'sorted()'.
+    """
+    rows = np.arange(len(values), dtype=np.intp) if rows is None else np.asarray(rows, dtype=np.intp)
+    selected = select(values, rows)
+    if not descending:
+        return rows[np.argsort(selected, kind='stable')]
+
+    # A stable descending order is the reverse of the stable ascending order of the reversed values.
+    order = np.argsort(selected[::-1], kind='stable')[::-1]
+    return rows[len(rows) - 1 - order]
+
+
+def gather(values, rows):
+    """
+    Return the values of a column at the given rows, as Python numbers.
+    """
+    return select(values, rows).tolist()
+
+
+def month_counts(timestamps, rows, months):
+    """
+    Count the timestamps by month over a range of month indexes, with 'np.bincount' over datetime64 months.
+
+    Returns:
+        list: The number of timestamps of each month of the range. Timestamps outside of the range are ignored.
+    """
+    if not len(months):
+        return []
+
+    # Keep the timestamps within the bucket boundaries, which also drops the null timestamps.
+    values = select(timestamps, rows)
+    values = values[(values >= month_index_timestamp(months[0])) & (values < month_index_timestamp(months[-1] + 1))]
+
+    # Months elapsed since January 1970, shifted to the position of the month in the range.
+    values = values.astype('datetime64[us]').astype('datetime64[M]').astype(np.int64)
+    return np.bincount(values + (FIRST_EPOCH_MONTH - months[0]), minlength=len(months)).tolist()
+
+
+def sum_deltas(start_timestamps, end_timestamps, rows):
+    """
+    Sum the differences between two timestamp columns, in microseconds.
+
+    Returns:
+        int: The exact sum, as a Python integer.
+
+    Seconds and microseconds are summed separately, so the int64 sums cannot overflow even with millions of
+    deltas of several years.
+    """
+    deltas = select(end_timestamps, rows) - select(start_timestamps, rows)
+    seconds, microseconds = np.divmod(deltas, MICROSECONDS_PER_SECOND)
+    return int(seconds.sum()) * MICROSECONDS_PER_SECOND + int(microseconds.sum())
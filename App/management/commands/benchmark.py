@@ -0,0 +1,96 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from App import repositories
+from App.benchmarks import BENCHMARKS, STREAMED_BENCHMARKS, MAX_PAYLOAD_CLAIMS, run_benchmarks
+from App.models import Configuration
+
+
+class Command(BaseCommand):
+    """
+    Management command benchmarking the functions of the 'services' and 'helpers' modules on synthetic payloads.
+
+    Usage:
+        python manage.py benchmark --sizes 1000 100000 1000000 --output benchmark.json
+
+    For each size, a realistic payload of that many claims is generated (see 'App.synthetic'), and each function
+    of 'App.benchmarks.BENCHMARKS' is timed on it, with its throughput in claims per second and its peak memory
+    measured with 'tracemalloc'. With '--functions', only the functions whose name contains one of the given
+    strings are benchmarked. These payloads are held in memory, about 1 GiB per million claims, so they are
+    limited to 'MAX_PAYLOAD_CLAIMS' (1,000,000) claims. The functions of 'App.benchmarks.STREAMED_BENCHMARKS'
+    (streaming aggregation, compact store and table dashboard) consume the records one by one, so they run at
+    every size, up to 10,000,000 claims.
+
+    The benchmarks run in a transaction rolled back at the end: the configuration is created if there is none,
+    and the database is left unchanged. The API is never called.
+    """
+    help = "Time the services and helpers functions on synthetic payloads of several sizes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            type=int,
+            nargs='+',
+            default=[1_000, 10_000, 100_000],
+            help=f"Numbers of claims of the payloads, up to 10,000,000. Above {MAX_PAYLOAD_CLAIMS:,}, the payload "
+                 f"does not fit in memory (about 1 GiB per million claims) and only the streamed benchmarks run: "
+                 f"{', '.join(STREAMED_BENCHMARKS)}. Default is 1000 10000 100000."
+        )
+        parser.add_argument(
+            '--functions',
+            nargs='+',
+            default=None,
+            help="Benchmark only the functions whose name contains one of these strings, e.g. 'services.count'."
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help="Timed calls of each function, the fastest one being reported. Default is 3."
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help="Seed of the synthetic payloads. Default is 0."
+        )
+        parser.add_argument(
+            '--output',
+            default=None,
+            help="Path of a JSON file receiving the results."
+        )
+
+    def handle(self, *args, **options):
+        patterns = options['functions']
+        names = [name for name in [*BENCHMARKS, *STREAMED_BENCHMARKS]
+                 if patterns is None or any(pattern in name for pattern in patterns)]
+        if not names:
+            raise CommandError("No benchmarked function matches --functions.")
+        if options['repeat'] < 1 or min(options['sizes']) < 1:
+            raise CommandError("--sizes and --repeat must be positive.")
+
+        self.stdout.write(f"{'claims':>10}  {'function':<58} {'time (ms)':>12} {'claims/s':>14} {'peak (MiB)':>11}")
+        results = []
+        # The configuration cached by the workers is invalidated around the rolled back transaction.
+        repositories.invalidate_configuration_cache()
+        try:
+            with transaction.atomic():
+                config = repositories.get_configuration() or Configuration.objects.create(
+                    total_employees=max(10, max(options['sizes']) // 50), total_units=1, performance_hours_offset=24)
+
+                for result in run_benchmarks(options['sizes'], config, names, options['repeat'], options['seed']):
+                    results.append(result)
+                    self.stdout.write(
+                        f"{result['claims']:>10}  {result['function']:<58} {result['seconds'] * 1000:>12.3f} "
+                        f"{result['claims_per_second'] or 0:>14,.0f} {result['peak_memory'] / 2 ** 20:>11.3f}")
+
+                transaction.set_rollback(True)
+        finally:
+            repositories.invalidate_configuration_cache()
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+            self.stdout.write(f"Saved {len(results)} results to {options['output']}.")
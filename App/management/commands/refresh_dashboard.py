@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from App.services import refresh_dashboard_snapshot
+
+
+class Command(BaseCommand):
+    """
+    Management command materializing the dashboard statistics as snapshots.
+
+    Usage:
+        python manage.py refresh_dashboard --interval 60
+
+    The command computes the dashboard statistics and saves them as a new snapshot every 'interval' seconds,
+    so the dashboard view only reads the latest snapshot instead of calling the API and computing the
+    statistics on each request. Without '--interval', a single snapshot is saved.
+    """
+    help = "Compute the dashboard statistics and save them as snapshots, once or every --interval seconds."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help="Seconds between two snapshots. Default is 0, which saves a single snapshot and exits."
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+
+        while True:
+            started_at = time.monotonic()
+            self.refresh()
+
+            if interval <= 0:
+                break
+
+            # Wait for the rest of the interval, taking the refresh duration into account.
+            time.sleep(max(0.0, interval - (time.monotonic() - started_at)))
+
+    def refresh(self):
+        try:
+            snapshot = refresh_dashboard_snapshot()
+        except Exception as error:
+            # Keep the worker running: the dashboard serves the previous snapshot until the next refresh.
+            self.stderr.write(f"Dashboard refresh failed: {error}")
+            return
+
+        if snapshot is None:
+            self.stderr.write("Dashboard refresh skipped: the configuration is not available.")
+        else:
+            self.stdout.write(f"Saved dashboard snapshot version {snapshot.version} at {snapshot.created_at:%H:%M:%S}.")
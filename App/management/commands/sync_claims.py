@@ -0,0 +1,75 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from App.rollups import rebuild_rollups
+from App.sync import sync_from_api
+
+
+class Command(BaseCommand):
+    """
+    Management command synchronizing the claims of the API into the local store.
+
+    Usage:
+        python manage.py sync_claims --interval 60
+
+    The command requests the records changed since the last synchronization and upserts them into the local
+    tables every 'interval' seconds, so the dashboard can compute its statistics with SQL queries over the
+    indexed claims (see 'DASHBOARD_SOURCE'). Without '--interval', a single synchronization is run. With
+    '--full', every record is requested again, whatever the stored cursor. With '--rebuild-rollups', the daily
+    and monthly rollups are recomputed from the stored claims first, e.g. for claims stored before the rollups.
+    """
+    help = "Synchronize the claims of the API into the local store, once or every --interval seconds."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help="Seconds between two synchronizations. Default is 0, which synchronizes once and exits."
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help="Request every record of the API instead of the records changed since the last synchronization."
+        )
+        parser.add_argument(
+            '--rebuild-rollups',
+            action='store_true',
+            help="Recompute the daily and monthly rollups from the stored claims before synchronizing."
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        full = options['full']
+
+        if options['rebuild_rollups']:
+            with transaction.atomic():
+                rows = rebuild_rollups()
+            self.stdout.write(f"Rebuilt {rows} rollup rows.")
+
+        while True:
+            started_at = time.monotonic()
+            self.sync(full)
+
+            if interval <= 0:
+                break
+
+            # Only the first synchronization is a full one, the next ones resume from the new cursor.
+            full = False
+
+            # Wait for the rest of the interval, taking the synchronization duration into account.
+            time.sleep(max(0.0, interval - (time.monotonic() - started_at)))
+
+    def sync(self, full):
+        try:
+            counts = sync_from_api(full=full)
+        except Exception as error:
+            # Keep the worker running: the store keeps the previous records until the next synchronization.
+            self.stderr.write(f"Claims synchronization failed: {error}")
+            return
+
+        cursor = counts.pop('cursor')
+        summary = ', '.join(f"{count} {resource}" for resource, count in counts.items())
+        self.stdout.write(f"Synchronized {summary} (cursor: {cursor}).")
@@ -0,0 +1,211 @@
+import math
+import threading
+
+# Buckets of the histograms of durations, in seconds.
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Buckets of the histograms of sizes, in bytes: 1 KiB to 1 GiB.
+BYTES_BUCKETS = tuple(1024 * 4 ** i for i in range(11))
+
+# Buckets of the histograms of numbers of claims.
+CLAIMS_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+class Metric:
+    """
+    Base class of the metrics of a registry, with a value per combination of label values.
+
+    Parameters:
+        name (str): The name of the metric, e.g. 'dashboard_upstream_errors_total'.
+        documentation (str): The help text of the metric.
+        labelnames (tuple): The names of the labels of the metric. Default is no label.
+        registry (Registry): The registry exposing the metric. Default is the registry of the dashboard.
+    """
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric {self.name} expects the labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+
+    def samples(self):
+        """
+        Return the samples of the metric, as (name suffix, labels, value) tuples.
+        """
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """
+    Metric counting events, which only increases.
+    """
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self.values.get(self.key(labels), 0)
+
+    def samples(self):
+        with self.lock:
+            return [('', dict(zip(self.labelnames, key)), value) for key, value in sorted(self.values.items())]
+
+
+class Gauge(Metric):
+    """
+    Metric holding a value which may go up and down, e.g. the age of the latest snapshot.
+    """
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def value(self, **labels):
+        return self.values.get(self.key(labels))
+
+    def samples(self):
+        with self.lock:
+            return [('', dict(zip(self.labelnames, key)), value) for key, value in sorted(self.values.items())]
+
+
+class Histogram(Metric):
+    """
+    Metric counting observations (e.g. durations) in cumulative buckets, with their sum and count.
+
+    Parameters:
+        buckets (tuple): The upper bounds of the buckets, in ascending order. A '+Inf' bucket is always added.
+    """
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=SECONDS_BUCKETS, registry=None):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                # Observations of each bucket (the last one is '+Inf'), sum and count.
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            else:
+                entry[0][-1] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def count(self, **labels):
+        entry = self.values.get(self.key(labels))
+        return entry[2] if entry else 0
+
+    def samples(self):
+        samples = []
+        with self.lock:
+            for key, (counts, total, count) in sorted(self.values.items()):
+                labels = dict(zip(self.labelnames, key))
+                cumulated = 0
+                for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                    cumulated += bucket_count
+                    samples.append(('_bucket', {**labels, 'le': _format_value(bound)}, cumulated))
+                samples.append(('_sum', labels, total))
+                samples.append(('_count', labels, count))
+        return samples
+
+
+class Registry:
+    """
+    Collection of metrics, rendered in the Prometheus text exposition format.
+
+    The metrics are held in the memory of the process: with several worker processes, each worker exposes
+    its own metrics, and Prometheus aggregates the instances.
+    """
+
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+
+    def clear(self):
+        """
+        Reset the values of every metric.
+        """
+        for metric in self.metrics.values():
+            metric.clear()
+
+    def render(self):
+        """
+        Render the metrics in the Prometheus text exposition format (version 0.0.4).
+
+        Returns:
+            str: The '# HELP' and '# TYPE' lines of each metric, followed by its samples.
+        """
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f'# HELP {metric.name} {_escape(metric.documentation, quote=False)}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for suffix, labels, value in metric.samples():
+                label_text = ','.join(f'{name}="{_escape(str(label))}"' for name, label in labels.items())
+                lines.append(f'{metric.name}{suffix}{{{label_text}}} {_format_value(value)}' if label_text
+                             else f'{metric.name}{suffix} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(text, quote=True):
+    text = text.replace('\\', '\\\\').replace('\n', '\\n')
+    return text.replace('"', '\\"') if quote else text
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return repr(value)
+    return str(value)
+
+
+# Registry of the metrics of the dashboard, exposed by the '/metrics' view.
+REGISTRY = Registry()
+
+UPSTREAM_REQUEST_SECONDS = Histogram(
+    'dashboard_upstream_request_seconds', "Duration of the requests to the API, until the response headers.",
+    ['client'])
+UPSTREAM_RESPONSE_BYTES = Histogram(
+    'dashboard_upstream_response_bytes', "Size of the bodies of the API responses.", ['client'], BYTES_BUCKETS)
+UPSTREAM_ERRORS = Counter(
+    'dashboard_upstream_errors_total', "Failed requests to the API, by exception type.", ['client', 'error'])
+UPSTREAM_CACHE_REQUESTS = Counter(
+    'dashboard_upstream_cache_requests_total',
+    "Reads of the cached API payload: 'hit' (fresh), 'stale' (served while revalidated) or 'miss' (fetched).",
+    ['result'])
+SNAPSHOT_AGE_SECONDS = Gauge(
+    'dashboard_snapshot_age_seconds', "Age of the latest dashboard snapshot, when the metrics were scraped.")
+SNAPSHOT_VERSION = Gauge(
+    'dashboard_snapshot_version', "Version of the latest dashboard snapshot, when the metrics were scraped.")
+STAGE_SECONDS = Histogram(
+    'dashboard_stage_seconds', "Duration of the stages and KPI functions timed by 'App.timing'.", ['stage'])
+CLAIMS_PER_COMPUTATION = Histogram(
+    'dashboard_claims_per_computation', "Number of published claims counted by each computation of the dashboard "
+    "statistics, by source.", ['source'], CLAIMS_BUCKETS)
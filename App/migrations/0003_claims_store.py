@@ -0,0 +1,59 @@
+# Generated by Django 4.2.3 on 2026-10-18 11:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0002_dashboardsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Claim',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('message', models.TextField(blank=True, null=True)),
+                ('status', models.CharField(blank=True, max_length=64, null=True)),
+                ('category', models.IntegerField(db_index=True, null=True)),
+                ('employee', models.IntegerField(db_index=True, null=True)),
+                ('publish_date', models.DateTimeField(db_index=True, null=True)),
+                ('start_date', models.DateTimeField(null=True)),
+                ('end_date', models.DateTimeField(null=True)),
+                ('close_date', models.DateTimeField(db_index=True, null=True)),
+                ('close', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Department',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(blank=True, max_length=255, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Employee',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('department', models.IntegerField(db_index=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SyncCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(max_length=64, unique=True)),
+                ('value', models.CharField(max_length=64, null=True)),
+                ('synced_at', models.DateTimeField(null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.3 on 2026-10-18 11:42
+
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0003_claims_store'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='claim',
+            name='department',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.CreateModel(
+            name='MonthlyClaimRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(db_index=True)),
+                ('category', models.IntegerField(null=True)),
+                ('department', models.IntegerField(null=True)),
+                ('published', models.IntegerField(default=0)),
+                ('closed', models.IntegerField(default=0)),
+                ('started', models.IntegerField(default=0)),
+                ('ended', models.IntegerField(default=0)),
+                ('response_time', models.DurationField(default=datetime.timedelta)),
+                ('ending_time', models.DurationField(default=datetime.timedelta)),
+            ],
+            options={
+                'abstract': False,
+                'unique_together': {('period', 'category', 'department')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyClaimRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(db_index=True)),
+                ('category', models.IntegerField(null=True)),
+                ('department', models.IntegerField(null=True)),
+                ('published', models.IntegerField(default=0)),
+                ('closed', models.IntegerField(default=0)),
+                ('started', models.IntegerField(default=0)),
+                ('ended', models.IntegerField(default=0)),
+                ('response_time', models.DurationField(default=datetime.timedelta)),
+                ('ending_time', models.DurationField(default=datetime.timedelta)),
+            ],
+            options={
+                'abstract': False,
+                'unique_together': {('period', 'category', 'department')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.3 on 2026-10-18 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0004_claim_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='monthlyclaimrollup',
+            name='ending_time_sketch',
+            field=models.JSONField(null=True),
+        ),
+        migrations.AddField(
+            model_name='monthlyclaimrollup',
+            name='response_time_sketch',
+            field=models.JSONField(null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.3 on 2026-10-18 12:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('App', '0005_rollup_time_sketches'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dashboardsnapshot',
+            name='performance_counts',
+            field=models.JSONField(null=True),
+        ),
+    ]
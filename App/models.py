@@ -1,4 +1,7 @@
+from datetime import timedelta
+
 from django.db import models
+from django.utils import timezone
 
 
 class Configuration(models.Model):
@@ -12,4 +15,161 @@ class Configuration(models.Model):
     """
     total_employees = models.IntegerField()
     total_units = models.IntegerField()
-    performance_hours_offset = models.IntegerField()
\ No newline at end of file
+    performance_hours_offset = models.IntegerField()
+
+
+class DashboardSnapshot(models.Model):
+    """
+    Model representing a materialized version of the dashboard statistics.
+
+    Attributes:
+        version (PositiveIntegerField): The version of the snapshot, incremented at each refresh.
+        created_at (DateTimeField): The date and time the statistics were computed.
+        data (JSONField): The dashboard statistics, as returned by 'services.dashboard_data()'.
+        performance_counts (JSONField): The hourly publish and close counts the statistics were computed from,
+                                        to recompute the performance of another offset (see
+                                        'indexes.HourlyPerformanceIndex'), or None if they were not saved.
+    """
+    version = models.PositiveIntegerField(unique=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    data = models.JSONField()
+    performance_counts = models.JSONField(null=True)
+
+
+class Claim(models.Model):
+    """
+    Model representing a claim of the API, synchronized by the 'sync_claims' command.
+
+    Attributes:
+        id (IntegerField): The id of the claim in the API.
+        message (TextField): The message of the claim.
+        status (CharField): The status of the claim (e.g. 'pending', 'proceed', 'finish').
+        category (IntegerField): The id of the category of the claim.
+        employee (IntegerField): The id of the user who published the claim.
+        publish_date, start_date, end_date, close_date (DateTimeField): The dates of the claim, if any.
+        close (BooleanField): Whether the claim is closed.
+        updated_at (DateTimeField): The date the claim was last updated in the API, if the API provides it.
+        department (IntegerField): The id of the department of the employee when the claim was last synchronized,
+                                   i.e. the department the claim is counted in by the rollups.
+
+    The references to categories and users are plain ids, like in the API, so claims can be stored before
+    the records they refer to. The columns filtered and grouped by the dashboard are indexed.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    message = models.TextField(null=True, blank=True)
+    status = models.CharField(max_length=64, null=True, blank=True)
+    category = models.IntegerField(null=True, db_index=True)
+    employee = models.IntegerField(null=True, db_index=True)
+    publish_date = models.DateTimeField(null=True, db_index=True)
+    start_date = models.DateTimeField(null=True)
+    end_date = models.DateTimeField(null=True)
+    close_date = models.DateTimeField(null=True, db_index=True)
+    close = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(null=True)
+    department = models.IntegerField(null=True)
+
+
+class Employee(models.Model):
+    """
+    Model representing a user of the API, i.e. an employee who may publish claims.
+
+    Attributes:
+        id (IntegerField): The id of the user in the API.
+        department (IntegerField): The id of the department of the user.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    department = models.IntegerField(null=True, db_index=True)
+
+
+class Category(models.Model):
+    """
+    Model representing a claim category of the API.
+
+    Attributes:
+        id (IntegerField): The id of the category in the API.
+        name (CharField): The name of the category.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    name = models.CharField(max_length=255)
+
+
+class Department(models.Model):
+    """
+    Model representing a department (unit) of the API.
+
+    Attributes:
+        id (IntegerField): The id of the department in the API.
+        name (CharField): The name of the department.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    name = models.CharField(max_length=255, null=True, blank=True)
+
+
+class SyncCursor(models.Model):
+    """
+    Model representing the watermark of the last synchronization of a resource.
+
+    Attributes:
+        resource (CharField): The synchronized resource (e.g. 'claims').
+        value (CharField): The highest value of the watermark field (e.g. 'updated_at' or 'id') synchronized.
+        synced_at (DateTimeField): The date and time of the last synchronization.
+    """
+    resource = models.CharField(max_length=64, unique=True)
+    value = models.CharField(max_length=64, null=True)
+    synced_at = models.DateTimeField(null=True)
+
+
+class ClaimRollup(models.Model):
+    """
+    Abstract model of the precomputed statistics of the published claims of a period, category and department.
+
+    Attributes:
+        period (DateField): The first day of the period the claims were published in.
+        category (IntegerField): The id of the category of the claims.
+        department (IntegerField): The id of the department of the employees who published the claims.
+        published (IntegerField): The number of published claims.
+        closed (IntegerField): The number of closed claims among them.
+        started (IntegerField): The number of started claims among them.
+        ended (IntegerField): The number of ended claims among them.
+        response_time (DurationField): The summed response times (start date - publish date) of the started claims.
+        ending_time (DurationField): The summed ending times (end date - publish date) of the ended claims.
+
+    The rows are updated incrementally by the 'sync_claims' command (see 'App.rollups'), so the statistics of
+    any number of claims are read from a few rows per period.
+    """
+    period = models.DateField(db_index=True)
+    category = models.IntegerField(null=True)
+    department = models.IntegerField(null=True)
+    published = models.IntegerField(default=0)
+    closed = models.IntegerField(default=0)
+    started = models.IntegerField(default=0)
+    ended = models.IntegerField(default=0)
+    response_time = models.DurationField(default=timedelta)
+    ending_time = models.DurationField(default=timedelta)
+
+    class Meta:
+        abstract = True
+        unique_together = ['period', 'category', 'department']
+
+
+class DailyClaimRollup(ClaimRollup):
+    """
+    Model representing the statistics of the claims published in a day (UTC), by category and department.
+    """
+
+
+class MonthlyClaimRollup(ClaimRollup):
+    """
+    Model representing the statistics of the claims published in a month (UTC), by category and department.
+    The period is the first day of the month.
+
+    Attributes:
+        response_time_sketch (JSONField): The quantile sketch of the response times of the started claims, in
+                                          microseconds (see 'App.sketches.QuantileSketch.to_dict').
+        ending_time_sketch (JSONField): The quantile sketch of the ending times of the ended claims.
+
+    The sketches of several rows are merged to estimate the percentiles of any union of months, categories
+    and departments.
+    """
+    response_time_sketch = models.JSONField(null=True)
+    ending_time_sketch = models.JSONField(null=True)
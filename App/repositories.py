@@ -1,9 +1,342 @@
+import asyncio
+import codecs
+import logging
+import math
+import threading
+import time
+import uuid
+import weakref
+from datetime import timedelta, timezone
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import httpx
 import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Sum, Q
+from django.utils import timezone as django_timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-from App.models import Configuration
+from App import constants
+from App.concurrency import SingleFlight, AsyncSingleFlight
+from App.helpers import month_index, month_index_date
+from App.metrics import UPSTREAM_REQUEST_SECONDS, UPSTREAM_RESPONSE_BYTES, UPSTREAM_ERRORS, UPSTREAM_CACHE_REQUESTS
+from App.streaming import iter_payload_records
+from App.timing import timed, timed_function
+from App.models import Configuration, DashboardSnapshot, Claim, Employee, Category, Department, DailyClaimRollup, \
+    MonthlyClaimRollup
+from App.rollups import ROLLUP_FIELDS
+from App.sketches import QuantileSketch
+from App.tables import compact_payload, compact_records
 from tawasol_dashboard.settings import env
 
+# HTTP statuses worth retrying: rate limiting and transient upstream errors.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+logger = logging.getLogger(__name__)
+
+_session = None
+_session_lock = threading.Lock()
+
+# Cached API payload as a (payload, fetched_at) tuple, and the thread refreshing it in the background.
+_cached_data = None
+_cached_data_lock = threading.Lock()
+_refresh_thread = None
+
+# Configuration cached in memory as a (generation, configuration, loaded_at) tuple. The generation, kept in the
+# shared cache, changes on every save or deletion of a configuration, which invalidates the copies of every worker
+# sharing the cache. The copies older than CONFIGURATION_CACHE_TTL seconds are read again from the database.
+CONFIGURATION_CACHE_KEY = 'configuration'
+CONFIGURATION_GENERATION_KEY = 'configuration:generation'
+_cached_configuration = None
+
+# Coalesces the concurrent calls to the API when the cache is disabled.
+upstream_flights = SingleFlight()
+
+# Asynchronous HTTP client of each event loop, and coalescing of the concurrent asynchronous calls to the API.
+_async_clients = weakref.WeakKeyDictionary()
+async_upstream_flights = AsyncSingleFlight()
+
+# Resources of the payload, which the API may also expose as separate endpoints.
+RESOURCES = (constants.CLAIMS, constants.USERS, constants.CATEGORIES, constants.DEPARTMENTS)
+
+
+def create_http_session():
+    """
+    Create an HTTP session with a pool of keep-alive connections and a retry policy.
+
+    Returns:
+        requests.Session: The configured HTTP session.
+
+    The session mounts an 'HTTPAdapter' keeping up to 'UPSTREAM_POOL_SIZE' connections alive, so requests
+    to the API reuse the TCP and TLS connections instead of opening new ones. Idempotent requests failing
+    on a connection error or a transient HTTP status are retried up to 'UPSTREAM_MAX_RETRIES' times with
+    an exponential backoff of 'UPSTREAM_RETRY_BACKOFF' seconds. Compressed responses are negotiated with
+    the 'Accept-Encoding' header.
+    """
+    retry = Retry(
+        total=settings.UPSTREAM_MAX_RETRIES,
+        backoff_factor=settings.UPSTREAM_RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset(['GET']),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings.UPSTREAM_POOL_SIZE,
+        pool_maxsize=settings.UPSTREAM_POOL_SIZE,
+        max_retries=retry
+    )
+
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({'Accept-Encoding': 'gzip, deflate', 'Connection': 'keep-alive'})
+    return session
+
+
+def get_http_session():
+    """
+    Return the HTTP session shared by all the requests of the process.
+
+    Returns:
+        requests.Session: The shared HTTP session, created on first use.
+    """
+    global _session
 
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_http_session()
+
+    return _session
+
+
+def create_async_http_client():
+    """
+    Create an asynchronous HTTP client with a pool of keep-alive connections.
+
+    Returns:
+        httpx.AsyncClient: The configured client.
+
+    The client is the asynchronous counterpart of the session returned by 'create_http_session()': it keeps
+    up to 'UPSTREAM_POOL_SIZE' connections alive, is bounded by the 'UPSTREAM_CONNECT_TIMEOUT' and
+    'UPSTREAM_READ_TIMEOUT' settings and negotiates compressed responses. Its transport retries the
+    connection errors up to 'UPSTREAM_MAX_RETRIES' times; unlike the session, it does not retry on error
+    statuses.
+    """
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=settings.UPSTREAM_POOL_SIZE,
+                            max_keepalive_connections=settings.UPSTREAM_POOL_SIZE),
+        timeout=httpx.Timeout(settings.UPSTREAM_READ_TIMEOUT, connect=settings.UPSTREAM_CONNECT_TIMEOUT),
+        transport=httpx.AsyncHTTPTransport(retries=settings.UPSTREAM_MAX_RETRIES),
+        headers={'Accept-Encoding': 'gzip, deflate'}
+    )
+
+
+def get_async_http_client():
+    """
+    Return the asynchronous HTTP client shared by the requests served by the running event loop.
+
+    Returns:
+        httpx.AsyncClient: The shared client of the running event loop, created on first use.
+
+    A client is bound to the event loop it was first used in, hence one client per event loop. The client
+    is dropped with its event loop.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+
+    if client is None:
+        client = _async_clients[loop] = create_async_http_client()
+
+    return client
+
+
+def upstream_urls():
+    """
+    Return the URLs to call to build the API payload.
+
+    Returns:
+        dict: The URL of each resource having its own endpoint in 'UPSTREAM_RESOURCE_URLS', and the 'BASE_URL'
+              of the API under the None key when some resources have no endpoint of their own.
+    """
+    urls = {resource: settings.UPSTREAM_RESOURCE_URLS[resource] for resource in RESOURCES
+            if settings.UPSTREAM_RESOURCE_URLS.get(resource)}
+
+    if len(urls) < len(RESOURCES):
+        urls[None] = env('BASE_URL')
+
+    return urls
+
+
+def merge_payloads(responses):
+    """
+    Merge the responses of the URLs returned by 'upstream_urls()' into a single payload.
+
+    Parameters:
+        responses (dict): The JSON response of each URL, under the same keys as 'upstream_urls()'.
+
+    Returns:
+        dict: The payload, containing claims, users, categories and departments.
+
+    The response of a resource endpoint is either the list of its records, or an object holding the list
+    under the name of the resource.
+    """
+    payload = dict(responses.get(None) or {})
+
+    for resource, response in responses.items():
+        if resource is not None:
+            payload[resource] = response[resource] if isinstance(response, dict) else response
+
+    return payload
+
+
+def _authorization_headers():
+    return {'Authorization': f"Token {env('AUTHORIZATION_TOKEN')}"}
+
+
+def url_with_query(url, params):
+    """
+    Return a URL with query parameters set, keeping the other parameters of its query string.
+    """
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query.update(params)
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def page_url(url, page):
+    """
+    Return the URL of a page of a paginated endpoint.
+
+    Parameters:
+        url (str): The URL of the endpoint, possibly with a query string.
+        page (int): The number of the page, starting at 1.
+
+    Returns:
+        str: The URL with the 'UPSTREAM_PAGE_PARAM' and 'UPSTREAM_PAGE_SIZE_PARAM' query parameters set.
+    """
+    return url_with_query(url, {settings.UPSTREAM_PAGE_PARAM: page,
+                                settings.UPSTREAM_PAGE_SIZE_PARAM: settings.UPSTREAM_PAGE_SIZE})
+
+
+def page_count(first_page):
+    """
+    Return the number of pages of a paginated endpoint, from its first page.
+
+    Parameters:
+        first_page (dict): The first page, holding the records under 'results', and either the number of pages
+                           ('total_pages') or the number of records ('count').
+
+    Returns:
+        int: The number of pages, at least 1.
+
+    The number of records is divided by the number of records of the first page, not by 'UPSTREAM_PAGE_SIZE':
+    an API may ignore the requested page size or cap it (e.g. the default pagination of Django REST framework),
+    and the pages beyond the requested size would never be fetched.
+    """
+    if 'total_pages' in first_page:
+        return max(int(first_page['total_pages']), 1)
+
+    page_size = len(first_page['results']) or settings.UPSTREAM_PAGE_SIZE
+    return max(math.ceil(int(first_page.get('count', 0)) / page_size), 1)
+
+
+def fetch_json(url):
+    """
+    Send a GET request with the authorization headers through the shared session, and parse the JSON response.
+
+    Raises:
+        requests.RequestException: If the API cannot be reached within the timeouts and retries, or if it
+                                   responds with an error status.
+    """
+    try:
+        # Send a GET request to the API with the authorization token in the headers.
+        with timed('upstream'):
+            started_at = time.perf_counter()
+            response = get_http_session().get(
+                url,
+                headers=_authorization_headers(),
+                timeout=(settings.UPSTREAM_CONNECT_TIMEOUT, settings.UPSTREAM_READ_TIMEOUT)
+            )
+            UPSTREAM_REQUEST_SECONDS.observe(time.perf_counter() - started_at, client='sync')
+
+        # Fail on error statuses left after the retries instead of parsing an error page.
+        response.raise_for_status()
+    except requests.RequestException as error:
+        UPSTREAM_ERRORS.inc(client='sync', error=type(error).__name__)
+        raise
+
+    UPSTREAM_RESPONSE_BYTES.observe(len(response.content), client='sync')
+
+    # Set the response encoding to 'utf-8'.
+    response.encoding = "utf-8"
+
+    # Parse the JSON data.
+    with timed('decode'):
+        return response.json()
+
+
+def iter_paginated_records(url):
+    """
+    Yield the records of a paginated endpoint, in the order of the pages.
+
+    Parameters:
+        url (str): The URL of the endpoint.
+
+    Yields:
+        The records of the 'results' of each page.
+
+    With the 'page' pagination ('UPSTREAM_PAGINATION'), the first page gives the number of pages, and the
+    following pages are fetched concurrently by up to 'UPSTREAM_PAGE_WORKERS' threads sharing the pooled
+    session. At most 'UPSTREAM_PAGE_WORKERS' pages are requested ahead of the page being yielded, so the
+    memory held by the pages does not grow with the number of pages.
+
+    With the 'cursor' pagination, each page gives the URL of the next one in 'next', so the pages are
+    fetched one after the other.
+    """
+    if settings.UPSTREAM_PAGINATION == 'cursor':
+        while url:
+            page = fetch_json(url)
+            yield from page['results']
+            url = page.get('next')
+        return
+
+    first_page = fetch_json(page_url(url, 1))
+    yield from first_page['results']
+
+    pages = iter(range(2, page_count(first_page) + 1))
+    executor = ThreadPoolExecutor(max_workers=settings.UPSTREAM_PAGE_WORKERS)
+    try:
+        # Sliding window of requested pages, yielded in order as soon as they are received.
+        pending = deque(executor.submit(fetch_json, page_url(url, page))
+                        for page in islice(pages, settings.UPSTREAM_PAGE_WORKERS))
+        while pending:
+            page = pending.popleft().result()
+            for next_page in islice(pages, 1):
+                pending.append(executor.submit(fetch_json, page_url(url, next_page)))
+            yield from page['results']
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def fetch_resource(url):
+    """
+    Fetch the records of a resource endpoint, page by page when the endpoint is paginated.
+    """
+    if settings.UPSTREAM_PAGINATION:
+        return list(iter_paginated_records(url))
+
+    return fetch_json(url)
+
+
+@timed_function('fetch')
 def fetch_data_from_api():
     """
     Fetch data from an API using a GET request with authorization headers.
@@ -11,40 +344,474 @@ def fetch_data_from_api():
     Returns:
         dict: A dictionary containing the JSON response from the API.
 
+    Raises:
+        requests.RequestException: If the API cannot be reached within the timeouts and retries, or if it
+                                   responds with an error status.
+
     The method sends a GET request to the API endpoint specified in the 'BASE_URL' environment variable.
     It includes an authorization token in the request headers, retrieved from the 'AUTHORIZATION_TOKEN'
-    environment variable.
+    environment variable. The request goes through the shared pooled session and is bounded by the
+    'UPSTREAM_CONNECT_TIMEOUT' and 'UPSTREAM_READ_TIMEOUT' settings.
+
+    When resources have their own endpoint in 'UPSTREAM_RESOURCE_URLS', they are fetched from it, one after
+    the other (see 'afetch_data_from_api()' for concurrent calls), and merged with 'merge_payloads()'. Resource
+    endpoints may be paginated, see 'iter_paginated_records()'.
 
     The response is expected to be in JSON format. The method sets the response encoding to 'utf-8' and
     returns the JSON data as a Python dictionary.
     """
-    # Send a GET request to the API with the authorization token in the headers.
-    response = requests.get(env('BASE_URL'), headers={'Authorization': f"Token {env('AUTHORIZATION_TOKEN')}"})
+    urls = upstream_urls()
 
-    # Set the response encoding to 'utf-8'.
+    # A single call to the 'BASE_URL' returns the payload as is.
+    if list(urls) == [None]:
+        return fetch_json(urls[None])
+
+    return merge_payloads({resource: fetch_json(url) if resource is None else fetch_resource(url)
+                           for resource, url in urls.items()})
+
+
+def stream_json_records(url):
+    """
+    Send a GET request with the authorization headers and decode the JSON response while it is received.
+
+    Yields:
+        tuple: (key, record) for each record of each array of the response, see 'streaming.iter_payload_records'.
+
+    The response body is read in chunks of 'UPSTREAM_STREAM_CHUNK_SIZE' bytes instead of being loaded at once.
+    """
+    try:
+        started_at = time.perf_counter()
+        response = get_http_session().get(
+            url,
+            headers=_authorization_headers(),
+            timeout=(settings.UPSTREAM_CONNECT_TIMEOUT, settings.UPSTREAM_READ_TIMEOUT),
+            stream=True
+        )
+        UPSTREAM_REQUEST_SECONDS.observe(time.perf_counter() - started_at, client='stream')
+        response.raise_for_status()
+    except requests.RequestException as error:
+        UPSTREAM_ERRORS.inc(client='stream', error=type(error).__name__)
+        raise
+
+    with response:
+        received = [0]
+        try:
+            yield from iter_payload_records(
+                _decoded_chunks(response.iter_content(settings.UPSTREAM_STREAM_CHUNK_SIZE), received))
+        except requests.RequestException as error:
+            UPSTREAM_ERRORS.inc(client='stream', error=type(error).__name__)
+            raise
+        finally:
+            UPSTREAM_RESPONSE_BYTES.observe(received[0], client='stream')
+
+
+def _decoded_chunks(chunks, received):
+    # Decode the UTF-8 chunks of a response body, counting their bytes in 'received[0]'.
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    for chunk in chunks:
+        received[0] += len(chunk)
+        yield decoder.decode(chunk)
+    yield decoder.decode(b'', final=True)
+
+
+def stream_records_from_api(since=None):
+    """
+    Fetch the API payload record by record.
+
+    Parameters:
+        since (str or None): If set, only the records changed since this watermark are requested, by sending it
+                             in the 'UPSTREAM_SYNC_PARAM' query parameter. Default is None, which requests
+                             every record.
+
+    Yields:
+        tuple: (resource, record) for each claim, user, category and department of the payload, e.g.
+               ('claims', {...}).
+
+    Raises:
+        requests.RequestException: If the API cannot be reached within the timeouts and retries, or if it
+                                   responds with an error status.
+        ValueError: If a response is not valid JSON.
+
+    The streaming counterpart of 'fetch_data_from_api()', calling the same URLs. The responses are decoded
+    incrementally and each record is yielded as soon as it is decoded, so a consumer handling the records one
+    by one (e.g. the 'DashboardAggregator') never holds the whole payload in memory.
+    """
+    urls = upstream_urls()
+
+    for resource, url in urls.items():
+        if since is not None:
+            url = url_with_query(url, {settings.UPSTREAM_SYNC_PARAM: since})
+
+        if resource is not None and settings.UPSTREAM_PAGINATION:
+            # Paginated endpoints already bound the memory to a few pages.
+            for record in iter_paginated_records(url):
+                yield resource, record
+            continue
+
+        for key, record in stream_json_records(url):
+            if resource is not None:
+                # A resource endpoint returns its records, or an object holding them under the resource name.
+                if key is None or key == resource:
+                    yield resource, record
+            elif key not in urls:
+                # The resources having their own endpoint are not read from the 'BASE_URL' payload.
+                yield key, record
+
+
+async def afetch_json(client, url):
+    """
+    Send a GET request with the authorization headers through an asynchronous client, and parse the JSON response.
+    """
+    try:
+        with timed('upstream'):
+            started_at = time.perf_counter()
+            response = await client.get(url, headers=_authorization_headers())
+            UPSTREAM_REQUEST_SECONDS.observe(time.perf_counter() - started_at, client='async')
+        response.raise_for_status()
+    except httpx.HTTPError as error:
+        UPSTREAM_ERRORS.inc(client='async', error=type(error).__name__)
+        raise
+
+    UPSTREAM_RESPONSE_BYTES.observe(len(response.content), client='async')
     response.encoding = "utf-8"
+    with timed('decode'):
+        return response.json()
+
+
+async def afetch_resource(client, url):
+    """
+    Fetch the records of a resource endpoint asynchronously, page by page when the endpoint is paginated.
+
+    The asynchronous counterpart of 'fetch_resource()': with the 'page' pagination, the pages following the
+    first one are fetched concurrently, at most 'UPSTREAM_PAGE_WORKERS' at a time, and merged in page order.
+    """
+    if not settings.UPSTREAM_PAGINATION:
+        return await afetch_json(client, url)
+
+    records = []
+
+    if settings.UPSTREAM_PAGINATION == 'cursor':
+        while url:
+            page = await afetch_json(client, url)
+            records.extend(page['results'])
+            url = page.get('next')
+        return records
+
+    first_page = await afetch_json(client, page_url(url, 1))
+    records.extend(first_page['results'])
+    semaphore = asyncio.Semaphore(settings.UPSTREAM_PAGE_WORKERS)
+
+    async def fetch_page(page):
+        async with semaphore:
+            return await afetch_json(client, page_url(url, page))
+
+    for page in await asyncio.gather(*(fetch_page(page) for page in range(2, page_count(first_page) + 1))):
+        records.extend(page['results'])
+    return records
+
+
+async def afetch_data_from_api():
+    """
+    Fetch the API payload asynchronously.
+
+    Returns:
+        dict: A dictionary containing the JSON response from the API.
 
-    # Parse the JSON data and return it as a Python dictionary.
-    return response.json()
+    Raises:
+        httpx.HTTPError: If the API cannot be reached within the timeouts and retries, or if it responds with
+                         an error status.
+
+    The asynchronous counterpart of 'fetch_data_from_api()'. The URLs returned by 'upstream_urls()' are
+    called concurrently through the client of the running event loop, so the payload takes as long as the
+    slowest endpoint instead of the sum of all of them, and no thread is blocked while waiting for the API.
+    """
+    client = get_async_http_client()
+    urls = upstream_urls()
+
+    if list(urls) == [None]:
+        return await afetch_json(client, urls[None])
+
+    results = await asyncio.gather(*(afetch_json(client, url) if resource is None else afetch_resource(client, url)
+                                     for resource, url in urls.items()))
+    return merge_payloads(dict(zip(urls, results)))
+
+
+def fetch_cacheable_data_from_api():
+    """
+    Fetch the API payload in the form kept by the payload cache.
+
+    Returns:
+        dict: The payload returned by 'fetch_data_from_api()' or, with 'UPSTREAM_COMPACT_CACHE', its compact form
+              (see 'tables.compact_payload()'), whose claims and users are held by a ClaimTable.
+
+    With both 'UPSTREAM_COMPACT_CACHE' and 'UPSTREAM_STREAMING', the records of the payload are decoded while it
+    is received and stored in the ClaimTable one by one, so the payload is never loaded whole.
+    """
+    if settings.UPSTREAM_COMPACT_CACHE and settings.UPSTREAM_STREAMING:
+        return compact_records(stream_records_from_api())
+
+    payload = fetch_data_from_api()
+    return compact_payload(payload) if settings.UPSTREAM_COMPACT_CACHE else payload
+
+
+async def afetch_cacheable_data_from_api():
+    """
+    Fetch the API payload asynchronously in the form kept by the payload cache, see
+    'fetch_cacheable_data_from_api()'. The payload is compacted in a worker thread, off the event loop. A streamed
+    payload is received by the synchronous client in that thread.
+    """
+    if settings.UPSTREAM_COMPACT_CACHE and settings.UPSTREAM_STREAMING:
+        return await sync_to_async(fetch_cacheable_data_from_api, thread_sensitive=False)()
+
+    payload = await afetch_data_from_api()
+    if settings.UPSTREAM_COMPACT_CACHE:
+        return await sync_to_async(compact_payload, thread_sensitive=False)(payload)
+    return payload
+
+
+def fetch_cached_data_from_api():
+    """
+    Fetch the API payload through a stale-while-revalidate cache.
+
+    Returns:
+        dict: A dictionary containing the JSON response from the API, in its compact form with
+              'UPSTREAM_COMPACT_CACHE' (see 'fetch_cacheable_data_from_api()').
 
+    The payload is kept in memory for 'UPSTREAM_CACHE_TTL' seconds, during which it is returned without
+    calling the API. Once the TTL is over, the stale payload is still returned immediately while a single
+    background thread fetches a fresh one, so the API is called at most once per TTL whatever the number
+    of requests, and no request waits for the API except the very first one.
 
+    If 'UPSTREAM_CACHE_TTL' is 0 or less, the cache is disabled and the API is called on every request.
+    """
+    if settings.UPSTREAM_CACHE_TTL <= 0:
+        # Concurrent requests still share a single API call.
+        UPSTREAM_CACHE_REQUESTS.inc(result='miss')
+        return upstream_flights.do('upstream_payload', fetch_data_from_api)
+
+    cached_data = _cached_data
+
+    if cached_data is None:
+        # Nothing to serve yet: the first requests wait for a single fetch.
+        UPSTREAM_CACHE_REQUESTS.inc(result='miss')
+        with _cached_data_lock:
+            if _cached_data is None:
+                refresh_cached_data()
+            cached_data = _cached_data
+    elif time.monotonic() - cached_data[1] >= settings.UPSTREAM_CACHE_TTL:
+        # Serve the stale payload and revalidate it in the background.
+        UPSTREAM_CACHE_REQUESTS.inc(result='stale')
+        refresh_cached_data_in_background()
+    else:
+        UPSTREAM_CACHE_REQUESTS.inc(result='hit')
+
+    return cached_data[0]
+
+
+def refresh_cached_data():
+    """
+    Fetch the API payload and store it in the cache.
+
+    Returns:
+        dict: The fresh payload.
+    """
+    global _cached_data
+
+    payload = fetch_cacheable_data_from_api()
+    _cached_data = (payload, time.monotonic())
+    return payload
+
+
+async def afetch_cached_data_from_api():
+    """
+    Fetch the API payload asynchronously through the stale-while-revalidate cache.
+
+    Returns:
+        dict: A dictionary containing the JSON response from the API.
+
+    The asynchronous counterpart of 'fetch_cached_data_from_api()', sharing the same cached payload. When
+    there is no payload to serve yet, the concurrent requests of the event loop await a single call to the
+    API; a stale payload is revalidated by the same background thread as the synchronous path.
+    """
+    if settings.UPSTREAM_CACHE_TTL <= 0:
+        UPSTREAM_CACHE_REQUESTS.inc(result='miss')
+        return await async_upstream_flights.do('upstream_payload', afetch_data_from_api)
+
+    cached_data = _cached_data
+
+    if cached_data is None:
+        UPSTREAM_CACHE_REQUESTS.inc(result='miss')
+        return await async_upstream_flights.do('upstream_payload', arefresh_cached_data)
+
+    if time.monotonic() - cached_data[1] >= settings.UPSTREAM_CACHE_TTL:
+        UPSTREAM_CACHE_REQUESTS.inc(result='stale')
+        refresh_cached_data_in_background()
+    else:
+        UPSTREAM_CACHE_REQUESTS.inc(result='hit')
+
+    return cached_data[0]
+
+
+async def arefresh_cached_data():
+    """
+    Fetch the API payload asynchronously and store it in the cache.
+
+    Returns:
+        dict: The fresh payload.
+    """
+    global _cached_data
+
+    payload = await afetch_cacheable_data_from_api()
+    _cached_data = (payload, time.monotonic())
+    return payload
+
+
+def refresh_cached_data_in_background():
+    """
+    Start a background thread refreshing the cached payload, unless one is already running.
+
+    Returns:
+        threading.Thread or None: The started thread, or None if a refresh is already running.
+    """
+    global _refresh_thread
+
+    with _cached_data_lock:
+        if _refresh_thread is not None and _refresh_thread.is_alive():
+            return None
+
+        _refresh_thread = threading.Thread(target=_refresh_cached_data_safely, daemon=True)
+        _refresh_thread.start()
+        return _refresh_thread
+
+
+def _refresh_cached_data_safely():
+    # A failed refresh keeps serving the stale payload; the next request past the TTL retries.
+    try:
+        refresh_cached_data()
+    except Exception:
+        logger.exception("Background refresh of the API payload failed")
+
+
+def get_cached_data():
+    """
+    Return the API payload held by the cache, even if it is stale, without calling the API.
+
+    Returns:
+        dict or None: The cached payload, or None if no payload was fetched by this process yet.
+    """
+    cached_data = _cached_data
+    return cached_data[0] if cached_data is not None else None
+
+
+def clear_cached_data():
+    """
+    Drop the cached API payload, so the next request fetches it again.
+    """
+    global _cached_data
+
+    with _cached_data_lock:
+        _cached_data = None
+
+
+def set_cached_data(payload):
+    """
+    Store a payload in the cache as if it was just fetched, e.g. the synthetic payload of the 'benchmark' command.
+    """
+    global _cached_data
+
+    with _cached_data_lock:
+        _cached_data = (payload, time.monotonic())
+
+
+@timed_function('configuration')
 def get_configuration():
     """
-    Retrieve the configuration data from the database.
+    Retrieve the configuration data, from the cache or from the database.
 
     Returns:
         Configuration or None: The Configuration object if found, otherwise returns None.
 
-    This function queries the database for the Configuration object using the 'objects' manager of the
-    Configuration model. It retrieves the first configuration object found in the database and returns it.
-    If no configuration object is found, it returns None.
+    The configuration changes rarely, so it is kept in memory instead of being queried on every request. The
+    copy held in memory is checked against the generation of the configuration in the shared cache, which is
+    renewed by 'invalidate_configuration_cache()' whenever a configuration is saved or deleted (see
+    'App.signals'). A worker whose copy is outdated reads the configuration from the shared cache, and only
+    queries the database if no other worker did it since the invalidation.
+
+    The generation only reaches the processes sharing the cache: with the default in-process cache, the other
+    workers and the 'refresh_dashboard' and 'sync_claims' processes do not see it, and neither does any process
+    when the configuration is updated without the signals. So the copies are also read again from the database
+    once they are older than 'CONFIGURATION_CACHE_TTL' seconds.
     """
-    try:
-        configuration = Configuration.objects.first()  # Retrieve the first Configuration object from the database
-    except Configuration.DoesNotExist:
-        configuration = None  # If no Configuration object is found, set 'configuration' to None
+    global _cached_configuration
+
+    # Read the current generation of the configuration.
+    generation = cache.get(CONFIGURATION_GENERATION_KEY)
+    if generation is None:
+        cache.add(CONFIGURATION_GENERATION_KEY, uuid.uuid4().hex, None)
+        generation = cache.get(CONFIGURATION_GENERATION_KEY)
+
+    # Return the copy held in memory if it is up-to-date.
+    cached_configuration = _cached_configuration
+    if _is_current_configuration(cached_configuration, generation):
+        return cached_configuration[1]
+
+    # Otherwise, read the copy of the shared cache, or the configuration of the database.
+    cached_configuration = cache.get(CONFIGURATION_CACHE_KEY)
+    if not _is_current_configuration(cached_configuration, generation):
+        cached_configuration = (generation, Configuration.objects.first(), time.time())
+        cache.set(CONFIGURATION_CACHE_KEY, cached_configuration, None)
+
+    _cached_configuration = cached_configuration
+    return cached_configuration[1]
+
+
+async def aget_configuration():
+    """
+    Retrieve the configuration data, from the cache or from the database, with the asynchronous APIs.
 
-    return configuration
+    Returns:
+        Configuration or None: The Configuration object if found, otherwise returns None, like
+                               'get_configuration()'.
+    """
+    global _cached_configuration
+
+    generation = await cache.aget(CONFIGURATION_GENERATION_KEY)
+    if generation is None:
+        await cache.aadd(CONFIGURATION_GENERATION_KEY, uuid.uuid4().hex, None)
+        generation = await cache.aget(CONFIGURATION_GENERATION_KEY)
+
+    cached_configuration = _cached_configuration
+    if _is_current_configuration(cached_configuration, generation):
+        return cached_configuration[1]
+
+    cached_configuration = await cache.aget(CONFIGURATION_CACHE_KEY)
+    if not _is_current_configuration(cached_configuration, generation):
+        cached_configuration = (generation, await Configuration.objects.afirst(), time.time())
+        await cache.aset(CONFIGURATION_CACHE_KEY, cached_configuration, None)
+
+    _cached_configuration = cached_configuration
+    return cached_configuration[1]
+
+
+def _is_current_configuration(cached_configuration, generation):
+    # A cached copy is served if it belongs to the current generation and was read from the database recently.
+    # The wall clock is used since the copy of the shared cache may have been read by another process.
+    return (cached_configuration is not None and cached_configuration[0] == generation
+            and time.time() - cached_configuration[2] < settings.CONFIGURATION_CACHE_TTL)
+
+
+def invalidate_configuration_cache():
+    """
+    Invalidate the cached configuration of every worker.
+
+    The copy held in memory is dropped and the generation of the configuration is renewed in the shared cache,
+    so the next call to 'get_configuration()' of each worker reads the configuration again.
+    """
+    global _cached_configuration
+
+    _cached_configuration = None
+    cache.set(CONFIGURATION_GENERATION_KEY, uuid.uuid4().hex, None)
+    cache.delete(CONFIGURATION_CACHE_KEY)
 
 
 def create_configuration(form):
@@ -103,4 +870,239 @@ def update_configuration(config_id, form):
         config.save()
     except Configuration.DoesNotExist:
         # If the specified Configuration object does not exist, raise a Configuration.DoesNotExist exception.
-        raise Configuration.DoesNotExist("Configuration with the specified ID does not exist.")
\ No newline at end of file
+        raise Configuration.DoesNotExist("Configuration with the specified ID does not exist.")
+
+
+def save_dashboard_snapshot(data, created_at=None, performance_counts=None):
+    """
+    Save the dashboard statistics as a new snapshot version.
+
+    Args:
+        data (dict): The dashboard statistics to save.
+        created_at (datetime): The date and time the statistics were computed. Default is now.
+        performance_counts (dict): The hourly publish and close counts of the statistics, see
+                                   'indexes.HourlyPerformanceIndex.as_dict()'. Default is None.
+
+    Returns:
+        DashboardSnapshot: The saved snapshot.
+
+    The snapshot gets the version following the latest one. Only the 'DASHBOARD_SNAPSHOTS_KEPT' most recent
+    snapshots are kept, older versions are deleted.
+    """
+    with transaction.atomic():
+        latest = DashboardSnapshot.objects.order_by('-version').first()
+        snapshot = DashboardSnapshot.objects.create(version=latest.version + 1 if latest else 1, data=data,
+                                                    created_at=created_at or django_timezone.now(),
+                                                    performance_counts=performance_counts)
+
+        # Delete the snapshots older than the most recent ones to keep.
+        DashboardSnapshot.objects.filter(version__lte=snapshot.version - settings.DASHBOARD_SNAPSHOTS_KEPT).delete()
+
+    return snapshot
+
+
+@timed_function('snapshot')
+def get_latest_dashboard_snapshot():
+    """
+    Retrieve the most recent dashboard snapshot.
+
+    Returns:
+        DashboardSnapshot or None: The snapshot with the highest version, or None if there is no snapshot.
+
+    The performance counts of the snapshot are only read when they are accessed.
+    """
+    return DashboardSnapshot.objects.defer('performance_counts').order_by('-version').first()
+
+
+async def aget_latest_dashboard_snapshot():
+    """
+    Retrieve the most recent dashboard snapshot, with the asynchronous ORM API.
+
+    Returns:
+        DashboardSnapshot or None: The snapshot with the highest version, or None if there is no snapshot, without
+                                   its performance counts.
+    """
+    return await DashboardSnapshot.objects.defer('performance_counts').order_by('-version').afirst()
+
+
+def stored_claims_statistics(performance_hour_offsets, now):
+    """
+    Compute the statistics of the published claims of the local store which are not kept in the rollups, with a
+    single SQL aggregate query.
+
+    Args:
+        performance_hour_offsets (iterable): The offsets in hours of the performance windows ending at 'now'.
+        now (datetime): The end of the performance windows, timezone-aware.
+
+    Returns:
+        dict: The number of distinct employees having published a claim ('employees'), and for each offset, the
+              numbers of claims published and closed in its window ('windows', {offset: (published, closed)}).
+    """
+    aggregates = {'employees': Count('employee', distinct=True)}
+
+    offsets = list(dict.fromkeys(performance_hour_offsets))
+    for i, hours in enumerate(offsets):
+        window = (now - timedelta(hours=hours), now)
+        aggregates[f'window_published_{i}'] = Count('id', filter=Q(publish_date__range=window))
+        aggregates[f'window_closed_{i}'] = Count('id', filter=Q(close=True, close_date__range=window))
+
+    statistics = Claim.objects.filter(publish_date__isnull=False).aggregate(**aggregates)
+    statistics['windows'] = {hours: (statistics.pop(f'window_published_{i}'), statistics.pop(f'window_closed_{i}'))
+                             for i, hours in enumerate(offsets)}
+    return statistics
+
+
+def stored_rollup_totals():
+    """
+    Sum the monthly rollups of the local store.
+
+    Returns:
+        dict: The numbers of published, closed, started and ended claims ('published', 'closed', 'started',
+              'ended') and the summed response and ending times ('response_time', 'ending_time', timedelta).
+
+    The sums are read from a few rows per month instead of the stored claims.
+    """
+    totals = MonthlyClaimRollup.objects.aggregate(**{field: Sum(field) for field in ROLLUP_FIELDS})
+    for field in ROLLUP_FIELDS:
+        if totals[field] is None:
+            totals[field] = timedelta() if field.endswith('_time') else 0
+    return totals
+
+
+def stored_time_sketches():
+    """
+    Merge the quantile sketches of the response and ending times of the monthly rollups of the local store.
+
+    Returns:
+        tuple: The (response_time_sketch, ending_time_sketch) QuantileSketch of all the stored claims.
+    """
+    response_time_sketch = QuantileSketch(settings.QUANTILE_SKETCH_SIZE)
+    ending_time_sketch = QuantileSketch(settings.QUANTILE_SKETCH_SIZE)
+    rows = MonthlyClaimRollup.objects.values_list('response_time_sketch', 'ending_time_sketch')
+    for response_time, ending_time in rows.iterator():
+        if response_time:
+            response_time_sketch.merge(QuantileSketch.from_dict(response_time))
+        if ending_time:
+            ending_time_sketch.merge(QuantileSketch.from_dict(ending_time))
+    return response_time_sketch, ending_time_sketch
+
+
+def stored_category_counts(closed=False):
+    """
+    Count the published (or closed) claims of the local store by category, from the monthly rollups.
+
+    Returns:
+        dict: The number of claims by category id, for the categories having claims.
+    """
+    field = 'closed' if closed else 'published'
+    rows = MonthlyClaimRollup.objects.values('category').annotate(times=Sum(field)).filter(times__gt=0)
+    return {row['category']: row['times'] for row in rows}
+
+
+def stored_month_counts(months):
+    """
+    Count the published claims of the local store by month of the publish date, from the monthly rollups.
+
+    Args:
+        months (range): The month indexes of the buckets, as returned by 'helpers.month_range'.
+
+    Returns:
+        list: The number of claims of each month of the range.
+    """
+    if not len(months):
+        return []
+
+    rows = (MonthlyClaimRollup.objects
+            .filter(period__gte=month_index_date(months[0]), period__lt=month_index_date(months[-1] + 1))
+            .values('period').annotate(count=Sum('published')))
+
+    counts = [0] * len(months)
+    for row in rows:
+        counts[month_index(row['period'].year, row['period'].month) - months[0]] = row['count']
+    return counts
+
+
+def stored_daily_counts(start_date, end_date):
+    """
+    Count the published claims of the local store by day of the publish date (UTC), from the daily rollups.
+
+    Args:
+        start_date (date): The first day.
+        end_date (date): The last day (inclusive).
+
+    Returns:
+        list: The number of claims of each day, from 'start_date' to 'end_date'.
+    """
+    days = (end_date - start_date).days + 1
+    if days <= 0:
+        return []
+
+    rows = (DailyClaimRollup.objects.filter(period__range=(start_date, end_date))
+            .values('period').annotate(count=Sum('published')))
+
+    counts = [0] * days
+    for row in rows:
+        counts[(row['period'] - start_date).days] = row['count']
+    return counts
+
+
+def stored_last_claims(closed, count, key=constants.ID):
+    """
+    Return the published claims of the local store with the highest values of a column, like the API claims.
+
+    Args:
+        closed (bool): True for the closed claims, False for the unclosed ones.
+        count (int): The maximum number of claims to return.
+        key (str): The column the claims are sorted on, highest first. Default is 'id'.
+
+    Returns:
+        list: The claims, as dictionaries with the keys and date format of the API.
+    """
+    return [claim_record(claim) for claim in stored_recent_claims(closed, key)[:count]]
+
+
+def stored_recent_claims(closed, key=constants.ID):
+    """
+    Return the published claims of the local store sorted by a column, highest first, e.g. to be paginated.
+
+    Args:
+        closed (bool): True for the closed claims, False for the unclosed ones.
+        key (str): The column the claims are sorted on, highest first. Default is 'id'.
+
+    Returns:
+        QuerySet: The lazy query of the claims, each page being read with one 'LIMIT ... OFFSET' query. The
+                  claims are model instances, see 'claim_record()'.
+    """
+    return Claim.objects.filter(publish_date__isnull=False, close=closed).order_by(f'-{key}', 'id')
+
+
+def claim_record(claim):
+    """
+    Rebuild the API dictionary of a stored claim.
+    """
+    record = {
+        constants.ID: claim.id,
+        'message': claim.message,
+        'status': claim.status,
+        constants.CATEGORY: claim.category,
+        constants.EMPLOYEE: claim.employee,
+        constants.CLOSE: claim.close,
+    }
+    for key in (constants.PUBLISH_DATE, constants.START_DATE, constants.END_DATE, constants.CLOSE_DATE, 'updated_at'):
+        value = getattr(claim, key)
+        record[key] = value.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ') if value else None
+    return record
+
+
+def stored_units():
+    """
+    Return the number of distinct departments of the stored users, and the number of stored departments.
+    """
+    return Employee.objects.values('department').distinct().count(), Department.objects.count()
+
+
+def stored_categories():
+    """
+    Return the stored categories, as dictionaries with the keys of the API.
+    """
+    return list(Category.objects.order_by('id').values('id', 'name'))
@@ -0,0 +1,177 @@
+from datetime import datetime, time as datetime_time, timedelta, timezone
+
+from django.conf import settings
+from django.db.models import F
+
+from App.models import Claim, Employee, DailyClaimRollup, MonthlyClaimRollup
+from App.sketches import QuantileSketch
+
+# Statistics of the rollup rows, in the order of the delta vectors.
+ROLLUP_FIELDS = ('published', 'closed', 'started', 'ended', 'response_time', 'ending_time')
+
+# Number of claims loaded per query when the contributions of many claims are computed.
+CHUNK_SIZE = 500
+
+_ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+class RollupDeltas:
+    """
+    Pending changes of the daily and monthly rollups, accumulated while claims are synchronized.
+
+    The contribution of a claim to the rollups is a vector of statistics (one published claim, closed or not,
+    started or not, ...) added to the row of its publish day and to the row of its publish month. When a
+    stored claim changes, its previous contribution is subtracted and its new one is added, so only the
+    rows of the changed claims are touched, whatever the number of stored claims.
+
+    The deltas are summed by row in memory and written by 'apply()' with one 'UPDATE ... SET published =
+    published + ...' statement per row, so the memory used grows with the number of touched rows, not with
+    the number of changed claims.
+    """
+
+    def __init__(self):
+        # {(model, period, category, department): [published, closed, started, ended, response_time, ending_time]}
+        self.deltas = {}
+
+    def add(self, claim, sign=1):
+        """
+        Add (or subtract, with 'sign' -1) the contribution of a stored claim to the rollups of its department.
+
+        Parameters:
+            claim (Claim): The claim. Unpublished claims have no contribution.
+            sign (int): 1 to add the contribution, -1 to subtract it. Default is 1.
+        """
+        if claim.publish_date is None:
+            return
+
+        contribution = claim_contribution(claim)
+        published_on = claim.publish_date.astimezone(timezone.utc).date()
+        for model, period in ((DailyClaimRollup, published_on), (MonthlyClaimRollup, published_on.replace(day=1))):
+            delta = self.deltas.setdefault((model, period, claim.category, claim.department),
+                                           [0, 0, 0, 0, timedelta(), timedelta()])
+            for i, value in enumerate(contribution):
+                delta[i] += sign * value
+
+    def subtract(self, claim):
+        """
+        Subtract the contribution of a stored claim, before the claim is updated or deleted.
+        """
+        self.add(claim, sign=-1)
+
+    def apply(self):
+        """
+        Write the pending deltas to the rollup tables and clear them.
+
+        Returns:
+            int: The number of rollup rows touched.
+
+        The rows which do not exist yet are created. The rows left without any published claim are deleted.
+        The time sketches of the touched monthly rows are rebuilt, see 'rebuild_time_sketches()'.
+        """
+        touched = 0
+        for (model, period, category, department), delta in self.deltas.items():
+            values = dict(zip(ROLLUP_FIELDS, delta))
+            if not any(values.values()):
+                continue
+
+            touched += 1
+            rows = model.objects.filter(period=period, category=category, department=department)
+            if not rows.update(**{field: F(field) + value for field, value in values.items()}):
+                model.objects.create(period=period, category=category, department=department, **values)
+            elif values['published'] < 0:
+                rows.filter(published__lte=0).delete()
+
+        # The time sketches cannot be decremented: they are rebuilt from the claims of the touched monthly rows.
+        for model, period, category, department in self.deltas:
+            if model is MonthlyClaimRollup:
+                rebuild_time_sketches(period, category, department)
+
+        self.deltas.clear()
+        return touched
+
+
+def rebuild_time_sketches(period, category, department):
+    """
+    Recompute the quantile sketches of the response and ending times of a monthly rollup row.
+
+    Parameters:
+        period (date): The first day of the month of the row.
+        category (int): The category of the row.
+        department (int): The department of the row.
+
+    The sketches are built from the stored claims of the row, read through the index of the publish dates, so
+    a synchronization only rescans the claims of the months, categories and departments it changed.
+    """
+    month_start = datetime.combine(period, datetime_time.min, tzinfo=timezone.utc)
+    month_end = datetime.combine((period + timedelta(days=31)).replace(day=1), datetime_time.min, tzinfo=timezone.utc)
+    claims = Claim.objects.filter(publish_date__gte=month_start, publish_date__lt=month_end, category=category,
+                                  department=department)
+
+    response_time_sketch = QuantileSketch(settings.QUANTILE_SKETCH_SIZE)
+    ending_time_sketch = QuantileSketch(settings.QUANTILE_SKETCH_SIZE)
+    for publish_date, start_date, end_date in claims.values_list('publish_date', 'start_date', 'end_date').iterator():
+        if start_date is not None:
+            response_time_sketch.add((start_date - publish_date) // _ONE_MICROSECOND)
+        if end_date is not None:
+            ending_time_sketch.add((end_date - publish_date) // _ONE_MICROSECOND)
+
+    MonthlyClaimRollup.objects.filter(period=period, category=category, department=department).update(
+        response_time_sketch=response_time_sketch.to_dict(), ending_time_sketch=ending_time_sketch.to_dict())
+
+
+def claim_contribution(claim):
+    """
+    Return the contribution of a published claim to its rollup rows, in the order of 'ROLLUP_FIELDS'.
+    """
+    started = claim.start_date is not None
+    ended = claim.end_date is not None
+    return (
+        1,
+        int(bool(claim.close)),
+        int(started),
+        int(ended),
+        claim.start_date - claim.publish_date if started else timedelta(),
+        claim.end_date - claim.publish_date if ended else timedelta(),
+    )
+
+
+def add_claims(deltas, claim_ids):
+    """
+    Resolve the departments of stored claims and add their contributions to the rollups.
+
+    Parameters:
+        deltas (RollupDeltas): The pending rollup changes.
+        claim_ids (iterable): The ids of the stored claims.
+
+    The department of each claim is the current department of its employee, saved on the claim so its
+    contribution can be subtracted from the same rows when the claim changes again.
+    """
+    claim_ids = list(claim_ids)
+    for start in range(0, len(claim_ids), CHUNK_SIZE):
+        claims = list(Claim.objects.filter(pk__in=claim_ids[start:start + CHUNK_SIZE]))
+        departments = dict(Employee.objects.filter(pk__in={claim.employee for claim in claims})
+                           .values_list('id', 'department'))
+
+        for claim in claims:
+            claim.department = departments.get(claim.employee)
+            deltas.add(claim)
+        Claim.objects.bulk_update(claims, ['department'])
+
+
+def rebuild_rollups():
+    """
+    Recompute the daily and monthly rollups from every stored claim.
+
+    Returns:
+        int: The number of rollup rows written.
+
+    The incremental updates keep the rollups consistent with the stored claims; a rebuild is only needed for
+    claims stored before the rollups existed, or to count the claims in the current departments of their
+    employees.
+    """
+    DailyClaimRollup.objects.all().delete()
+    MonthlyClaimRollup.objects.all().delete()
+
+    deltas = RollupDeltas()
+    add_claims(deltas, Claim.objects.filter(publish_date__isnull=False).values_list('id', flat=True))
+    return deltas.apply()
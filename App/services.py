@@ -1,10 +1,44 @@
-from datetime import datetime
-
-from App import repositories, constants
+import threading
+from collections import Counter
+from datetime import timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.utils import timezone
+
+from App import repositories, constants, helpers
+from App.aggregation import DashboardAggregator
+from App.concurrency import SingleFlight, AsyncSingleFlight
 from App.forms import ConfigForm
-from App.helpers import sort_by_key, sub_hours_from_datetime, \
-    is_datetime_between, calculate_mean_multiple_delta_datetime_formatted, format_percentage, group_data_by_month
+from App.indexes import RecentClaimsIndex, TimestampIndex, PerformanceIndex, HourlyPerformanceIndex, ClaimsRangeIndex
+from App.metrics import CLAIMS_PER_COMPUTATION, SNAPSHOT_AGE_SECONDS, SNAPSHOT_VERSION, REGISTRY
+from App.helpers import calculate_mean_multiple_delta_datetime_formatted, format_percentage, \
+    group_data_by_month, rank_category_counts
 from App.repositories import get_configuration, create_configuration, update_configuration
+from App.sketches import distinct_counter, QuantileSketch
+from App.tables import ClaimTable
+from App.timing import timed_function
+
+# Statistics of the dashboard depending on each field of the configuration, recomputed when the field changes.
+# The total of units shown by the dashboard is the number of departments of the API, not the configured one.
+CONFIGURATION_DEPENDENCIES = {
+    'total_employees': ('total_employees', 'activated_employees_percentage'),
+    'total_units': (),
+    'performance_hours_offset': ('performance',),
+}
+
+# Coalesces the concurrent computations of the dashboard, in threads and in event loops.
+dashboard_flights = SingleFlight()
+dashboard_async_flights = AsyncSingleFlight()
+
+# Recent claims index of the latest payload, as a (payload, index) tuple.
+_recent_claims_index = None
+_recent_claims_index_lock = threading.Lock()
+
+# Date range index of the latest payload, as a (payload, index) tuple.
+_claims_range_index = None
+_claims_range_index_lock = threading.Lock()
 
 
 def dashboard_fake_data():
@@ -107,10 +141,13 @@ def dashboard_fake_data():
     }
 
 
-def dashboard_data():
+def dashboard_data(config=None):
     """
     Fetch and process data to generate the dashboard statistics.
 
+    Parameters:
+        config (Configuration): The configuration of the dashboard. Default is the saved configuration.
+
     Returns:
         dict: A dictionary containing various statistics for the dashboard.
 
@@ -120,65 +157,238 @@ def dashboard_data():
     - Number and percentage of activated employees and units
     - Mean response time and mean ending time for claims
     - Most opened and most closed claim categories with their occurrence counts
+    - Rankings of the categories of the opened and closed claims, with their shares
     - Lists of last five unclosed and closed claims
     - Best performances based on closed and published claims within a specified hour range
     - Data for bar chart and line chart visualization
 
     The function returns a dictionary containing all the generated statistics.
+
+    Concurrent calls of the process share a single computation, and with 'SINGLE_FLIGHT_SHARED_TIMEOUT', so do
+    the calls of the worker processes sharing the cache. The asynchronous dashboard runs it in a worker thread
+    in that case, see 'adashboard_data()'.
     """
     # Fetch configuration data.
-    config = repositories.get_configuration()
+    config = config or repositories.get_configuration()
 
     # If configuration data is not available, return None.
     if not config:
         return None
 
-    # Fetch data from the API.
-    data = repositories.fetch_data_from_api()
+    # Concurrent requests sharing the same configuration share a single fetch and computation.
+    return dashboard_flights.do(
+        _dashboard_key(config),
+        lambda: stored_dashboard_data(config) if settings.DASHBOARD_SOURCE == 'store'
+        else aggregate_dashboard_data(repositories.fetch_cached_data_from_api(), config),
+        shared_timeout=settings.SINGLE_FLIGHT_SHARED_TIMEOUT
+    )
 
-    # Extract relevant data from the API response.
-    claims = data[constants.CLAIMS]
-    published_claims = list(filter(lambda el: el[constants.PUBLISH_DATE], claims))
-    unclosed_claims = list(filter(lambda el: not el[constants.CLOSE], published_claims))
-    closed_claims = list(filter(lambda el: el[constants.CLOSE], published_claims))
-    ended_claims = list(filter(lambda el: el[constants.END_DATE], claims))
-    started_claims = list(filter(lambda el: el[constants.START_DATE], claims))
 
-    categories = data['categories']
-    users = data['users']
-    departments = data['departments']  # Assuming 'departments' is a list of departments obtained from somewhere
+async def adashboard_data():
+    """
+    Fetch and process data to generate the dashboard statistics, asynchronously.
 
-    # Generate data for the bar chart visualization.
-    grouped_data = group_claims_by_publish_date(published_claims)
-    bar_chart = {'data': list(grouped_data.values()), 'labels': list(grouped_data.keys())}
+    Returns:
+        dict: A dictionary containing various statistics for the dashboard, like 'dashboard_data()'.
 
-    # Generate data for the line chart visualization.
-    grouped_data_cummul = group_claims_by_publish_date_cumuli(published_claims)
-    line_chart = {'data': list(grouped_data_cummul.values()), 'labels': list(grouped_data_cummul.keys())}
+    The configuration is read with the asynchronous ORM API and the payload with the asynchronous HTTP client,
+    so the event loop serves other requests while the API responds. The statistics are then computed in a
+    worker thread, to keep the event loop responsive during the computation. With 'DASHBOARD_SOURCE' set to
+    'store', they are computed from the local store in a worker thread instead, without calling the API.
 
-    # Calculate and generate statistics for activated employees and units.
-    activated_employees = count_activated_employees(published_claims, config.total_employees)
-    activated_units = count_activated_units(users, len(departments))
+    Concurrent requests of the event loop share a single computation. With 'SINGLE_FLIGHT_SHARED_TIMEOUT', the
+    computation from the API is coalesced with the other worker processes too: 'dashboard_data()' then runs in
+    a worker thread, which waits for the worker computing the same dashboard, if any, without blocking the
+    event loop nor the thread running the database queries.
+    """
+    config = await repositories.aget_configuration()
 
-    # Calculate mean response time and mean ending time for claims.
-    mean_response_time = calculate_mean_multiple_delta_datetime_formatted(
-        started_claims, constants.PUBLISH_DATE, constants.START_DATE)
-    mean_ending_time = calculate_mean_multiple_delta_datetime_formatted(
-        ended_claims, constants.PUBLISH_DATE, constants.END_DATE)
+    if not config:
+        return None
 
-    # Find the most opened and most closed claim categories with their occurrence counts.
-    most_opened_claim_category = find_most_occurred_claim_category(published_claims, categories)
-    most_closed_claim_category = find_most_occurred_claim_category(closed_claims, categories)
+    async def compute():
+        # The queries of the local store run in the thread of the database connections.
+        if settings.DASHBOARD_SOURCE == 'store':
+            return await sync_to_async(stored_dashboard_data)(config)
+
+        if settings.SINGLE_FLIGHT_SHARED_TIMEOUT > 0:
+            return await sync_to_async(dashboard_data, thread_sensitive=False)(config)
+
+        data = await repositories.afetch_cached_data_from_api()
+        return await sync_to_async(aggregate_dashboard_data, thread_sensitive=False)(data, config)
+
+    # Concurrent requests sharing the same configuration share a single fetch and computation.
+    return await dashboard_async_flights.do(_dashboard_key(config), compute)
+
+
+def _dashboard_key(config):
+    # The key of the coalesced computations of the dashboard of a configuration.
+    return f"dashboard:{config.pk}:{config.total_employees}:{config.total_units}:{config.performance_hours_offset}"
+
+
+@timed_function('aggregate')
+def aggregate_dashboard_data(data, config):
+    """
+    Compute the dashboard statistics from the API payload in a single pass.
+
+    Parameters:
+        data (dict): The JSON payload returned by the API, containing claims, users, categories and departments,
+                     or its compact form (see 'tables.compact_payload()').
+        config (Configuration): The configuration of the dashboard.
+
+    Returns:
+        dict: A dictionary containing various statistics for the dashboard.
+
+    The function feeds the payload to a 'DashboardAggregator', which walks the claims and users once and
+    updates every statistic on the way, instead of building filtered lists of claims and scanning them
+    again for each statistic. A compact payload is computed by 'table_dashboard_data()' from its columns.
+    """
+    if isinstance(data[constants.CLAIMS], ClaimTable):
+        return table_dashboard_data(data[constants.CLAIMS], data[constants.CATEGORIES],
+                                    len(data[constants.DEPARTMENTS]), config)
+
+    aggregator = create_dashboard_aggregator(config).feed(data)
+    CLAIMS_PER_COMPUTATION.observe(aggregator.published_count, source='api')
+    return aggregator.result()
+
+
+@timed_function('stream')
+def stream_dashboard_data(config, records=None):
+    """
+    Compute the dashboard statistics while the API payload is received.
 
-    # Get the last five unclosed and closed claims sorted by some key (not specified in the code).
-    last_five_unclosed_claims = sort_by_key(unclosed_claims)[0:5]
-    last_five_closed_claims = sort_by_key(closed_claims)[0:5]
+    Parameters:
+        config (Configuration): The configuration of the dashboard.
+        records (iterable): (resource, record) tuples of the payload, e.g. the synthetic records of the 'benchmark'
+                            command. Default is the records yielded by 'repositories.stream_records_from_api()'.
+
+    Returns:
+        dict: A dictionary containing various statistics for the dashboard, like 'aggregate_dashboard_data()'.
+
+    The records yielded by 'repositories.stream_records_from_api()' go straight into a 'DashboardAggregator',
+    so the payload is never materialized: the peak memory does not grow with the size of the claims, only
+    with the few values the aggregator keeps per claim.
+    """
+    records = records if records is not None else repositories.stream_records_from_api()
+    aggregator = create_dashboard_aggregator(config).feed_records(records)
+    CLAIMS_PER_COMPUTATION.observe(aggregator.published_count, source='stream')
+    return aggregator.result()
+
+
+@timed_function('store')
+def stored_dashboard_data(config):
+    """
+    Compute the dashboard statistics from the claims synchronized into the local store.
+
+    Parameters:
+        config (Configuration): The configuration of the dashboard.
+
+    Returns:
+        dict: A dictionary containing various statistics for the dashboard, like 'aggregate_dashboard_data()'.
+
+    The statistics come from the tables filled by the 'sync_claims' command, instead of Python loops over a
+    fresh download of the API. The counts, summed times, time percentiles, categories rankings and monthly chart
+    are read from the monthly rollups, in O(months) rows whatever the number of claims. The distinct employees and the
+    performance windows, which cannot be summed from the rollups, come from one aggregate query over the
+    indexed claims, and each last claims list from one indexed 'ORDER BY ... LIMIT' query.
+    """
+    now = timezone.now()
+    offsets = [config.performance_hours_offset, *settings.DASHBOARD_PERFORMANCE_OFFSETS]
+    statistics = {**repositories.stored_claims_statistics(offsets, now), **repositories.stored_rollup_totals()}
+    CLAIMS_PER_COMPUTATION.observe(statistics['published'], source='store')
+    categories = repositories.stored_categories()
+    activated_units, total_units = repositories.stored_units()
+    opened_category_counts = repositories.stored_category_counts()
+    closed_category_counts = repositories.stored_category_counts(closed=True)
+    most_opened_claim_category = _most_occurred_category(opened_category_counts, statistics['published'], categories)
+    most_closed_claim_category = _most_occurred_category(closed_category_counts, statistics['closed'], categories)
+
+    months = helpers.month_range()
+    month_keys = helpers.month_labels(months)
+    monthly_counts = repositories.stored_month_counts(months)
+    response_time_sketch, ending_time_sketch = repositories.stored_time_sketches()
+
+    return {
+        'activated_employees': statistics['employees'],
+        'activated_employees_percentage': str(format_percentage(
+            (statistics['employees'] / config.total_employees) * 100)) + "%",
+        'total_employees': config.total_employees,
+        'activated_units': activated_units if total_units > 0 else total_units,
+        'activated_units_percentage': str(format_percentage((activated_units / total_units) * 100)) + "%"
+        if total_units > 0 else f"{total_units}%",
+        'total_units': total_units,
+        'mean_response_time': helpers.format_timedelta(
+            statistics['response_time'] / statistics['started'] if statistics['started'] else timedelta()),
+        'mean_ending_time': helpers.format_timedelta(
+            statistics['ending_time'] / statistics['ended'] if statistics['ended'] else timedelta()),
+        'response_time_percentiles': helpers.format_time_percentiles(response_time_sketch,
+                                                                     settings.DASHBOARD_TIME_PERCENTILES),
+        'ending_time_percentiles': helpers.format_time_percentiles(ending_time_sketch,
+                                                                   settings.DASHBOARD_TIME_PERCENTILES),
+        'most_opened_claim_category': most_opened_claim_category['category']['name'],
+        'most_opened_claim_category_times': most_opened_claim_category['times'],
+        'last_five_unclosed_claims': repositories.stored_last_claims(False, settings.DASHBOARD_LAST_CLAIMS_COUNT,
+                                                                     settings.DASHBOARD_LAST_CLAIMS_KEY),
+        'most_closed_claim_category': most_closed_claim_category['category']['name'],
+        'most_closed_claim_category_times': most_closed_claim_category['times'],
+        'last_five_closed_claims': repositories.stored_last_claims(True, settings.DASHBOARD_LAST_CLAIMS_COUNT,
+                                                                   settings.DASHBOARD_LAST_CLAIMS_KEY),
+        'opened_categories_ranking': rank_category_counts(opened_category_counts, categories,
+                                                          settings.DASHBOARD_TOP_CATEGORIES, others=True),
+        'closed_categories_ranking': rank_category_counts(closed_category_counts, categories,
+                                                          settings.DASHBOARD_TOP_CATEGORIES, others=True),
+        'performance': _stored_performance(statistics, config.performance_hours_offset),
+        'performance_curve': [_stored_performance(statistics, hours)
+                              for hours in settings.DASHBOARD_PERFORMANCE_OFFSETS],
+        'bar_chart': {'data': monthly_counts, 'labels': month_keys},
+        'line_chart': {'data': helpers.cumulate_counts(monthly_counts), 'labels': month_keys}
+    }
+
+
+def create_dashboard_aggregator(config):
+    """
+    Create the 'DashboardAggregator' of a configuration, with the dashboard settings.
+    """
+    return DashboardAggregator(config.performance_hours_offset, config.total_employees,
+                               settings.DASHBOARD_TOP_CATEGORIES, settings.DASHBOARD_LAST_CLAIMS_COUNT,
+                               settings.DASHBOARD_LAST_CLAIMS_KEY,
+                               performance_offsets=settings.DASHBOARD_PERFORMANCE_OFFSETS,
+                               distinct_counter=lambda: distinct_counter(settings.DISTINCT_COUNT_MODE,
+                                                                         settings.HLL_PRECISION),
+                               time_percentiles=settings.DASHBOARD_TIME_PERCENTILES,
+                               sketch_size=settings.QUANTILE_SKETCH_SIZE)
+
+
+@timed_function('table')
+def table_dashboard_data(table, categories, total_units, config):
+    """
+    Compute the dashboard statistics from a ClaimTable.
 
-    # Calculate the best performances based on closed and published claims within a specified hour range.
-    performance_by_hours = calculate_best_performances_by_hours(closed_claims, published_claims,
-                                                                config.performance_hours_offset)
+    Parameters:
+        table (ClaimTable): The table holding the claims and users of the API payload.
+        categories (list): A list of dictionaries representing claim categories.
+        total_units (int): The total number of units (departments).
+        config (Configuration): The configuration of the dashboard.
+
+    Returns:
+        dict: A dictionary containing various statistics for the dashboard, with the same content as
+              'aggregate_dashboard_data()', except that the last claims are rebuilt from the table.
+
+    The function runs the per-statistic functions of this module on views of the table, which scan
+    compact integer columns instead of lists of dictionaries.
+    """
+    published_claims = table.published()
+    closed_claims = table.closed()
+    CLAIMS_PER_COMPUTATION.observe(len(published_claims), source='table')
+
+    grouped_data = group_claims_by_publish_date(published_claims)
+    grouped_data_cummul = dict(zip(grouped_data.keys(), helpers.cumulate_counts(grouped_data.values())))
+    activated_employees = count_activated_employees(published_claims, config.total_employees)
+    activated_units = count_activated_units(table, total_units)
+    most_opened_claim_category = find_most_occurred_claim_category(published_claims, categories)
+    most_closed_claim_category = find_most_occurred_claim_category(closed_claims, categories)
+    performance_index = PerformanceIndex.from_claims(closed_claims, published_claims)
 
-    # Construct and return the dashboard data as a dictionary.
     return {
         'activated_employees': activated_employees['number'],
         'activated_employees_percentage': activated_employees['percentage'],
@@ -186,26 +396,492 @@ def dashboard_data():
         'activated_units': activated_units['number'],
         'activated_units_percentage': activated_units['percentage'],
         'total_units': activated_units['total'],
-        'mean_response_time': mean_response_time,
-        'mean_ending_time': mean_ending_time,
+        'mean_response_time': helpers.format_timedelta(
+            table.started().mean_delta(constants.PUBLISH_DATE, constants.START_DATE)),
+        'mean_ending_time': helpers.format_timedelta(
+            table.ended().mean_delta(constants.PUBLISH_DATE, constants.END_DATE)),
+        'response_time_percentiles': time_percentiles(
+            table.started().deltas(constants.PUBLISH_DATE, constants.START_DATE)),
+        'ending_time_percentiles': time_percentiles(
+            table.ended().deltas(constants.PUBLISH_DATE, constants.END_DATE)),
         'most_opened_claim_category': most_opened_claim_category['category']['name'],
         'most_opened_claim_category_times': most_opened_claim_category['times'],
-        'last_five_unclosed_claims': last_five_unclosed_claims,
+        'last_five_unclosed_claims': table.unclosed().top_rows(settings.DASHBOARD_LAST_CLAIMS_COUNT,
+                                                               settings.DASHBOARD_LAST_CLAIMS_KEY),
         'most_closed_claim_category': most_closed_claim_category['category']['name'],
         'most_closed_claim_category_times': most_closed_claim_category['times'],
-        'last_five_closed_claims': last_five_closed_claims,
-        'performance': performance_by_hours,
-        'bar_chart': bar_chart,
-        'line_chart': line_chart
+        'last_five_closed_claims': closed_claims.top_rows(settings.DASHBOARD_LAST_CLAIMS_COUNT,
+                                                          settings.DASHBOARD_LAST_CLAIMS_KEY),
+        'opened_categories_ranking': rank_claim_categories(published_claims, categories,
+                                                           settings.DASHBOARD_TOP_CATEGORIES, others=True),
+        'closed_categories_ranking': rank_claim_categories(closed_claims, categories,
+                                                           settings.DASHBOARD_TOP_CATEGORIES, others=True),
+        'performance': performance_index.performance(config.performance_hours_offset),
+        'performance_curve': performance_index.curve(settings.DASHBOARD_PERFORMANCE_OFFSETS),
+        'bar_chart': {'data': list(grouped_data.values()), 'labels': list(grouped_data.keys())},
+        'line_chart': {'data': list(grouped_data_cummul.values()), 'labels': list(grouped_data_cummul.keys())}
     }
 
 
+def refresh_dashboard_snapshot():
+    """
+    Compute the dashboard statistics and save them as a new snapshot.
+
+    Returns:
+        DashboardSnapshot or None: The saved snapshot, or None if the configuration is not available.
+
+    The function is run periodically by the 'refresh_dashboard' management command. It always fetches a fresh
+    payload from the API, computes the statistics in a single pass and saves them as the next snapshot version,
+    so the dashboard view only has to read the latest snapshot. With 'UPSTREAM_COMPACT_CACHE', the payload is
+    compacted into a ClaimTable first, like the cached payload. With 'UPSTREAM_STREAMING', the payload is
+    aggregated while it is received, see 'stream_dashboard_data()'. With 'DASHBOARD_SOURCE' set to 'store', the
+    statistics are computed from the claims synchronized by the 'sync_claims' command, see
+    'stored_dashboard_data()'.
+
+    Computed from the API, the snapshot also saves the hourly publish and close counts of the claims (see
+    'HourlyPerformanceIndex'), so the performance of another offset can be recomputed when the configuration
+    changes, by any process and without the payload.
+    """
+    # Fetch configuration data.
+    config = repositories.get_configuration()
+
+    # If configuration data is not available, there is nothing to materialize.
+    if not config:
+        return None
+
+    performance_index = None
+    if settings.DASHBOARD_SOURCE == 'store':
+        data = stored_dashboard_data(config)
+    elif settings.UPSTREAM_STREAMING:
+        # The dates are collected while the records go through the aggregator.
+        publish_timestamps, close_timestamps = [], []
+        data = stream_dashboard_data(config, _collect_performance_timestamps(
+            repositories.stream_records_from_api(), publish_timestamps, close_timestamps))
+        performance_index = PerformanceIndex(TimestampIndex(publish_timestamps), TimestampIndex(close_timestamps))
+    else:
+        payload = repositories.fetch_cacheable_data_from_api()
+        data = aggregate_dashboard_data(payload, config)
+        performance_index = _payload_performance_index(payload)
+
+    performance_counts = performance_index.hourly().as_dict() if performance_index is not None else None
+    return repositories.save_dashboard_snapshot(data, performance_counts=performance_counts)
+
+
+def _collect_performance_timestamps(records, publish_timestamps, close_timestamps):
+    # Yield the records of a payload unchanged, collecting the publish dates of the published claims and the close
+    # dates of the closed ones on the way.
+    for resource, record in records:
+        if resource == constants.CLAIMS and record[constants.PUBLISH_DATE]:
+            publish_timestamps.append(helpers.parse_timestamp(record[constants.PUBLISH_DATE]))
+            if record[constants.CLOSE]:
+                close_timestamps.append(helpers.parse_timestamp(record[constants.CLOSE_DATE]))
+        yield resource, record
+
+
+def _payload_performance_index(data):
+    # The performance index of the published and closed claims of a payload, or of its compact form.
+    claims = data[constants.CLAIMS]
+    if isinstance(claims, ClaimTable):
+        return PerformanceIndex.from_claims(claims.closed(), claims.published())
+
+    published_claims = [claim for claim in claims if claim[constants.PUBLISH_DATE]]
+    return PerformanceIndex.from_claims([claim for claim in published_claims if claim[constants.CLOSE]],
+                                        published_claims)
+
+
+def configuration_dependent_statistics(previous_config, config):
+    """
+    List the dashboard statistics affected by a change of the configuration.
+
+    Parameters:
+        previous_config (Configuration or None): The configuration before the change, None if there was none.
+        config (Configuration): The configuration after the change.
+
+    Returns:
+        set: The keys of the statistics depending on the changed fields, see 'CONFIGURATION_DEPENDENCIES'.
+    """
+    return {key for field, keys in CONFIGURATION_DEPENDENCIES.items()
+            if previous_config is None or getattr(previous_config, field) != getattr(config, field)
+            for key in keys}
+
+
+@timed_function('recompute')
+def recompute_configuration_statistics(data, config, keys, performance_counts=None):
+    """
+    Recompute some statistics of the dashboard for a new configuration, without calling the API.
+
+    Parameters:
+        data (dict): The current statistics of the dashboard, e.g. the data of the latest snapshot.
+        config (Configuration): The new configuration.
+        keys (set): The keys of the statistics to recompute, see 'configuration_dependent_statistics()'.
+        performance_counts (dict): The hourly counts saved with the snapshot of 'data', see
+                                   'refresh_dashboard_snapshot()'. Default is None.
+
+    Returns:
+        dict: The recomputed statistics, without the performance if it cannot be computed without calling the API.
+
+    The percentage of activated employees is derived from the number of activated employees of 'data'. The
+    performance is answered by the local store with 'DASHBOARD_SOURCE' set to 'store'. Otherwise, it is answered
+    by the hourly counts of the snapshot, as of the date the snapshot was computed, or else by the timestamps of
+    the payload cached by this process. Either way, only the window of the new offset is counted, with binary
+    searches.
+    """
+    statistics = {}
+
+    if 'total_employees' in keys:
+        statistics['total_employees'] = config.total_employees
+
+    if 'activated_employees_percentage' in keys:
+        statistics['activated_employees_percentage'] = str(format_percentage(
+            (data['activated_employees'] / config.total_employees) * 100)) + "%"
+
+    if 'performance' in keys:
+        hours = config.performance_hours_offset
+        if settings.DASHBOARD_SOURCE == 'store':
+            stored_statistics = {**repositories.stored_claims_statistics([hours], timezone.now()),
+                                 **repositories.stored_rollup_totals()}
+            statistics['performance'] = _stored_performance(stored_statistics, hours)
+        elif performance_counts is not None:
+            statistics['performance'] = HourlyPerformanceIndex.from_dict(performance_counts).performance(hours)
+        else:
+            payload = repositories.get_cached_data()
+            if payload is not None:
+                statistics['performance'] = _payload_performance_index(payload).performance(hours)
+
+    return statistics
+
+
+def refresh_configuration_statistics(previous_config, config):
+    """
+    Update the latest dashboard snapshot with the statistics affected by a change of the configuration.
+
+    Parameters:
+        previous_config (Configuration or None): The configuration before the change, None if there was none.
+        config (Configuration): The configuration after the change.
+
+    Returns:
+        DashboardSnapshot or None: The new snapshot, or None if no statistic is affected, if there is no
+                                   snapshot or if none of the statistics can be computed without calling the API.
+
+    Only the statistics depending on the changed fields are recomputed, the other statistics of the snapshot
+    are kept as they are, so saving the configuration form never fetches nor aggregates the whole payload.
+    The new snapshot keeps the date and the hourly counts of the snapshot it updates, so the age of its other
+    statistics is unchanged and the 'refresh_dashboard' command still replaces it on schedule.
+    """
+    keys = configuration_dependent_statistics(previous_config, config)
+    if not keys:
+        return None
+
+    snapshot = repositories.get_latest_dashboard_snapshot()
+    if snapshot is None:
+        return None
+
+    statistics = recompute_configuration_statistics(snapshot.data, config, keys, snapshot.performance_counts)
+    if not statistics:
+        return None
+
+    return repositories.save_dashboard_snapshot({**snapshot.data, **statistics}, created_at=snapshot.created_at,
+                                                performance_counts=snapshot.performance_counts)
+
+
+async def alatest_dashboard_data():
+    """
+    Return the dashboard statistics from the latest snapshot, or compute them asynchronously if there is no
+    recent snapshot.
+
+    Returns:
+        dict or None: A dictionary containing the statistics of the dashboard, or None if the configuration
+                      is not available.
+
+    If the latest snapshot is not older than 'DASHBOARD_SNAPSHOT_MAX_AGE' seconds, its statistics are returned
+    without calling the API. Otherwise, for instance when the 'refresh_dashboard' command is not running, the
+    statistics are computed by 'adashboard_data()'.
+
+    Besides the statistics, the dictionary contains:
+    - 'as_of': The date and time the statistics were computed.
+    - 'snapshot_version': The version of the snapshot, or None if the statistics were computed live.
+    """
+    snapshot = await repositories.aget_latest_dashboard_snapshot()
+
+    if snapshot and (timezone.now() - snapshot.created_at).total_seconds() <= settings.DASHBOARD_SNAPSHOT_MAX_AGE:
+        return {**snapshot.data, 'as_of': snapshot.created_at, 'snapshot_version': snapshot.version}
+
+    data = await adashboard_data()
+
+    if not data:
+        return None
+
+    return {**data, 'as_of': timezone.now(), 'snapshot_version': None}
+
+
+def collect_metrics():
+    """
+    Render the metrics of the dashboard for the '/metrics' endpoint.
+
+    Returns:
+        str: The metrics in the Prometheus text exposition format.
+
+    The counters and histograms are updated by the code they measure (upstream calls, payload cache, stages
+    and KPI functions, computations); the age and version of the latest snapshot are read when the metrics are
+    scraped, so an alert can fire when the 'refresh_dashboard' command stops running.
+    """
+    snapshot = repositories.get_latest_dashboard_snapshot()
+    if snapshot is not None:
+        SNAPSHOT_AGE_SECONDS.set((timezone.now() - snapshot.created_at).total_seconds())
+        SNAPSHOT_VERSION.set(snapshot.version)
+
+    return REGISTRY.render()
+
+
+def get_recent_claims_index(data):
+    """
+    Return the recent claims index of a payload, building it only when the payload changes.
+
+    Parameters:
+        data (dict): The JSON payload returned by the API, or its compact form (see 'tables.compact_payload()').
+
+    Returns:
+        RecentClaimsIndex: The index of the unclosed and closed claims of the payload.
+
+    The index of the latest payload is kept in memory: as long as the cached payload is not refreshed, every
+    page of recent claims is served from the same sorted index.
+    """
+    global _recent_claims_index
+
+    with _recent_claims_index_lock:
+        if _recent_claims_index is None or _recent_claims_index[0] is not data:
+            index = RecentClaimsIndex(data[constants.CLAIMS], settings.DASHBOARD_LAST_CLAIMS_KEY)
+            _recent_claims_index = (data, index)
+
+        return _recent_claims_index[1]
+
+
+def recent_claims_page(status, page_number, page_size=None):
+    """
+    Return a page of the most recent unclosed or closed claims.
+
+    Parameters:
+        status (str): 'unclosed' or 'closed'.
+        page_number (int or str): The number of the page, starting at 1. Invalid numbers return the closest page.
+        page_size (int or None): The number of claims per page, bounded by 'RECENT_CLAIMS_MAX_PAGE_SIZE'.
+                                 Default is 'RECENT_CLAIMS_PAGE_SIZE'.
+
+    Returns:
+        dict: A dictionary containing the claims of the page ('results'), the page number ('page'), the number
+              of claims per page ('page_size'), the total number of claims ('count') and of pages ('num_pages').
+
+    Raises:
+        KeyError: If the status is unknown.
+
+    With 'DASHBOARD_SOURCE' set to 'store', the claims are paged from the local store, with one count and one
+    indexed 'ORDER BY ... LIMIT ... OFFSET' query, instead of the cached payload.
+    """
+    page_size = min(max(page_size or settings.RECENT_CLAIMS_PAGE_SIZE, 1), settings.RECENT_CLAIMS_MAX_PAGE_SIZE)
+
+    if settings.DASHBOARD_SOURCE == 'store':
+        # The claims come sorted from the local store, only those of the page being read.
+        claims = repositories.stored_recent_claims({'unclosed': False, 'closed': True}[status],
+                                                   settings.DASHBOARD_LAST_CLAIMS_KEY)
+        page = Paginator(claims, page_size).get_page(page_number)
+        results = [repositories.claim_record(claim) for claim in page.object_list]
+    else:
+        # The claims come sorted from the index of the cached payload.
+        claims = get_recent_claims_index(repositories.fetch_cached_data_from_api()).claims(status)
+        page = Paginator(claims, page_size).get_page(page_number)
+        results = list(page.object_list)
+
+    return {
+        'results': results,
+        'page': page.number,
+        'page_size': page_size,
+        'count': page.paginator.count,
+        'num_pages': page.paginator.num_pages
+    }
+
+
+def get_claims_range_index(data):
+    """
+    Return the date range index of a payload, building it only when the payload changes.
+
+    Parameters:
+        data (dict): The JSON payload returned by the API, or its compact form (see 'tables.compact_payload()').
+
+    Returns:
+        ClaimsRangeIndex: The index of the published claims of the payload by publish date.
+
+    Like the recent claims index, the index of the latest payload is kept in memory, so the statistics
+    of every date range are answered from the same sorted claims, prefix sums and summary tree.
+    """
+    global _claims_range_index
+
+    with _claims_range_index_lock:
+        if _claims_range_index is None or _claims_range_index[0] is not data:
+            index = ClaimsRangeIndex(data[constants.CLAIMS], settings.DASHBOARD_LAST_CLAIMS_COUNT,
+                                     settings.DASHBOARD_LAST_CLAIMS_KEY, settings.QUANTILE_SKETCH_SIZE)
+            _claims_range_index = (data, index)
+
+        return _claims_range_index[1]
+
+
+@timed_function('range')
+def range_dashboard_data(start_timestamp=None, end_timestamp=None, config=None):
+    """
+    Compute the dashboard statistics of the claims published in a date range.
+
+    Parameters:
+        start_timestamp (int): The start of the range (inclusive), in microseconds since the UTC epoch.
+                               Default is None, which does not bound the start.
+        end_timestamp (int): The end of the range (inclusive), in microseconds since the UTC epoch.
+                             Default is None, which ends the range now.
+        config (Configuration): The configuration of the dashboard, e.g. read with the asynchronous ORM API so
+                                the function does not query the database. Default is the saved configuration.
+
+    Returns:
+        dict or None: A dictionary containing the statistics of the dashboard for the range, or None if the
+                      configuration is not available.
+
+    Every statistic is computed from the claims published in the range, read from the 'ClaimsRangeIndex'
+    of the cached payload: counts and summed durations are differences of prefix sums, and category and
+    employee counts are binary searches, and the time percentiles and the last claims lists merge the
+    summaries of O(log n) blocks of claims. The performance is computed over the hours preceding the end of
+    the range, and the charts cover the months of the range. No statistic scans the claims of the range.
+
+    Besides the statistics, the dictionary contains 'as_of', 'snapshot_version' (always None) and 'range',
+    the bounds of the range as timezone-aware datetimes (None for a missing start).
+
+    The statistics of a range are always computed from the API payload, even with 'DASHBOARD_SOURCE' set to
+    'store': the monthly rollups of the local store cannot answer ranges which do not start and end with months.
+    """
+    config = config or repositories.get_configuration()
+    if not config:
+        return None
+
+    data = repositories.fetch_cached_data_from_api()
+    index = get_claims_range_index(data)
+    categories = data[constants.CATEGORIES]
+    end_timestamp = end_timestamp if end_timestamp is not None else helpers.current_timestamp()
+    start, end = start_timestamp, end_timestamp
+
+    published_count = index.published_count(start, end)
+    closed_count = index.closed_count(start, end)
+    CLAIMS_PER_COMPUTATION.observe(published_count, source='range')
+    activated_employees = index.employees_count(start, end)
+    activated_units = count_activated_units(data[constants.USERS], len(data[constants.DEPARTMENTS]))
+    opened_category_counts = index.category_counts(start, end)
+    closed_category_counts = index.category_counts(start, end, closed=True)
+    most_opened_claim_category = _most_occurred_category(opened_category_counts, published_count, categories)
+    most_closed_claim_category = _most_occurred_category(closed_category_counts, closed_count, categories)
+
+    # The time sketches and the last claims are merged from the summaries of the blocks of the range.
+    response_sketch, ending_sketch, last_unclosed_claims, last_closed_claims = index.summary(start, end)
+
+    # Charts over the months of the range, the line chart being the running total of the bars.
+    months = helpers.month_range(start, end)
+    month_keys = helpers.month_labels(months)
+    monthly_counts = index.month_counts(months, start, end)
+    cumulated_counts = helpers.cumulate_counts(monthly_counts)
+
+    performance_index = index.performance_index()
+    response_time_total, started_count = index.response_time(start, end)
+    ending_time_total, ended_count = index.ending_time(start, end)
+
+    return {
+        'activated_employees': activated_employees,
+        'activated_employees_percentage': str(format_percentage(
+            (activated_employees / config.total_employees) * 100)) + "%",
+        'total_employees': config.total_employees,
+        'activated_units': activated_units['number'],
+        'activated_units_percentage': activated_units['percentage'],
+        'total_units': activated_units['total'],
+        'mean_response_time': helpers.format_timedelta(_mean_timedelta(response_time_total, started_count)),
+        'mean_ending_time': helpers.format_timedelta(_mean_timedelta(ending_time_total, ended_count)),
+        'response_time_percentiles': helpers.format_time_percentiles(response_sketch,
+                                                                     settings.DASHBOARD_TIME_PERCENTILES),
+        'ending_time_percentiles': helpers.format_time_percentiles(ending_sketch, settings.DASHBOARD_TIME_PERCENTILES),
+        'most_opened_claim_category': most_opened_claim_category['category']['name'],
+        'most_opened_claim_category_times': most_opened_claim_category['times'],
+        'last_five_unclosed_claims': last_unclosed_claims,
+        'most_closed_claim_category': most_closed_claim_category['category']['name'],
+        'most_closed_claim_category_times': most_closed_claim_category['times'],
+        'last_five_closed_claims': last_closed_claims,
+        'opened_categories_ranking': rank_category_counts(opened_category_counts, categories,
+                                                          settings.DASHBOARD_TOP_CATEGORIES, others=True),
+        'closed_categories_ranking': rank_category_counts(closed_category_counts, categories,
+                                                          settings.DASHBOARD_TOP_CATEGORIES, others=True),
+        'performance': _range_performance(performance_index, config.performance_hours_offset, closed_count,
+                                          published_count, end),
+        'performance_curve': [_range_performance(performance_index, hours, closed_count, published_count, end)
+                              for hours in settings.DASHBOARD_PERFORMANCE_OFFSETS],
+        'bar_chart': {'data': monthly_counts, 'labels': month_keys},
+        'line_chart': {'data': cumulated_counts, 'labels': month_keys},
+        'as_of': timezone.now(),
+        'snapshot_version': None,
+        'range': {
+            'from': None if start is None else helpers.timestamp_to_datetime(start).replace(tzinfo=dt_timezone.utc),
+            'to': helpers.timestamp_to_datetime(end).replace(tzinfo=dt_timezone.utc),
+        },
+    }
+
+
+def _most_occurred_category(category_counts, claims_count, categories):
+    # Same results as 'find_most_occurred_claim_category', from already counted categories.
+    if not (claims_count and categories):
+        return {'category': {'name': 'No Category Found'}, 'times': -1}
+
+    ranking = rank_category_counts(category_counts, categories, k=1)
+    if not ranking:
+        return {'category': {}, 'times': 0}
+
+    return {'category': ranking[0]['category'], 'times': ranking[0]['times']}
+
+
+def _range_performance(performance_index, hours, closed_count, published_count, end_timestamp):
+    # Without closed claims in the range, the performance is reported like 'calculate_best_performances_by_hours'.
+    if not closed_count:
+        return {'counted_closed_claims': 0, 'counted_published_claims': published_count, 'percentage': "0%",
+                'hours': hours}
+
+    return performance_index.performance(hours, end_timestamp)
+
+
+@timed_function()
+def time_percentiles(durations):
+    """
+    Estimate the percentiles of durations with a quantile sketch, in a single pass.
+
+    Parameters:
+        durations (iterable): The durations, in microseconds.
+
+    Returns:
+        list: The 'DASHBOARD_TIME_PERCENTILES' of the durations, see 'helpers.format_time_percentiles()'.
+    """
+    sketch = QuantileSketch(settings.QUANTILE_SKETCH_SIZE)
+    sketch.update(durations)
+    return helpers.format_time_percentiles(sketch, settings.DASHBOARD_TIME_PERCENTILES)
+
+
+def _stored_performance(statistics, hours):
+    # Same results as 'PerformanceIndex.performance', from the window counts of 'stored_claims_statistics'.
+    published, closed = statistics['windows'][hours]
+    if not statistics['closed']:
+        return {'counted_closed_claims': 0, 'counted_published_claims': statistics['published'],
+                'percentage': "0%", 'hours': hours}
+    percentage = (closed / published) * 100 if published else 0
+    return {'counted_closed_claims': closed, 'counted_published_claims': published,
+            'percentage': str(format_percentage(percentage)) + "%", 'hours': hours}
+
+
+def _mean_timedelta(total, count):
+    return timedelta(microseconds=total) / count if count else timedelta()
+
+
+@timed_function()
 def count_activated_employees(claims, total_employees):
     """
     Count the number of activated employees and calculate the percentage.
 
     Parameters:
-        claims (list): A list of dictionaries containing claim data.
+        claims (list or ClaimTable): A list of dictionaries containing claim data, or a ClaimTable.
         total_employees (int): The total number of employees.
 
     Returns:
@@ -213,23 +889,22 @@ def count_activated_employees(claims, total_employees):
 
     The function takes a list of dictionaries containing claim data and the total number of employees.
     It then counts the number of activated employees based on the 'employee' field in the claim data.
-    The activated employees are calculated as the number of unique 'employee' values found in the 'claims' list.
+    The activated employees are calculated as the number of unique 'employee' values found in the 'claims' list,
+    collected in a set, or estimated with a HyperLogLog sketch when 'DISTINCT_COUNT_MODE' is 'hll'.
 
     The function also calculates the percentage of activated employees out of the total employees and returns
     a dictionary containing the number of activated employees, percentage, and total employees.
     """
-    # Initialize a list to store unique 'employee' values.
-    employees_id = []
-
-    # Iterate through each claim in the 'claims' list.
-    for claim in claims:
-        # Check if the 'employee' value of the claim is not already in the 'employees_id' list.
-        if claim['employee'] not in employees_id:
-            # Append the 'employee' value to the 'employees_id' list.
-            employees_id.append(claim['employee'])
+    if isinstance(claims, ClaimTable):
+        # Count the unique employee codes of the table.
+        activated_employees = claims.distinct_count(claims.employees)
+    else:
+        # Collect the unique 'employee' values in a set, or in a HyperLogLog sketch with 'DISTINCT_COUNT_MODE'.
+        employees = distinct_counter(settings.DISTINCT_COUNT_MODE, settings.HLL_PRECISION)
+        employees.update(claim['employee'] for claim in claims)
 
-    # Calculate the number of activated employees (unique 'employee' values).
-    activated_employees = len(employees_id)
+        # Calculate the number of activated employees (unique 'employee' values).
+        activated_employees = len(employees)
 
     # Calculate the percentage of activated employees out of the total employees.
     activated_employees_percentage = (activated_employees / total_employees) * 100
@@ -242,12 +917,42 @@ def count_activated_employees(claims, total_employees):
     }
 
 
+@timed_function()
+def group_activated_employees(claims, group_key, mode=None):
+    """
+    Collect the distinct employees having published the claims of each group (e.g. month or department).
+
+    Parameters:
+        claims (list): A list of dictionaries containing the published claims.
+        group_key (callable): A function returning the group of a claim, e.g. the month index of its publish date.
+        mode (str): 'exact' or 'hll'. Default is the 'DISTINCT_COUNT_MODE' setting.
+
+    Returns:
+        dict: The distinct counter of the employees of each group, a set or a HyperLogLog sketch.
+
+    The counters of several groups are merged with '|', e.g. 'len(reduce(operator.or_, counters.values()))'
+    is the number of activated employees over all the groups. HyperLogLog sketches keep the same small size
+    whatever the number of employees, and can be serialized with 'to_bytes()' to be merged across workers.
+    """
+    mode = mode or settings.DISTINCT_COUNT_MODE
+    groups = {}
+    for claim in claims:
+        group = group_key(claim)
+        counter = groups.get(group)
+        if counter is None:
+            counter = groups[group] = distinct_counter(mode, settings.HLL_PRECISION)
+        counter.add(claim[constants.EMPLOYEE])
+    return groups
+
+
+@timed_function()
 def count_activated_units(users, total_units):
     """
     Count the number of activated units and calculate the percentage.
 
     Parameters:
-        users (list): A list of dictionaries containing user data.
+        users (list or ClaimTable): A list of dictionaries containing user data, or a ClaimTable holding the
+                                    departments of the users.
         total_units (int): The total number of units.
 
     Returns:
@@ -255,7 +960,8 @@ def count_activated_units(users, total_units):
 
     The function takes a list of dictionaries containing user data and the total number of units.
     It then counts the number of activated units based on the 'department' field in the user data.
-    The activated units are calculated as the number of unique 'department' values found in the 'users' list.
+    The activated units are calculated as the number of unique 'department' values found in the 'users' list,
+    collected in a set, or estimated with a HyperLogLog sketch when 'DISTINCT_COUNT_MODE' is 'hll'.
 
     The function also calculates the percentage of activated units out of the total units and returns
     a dictionary containing the number of activated units, percentage, and total units.
@@ -265,18 +971,16 @@ def count_activated_units(users, total_units):
     percentage as "{total_units}%", and the total units value itself.
     """
     if total_units > 0:
-        # Initialize a list to store unique 'department' values.
-        units_id = []
-
-        # Iterate through each user in the 'users' list.
-        for user in users:
-            # Check if the 'department' value of the user is not already in the 'units_id' list.
-            if user['department'] not in units_id:
-                # Append the 'department' value to the 'units_id' list.
-                units_id.append(user['department'])
+        if isinstance(users, ClaimTable):
+            # Count the unique department codes of the users of the table.
+            activated_units = len(set(users.user_departments))
+        else:
+            # Collect the unique 'department' values in a set, or in a HyperLogLog sketch with 'DISTINCT_COUNT_MODE'.
+            units = distinct_counter(settings.DISTINCT_COUNT_MODE, settings.HLL_PRECISION)
+            units.update(user['department'] for user in users)
 
-        # Calculate the number of activated units (unique 'department' values).
-        activated_units = len(units_id)
+            # Calculate the number of activated units (unique 'department' values).
+            activated_units = len(units)
 
         # Calculate the percentage of activated units out of the total units.
         activated_units_percentage = (activated_units / total_units) * 100
@@ -296,12 +1000,13 @@ def count_activated_units(users, total_units):
         }
 
 
+@timed_function()
 def find_most_occurred_claim_category(claims, categories):
     """
     Find the most occurred claim category from a list of claims and a list of categories.
 
     Parameters:
-        claims (list): A list of dictionaries containing claim data.
+        claims (list or ClaimTable): A list of dictionaries containing claim data, or a ClaimTable.
         categories (list): A list of dictionaries representing claim categories.
 
     Returns:
@@ -310,40 +1015,73 @@ def find_most_occurred_claim_category(claims, categories):
     The function takes a list of dictionaries containing claim data and a list of dictionaries
     representing claim categories. It then finds the claim category that occurs the most among
     the claims and returns a dictionary containing the most occurred claim category and its
-    occurrence count.
+    occurrence count. The claims are counted in a single pass, whatever the number of categories.
 
     If either the 'claims' or 'categories' list is empty or None, it returns a default dictionary
     with a "No Category Found" entry and a times count of -1.
     """
     if claims and categories:
-        # Initialize variables to store the maximum occurrence count and the most occurred category.
-        max_occurrence = 0
-        most_occurred_category = {}
-
-        # Iterate through each category in the 'categories' list.
-        for cat in categories:
-            # Count the number of occurrences of the current category in the 'claims' list.
-            occurrences = sum(claim['category'] == cat['id'] for claim in claims)
+        # Rank the categories and keep the first one.
+        ranking = rank_claim_categories(claims, categories, k=1)
 
-            # Check if the current category has more occurrences than the previous maximum.
-            if occurrences > max_occurrence:
-                most_occurred_category = cat
-                max_occurrence = occurrences
+        if not ranking:
+            # None of the claims belongs to a known category.
+            return {'category': {}, 'times': 0}
 
         # Return the dictionary containing the most occurred category and its occurrence count.
-        return {'category': most_occurred_category, 'times': max_occurrence}
+        return {'category': ranking[0]['category'], 'times': ranking[0]['times']}
     else:
         # Return a default dictionary when either the 'claims' or 'categories' list is empty or None.
         return {'category': {'name': 'No Category Found'}, 'times': -1}
 
 
+@timed_function()
+def count_claims_by_category(claims):
+    """
+    Count the claims of each category in a single pass.
+
+    Parameters:
+        claims (list or ClaimTable): A list of dictionaries containing claim data, or a ClaimTable.
+
+    Returns:
+        dict: The number of claims by category id.
+    """
+    if isinstance(claims, ClaimTable):
+        return claims.category_counts()
+
+    return Counter(claim[constants.CATEGORY] for claim in claims)
+
+
+@timed_function()
+def rank_claim_categories(claims, categories, k=None, others=False):
+    """
+    Rank the claim categories by number of claims, with their share of the claims.
+
+    Parameters:
+        claims (list or ClaimTable): A list of dictionaries containing claim data, or a ClaimTable.
+        categories (list): A list of dictionaries representing claim categories.
+        k (int or None): The maximum number of categories to return. Default is None, which returns all of them.
+        others (bool): Whether to append an 'Others' entry for the claims left out of the top k. Default is False.
+
+    Returns:
+        list: The ranked categories, as dictionaries containing the category ('category'), its number of
+              claims ('times') and its share of the claims ('share').
+
+    The claims are counted once with 'count_claims_by_category', then the top k categories are selected
+    with 'rank_category_counts'.
+    """
+    return rank_category_counts(count_claims_by_category(claims), categories, k, others)
+
+
+@timed_function()
 def calculate_best_performances_by_hours(closed_claims, published_claims, performance_hour_offset):
     """
     Calculate the best performances based on closed and published claims within a specified hour range.
 
     Parameters:
-        closed_claims (list): A list of dictionaries containing closed claim data.
-        published_claims (list): A list of dictionaries containing published claim data.
+        closed_claims (list or ClaimTable): A list of dictionaries containing closed claim data, or a ClaimTable.
+        published_claims (list or ClaimTable): A list of dictionaries containing published claim data, or a
+                                               ClaimTable.
         performance_hour_offset (int): The offset in hours for performance calculations.
 
     Returns:
@@ -352,8 +1090,9 @@ def calculate_best_performances_by_hours(closed_claims, published_claims, perfor
     The function calculates the best performances based on closed and published claims within
     a specified hour range. It takes the following steps:
 
-    1. If there are closed claims, it calculates the number of closed claims and published claims
-       that fall within the specified hour range, using the 'is_datetime_between' function.
+    1. If there are closed claims, it indexes the close dates of the closed claims and the publish
+       dates of the published claims in a 'PerformanceIndex', and counts the claims that fall within
+       the specified hour range with binary searches over their UTC timestamps.
 
     2. It calculates the percentage of closed claims out of published claims, rounded to two
        decimal places, and converts it to a percentage string.
@@ -364,42 +1103,8 @@ def calculate_best_performances_by_hours(closed_claims, published_claims, perfor
     If there are no closed claims, it returns a dictionary with zero counted closed claims, the
     total number of published claims, a percentage of "0%", and the specified hours offset.
     """
-    if closed_claims:
-        # Get the current datetime.
-        current_datetime = datetime.now()
-
-        # Calculate the new datetime with the specified performance_hour_offset.
-        new_datetime = sub_hours_from_datetime(current_datetime, performance_hour_offset)
-
-        # Initialize counters for closed claims and published claims within the hour range.
-        count_closed_claims = 0
-        count_published_claims = 0
-
-        # Count the number of closed claims and published claims within the hour range.
-        for claim in closed_claims:
-            if is_datetime_between(datetime.fromisoformat(claim["close_date"][:-1]), new_datetime, current_datetime):
-                count_closed_claims += 1
-
-        for claim in published_claims:
-            if is_datetime_between(datetime.fromisoformat(claim["publish_date"][:-1]), new_datetime, current_datetime):
-                count_published_claims += 1
-
-        # To avoid division by zero when there was no published date in specific period
-        if count_published_claims == 0:
-            count_closed_claims_per = 0
-        else:
-            # Calculate the percentage of closed claims out of published claims.
-            count_closed_claims_per = (count_closed_claims / count_published_claims) * 100
-
-        # Return the results in a dictionary.
-        return {
-            'counted_closed_claims': count_closed_claims,
-            'counted_published_claims': count_published_claims,
-            'percentage': str(format_percentage(count_closed_claims_per)) + "%",
-            'hours': performance_hour_offset
-        }
-    else:
-        # Return results when there are no closed claims.
+    if not closed_claims:
+        # Return results when there are no closed claims, without indexing the published claims.
         return {
             'counted_closed_claims': len(closed_claims),
             'counted_published_claims': len(published_claims),
@@ -407,13 +1112,59 @@ def calculate_best_performances_by_hours(closed_claims, published_claims, perfor
             'hours': performance_hour_offset
         }
 
+    return PerformanceIndex.from_claims(closed_claims, published_claims).performance(performance_hour_offset)
+
 
-def group_claims_by_publish_date(claims):
+@timed_function()
+def calculate_performance_curve(closed_claims, published_claims, performance_hour_offsets):
+    """
+    Calculate the best performances of several hour ranges ending now, e.g. the last 24 hours, 48 hours,
+    7 days and 30 days.
+
+    Parameters:
+        closed_claims (list or ClaimTable): A list of dictionaries containing closed claim data, or a ClaimTable.
+        published_claims (list or ClaimTable): A list of dictionaries containing published claim data, or a
+                                               ClaimTable.
+        performance_hour_offsets (iterable): The offsets in hours of the ranges.
+
+    Returns:
+        list: The performance of each range, as returned by 'calculate_best_performances_by_hours', in the
+              order of the offsets.
+
+    The claims are indexed once, then each range only costs a few binary searches, so the performance
+    curve costs about as much as a single performance.
+    """
+    return PerformanceIndex.from_claims(closed_claims, published_claims).curve(performance_hour_offsets)
+
+
+def count_claims_between(claims, date_key, start_timestamp, end_timestamp):
+    """
+    Count the claims whose date falls between two UTC timestamps (inclusive).
+
+    Parameters:
+        claims (list or ClaimTable): A list of dictionaries containing claim data, or a ClaimTable.
+        date_key (str): The key of the date to compare (e.g. 'close_date').
+        start_timestamp (int): The start of the range, in microseconds since the UTC epoch.
+        end_timestamp (int): The end of the range, in microseconds since the UTC epoch.
+
+    Returns:
+        int: The number of claims within the range.
+    """
+    if isinstance(claims, ClaimTable):
+        return claims.count_between(date_key, start_timestamp, end_timestamp)
+
+    return sum(start_timestamp <= helpers.parse_timestamp(claim[date_key]) <= end_timestamp for claim in claims)
+
+
+@timed_function()
+def group_claims_by_publish_date(claims, start_timestamp=None, end_timestamp=None):
     """
     Group claims data by the publish date, and count occurrences for each month.
 
     Parameters:
-        claims (list): A list of dictionaries containing claim data.
+        claims (list or ClaimTable): A list of dictionaries containing claim data, or a ClaimTable.
+        start_timestamp (int): A UTC timestamp of the first month. Default is January of the year of the last month.
+        end_timestamp (int): A UTC timestamp of the last month. Default is the current timestamp.
 
     Returns:
         dict: A dictionary containing the count of claims occurrences for each month.
@@ -421,40 +1172,40 @@ def group_claims_by_publish_date(claims):
     The function takes a list of dictionaries containing claim data and groups the data by
     the publish date. It then uses the 'group_data_by_month' function to count the occurrences
     for each month based on the 'publish_date' key in the dictionaries. The resulting dictionary
-    contains the count of claim occurrences for each month.
+    contains the count of claim occurrences for each month of the range, which may span several years.
     """
+    if isinstance(claims, ClaimTable):
+        # Count the claims of the table by month over the displayed months.
+        months = helpers.month_range(start_timestamp, end_timestamp)
+        return dict(zip(helpers.month_labels(months), claims.month_counts(constants.PUBLISH_DATE, months)))
+
     # Use the 'group_data_by_month' function to group claims by the 'publish_date' key.
-    return group_data_by_month(claims, constants.PUBLISH_DATE)
+    return group_data_by_month(claims, constants.PUBLISH_DATE, start_timestamp, end_timestamp)
 
 
-def group_claims_by_publish_date_cumuli(claims):
+@timed_function()
+def group_claims_by_publish_date_cumuli(claims, start_timestamp=None, end_timestamp=None):
     """
     Group claims data by the publish date and calculate cumulative occurrences for each month.
 
     Parameters:
-        claims (list): A list of dictionaries containing claim data.
+        claims (list or ClaimTable): A list of dictionaries containing claim data, or a ClaimTable.
+        start_timestamp (int): A UTC timestamp of the first month. Default is January of the year of the last month.
+        end_timestamp (int): A UTC timestamp of the last month. Default is the current timestamp.
 
     Returns:
         dict: A dictionary containing the cumulative count of claims occurrences for each month.
 
     The function takes a list of dictionaries containing claim data and first groups the data by
     the publish date using the 'group_claims_by_publish_date' function. It then calculates the
-    cumulative occurrences for each month and returns a dictionary containing the cumulative count
-    of claim occurrences for each month.
+    cumulative occurrences for each month with a single prefix sum over the monthly counts, and
+    returns a dictionary containing the cumulative count of claim occurrences for each month.
     """
     # Group claims by the publish date using the 'group_claims_by_publish_date' function.
-    grouped_claims = group_claims_by_publish_date(claims)
-
-    # Calculate cumulative occurrences for each month and store them in 'cumulated_claims' dictionary.
-    cumulated_claims = {}
-    for i in range(1, len(grouped_claims) + 1):
-        counter = 0
-        for j in range(1, i + 1):
-            counter = counter + list(grouped_claims.values())[j - 1]
-        cumulated_claims[list(grouped_claims.keys())[i - 1]] = counter
+    grouped_claims = group_claims_by_publish_date(claims, start_timestamp, end_timestamp)
 
-    # Return the dictionary containing cumulative claim occurrences for each month.
-    return cumulated_claims
+    # Running totals of the monthly counts, in the order of the months.
+    return dict(zip(grouped_claims.keys(), helpers.cumulate_counts(grouped_claims.values())))
 
 
 def init_configuration_form():
@@ -509,6 +1260,9 @@ def save_or_update_configuration(request):
 
     If there is an existing configuration, the function updates it with the new form data using
     the update_configuration() function from the repositories' module.
+
+    The statistics of the latest dashboard snapshot depending on the changed fields are then recomputed,
+    see 'refresh_configuration_statistics()'.
     """
     # Create a ConfigForm instance with the submitted form data.
     form = ConfigForm(request.POST)
@@ -525,3 +1279,6 @@ def save_or_update_configuration(request):
         create_configuration(form)
     else:
         update_configuration(config.id, form)
+
+    # Recompute the statistics depending on the changed fields of the configuration.
+    refresh_configuration_statistics(config, get_configuration())
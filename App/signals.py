@@ -0,0 +1,19 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from App.models import Configuration
+from App.repositories import invalidate_configuration_cache
+
+
+@receiver(post_save, sender=Configuration)
+@receiver(post_delete, sender=Configuration)
+def configuration_changed(sender, **kwargs):
+    """
+    Invalidate the cached configuration when a configuration is saved or deleted.
+
+    The cache is invalidated at once, so the worker saving the configuration reads it again on its next request,
+    and again once the transaction is committed, so no worker keeps a configuration read in the meantime.
+    """
+    invalidate_configuration_cache()
+    transaction.on_commit(invalidate_configuration_cache)
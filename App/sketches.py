@@ -0,0 +1,277 @@
+import hashlib
+import math
+
+# Default precision of the HyperLogLog sketches: 2 ** 14 registers, a standard error of about 0.8%.
+HLL_PRECISION = 14
+
+_HASH_BITS = 64
+
+
+class HyperLogLog:
+    """
+    HyperLogLog sketch estimating the number of distinct values added to it.
+
+    Parameters:
+        precision (int): The number of bits of the hash selecting a register, between 4 and 18. The sketch
+                         has 2 ** precision registers of one byte, and a relative standard error of about
+                         1.04 / sqrt(2 ** precision). Default is 14 (16 KiB, about 0.8%).
+
+    The sketch has the interface of the sets used for exact distinct counting: values are added with 'add()'
+    or 'update()', 'len()' returns the (estimated) number of distinct values, and two sketches are merged with
+    '|'. Its size does not depend on the number of values, and merging sketches, e.g. of several months or of
+    several workers, gives the sketch of the union of their values, so distinct counts of any union of periods
+    are computed without the values themselves. Sketches are serialized with 'to_bytes()' to be kept in a cache.
+    """
+
+    def __init__(self, precision=HLL_PRECISION):
+        if not 4 <= precision <= 18:
+            raise ValueError(f"Invalid HyperLogLog precision: {precision}")
+
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value):
+        """
+        Add a value to the sketch. Values are hashed through their 'repr()', so 1 and '1' are distinct values.
+        """
+        hashed = int.from_bytes(hashlib.blake2b(repr(value).encode(), digest_size=8).digest(), 'big')
+        register = hashed >> (_HASH_BITS - self.precision)
+        remaining_bits = _HASH_BITS - self.precision
+        # Position of the first 1 bit of the remaining bits, 'remaining_bits + 1' if they are all 0.
+        rank = remaining_bits - (hashed & ((1 << remaining_bits) - 1)).bit_length() + 1
+        if rank > self.registers[register]:
+            self.registers[register] = rank
+
+    def update(self, values):
+        """
+        Add several values to the sketch.
+        """
+        for value in values:
+            self.add(value)
+
+    def merge(self, other):
+        """
+        Merge another sketch of the same precision into this one, in place.
+
+        Returns:
+            HyperLogLog: The sketch itself.
+        """
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precisions.")
+
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def __or__(self, other):
+        return self.copy().merge(other)
+
+    def copy(self):
+        sketch = HyperLogLog(self.precision)
+        sketch.registers = bytearray(self.registers)
+        return sketch
+
+    def count(self):
+        """
+        Estimate the number of distinct values added to the sketch.
+
+        Returns:
+            float: The estimated number of distinct values.
+        """
+        registers = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / registers)
+        estimate = alpha * registers * registers / sum(2.0 ** -rank for rank in self.registers)
+
+        # Small cardinalities are estimated from the number of empty registers (linear counting).
+        empty = self.registers.count(0)
+        if estimate <= 2.5 * registers and empty:
+            return registers * math.log(registers / empty)
+        return estimate
+
+    def __len__(self):
+        return round(self.count())
+
+    def to_bytes(self):
+        """
+        Serialize the sketch: one byte for the precision, followed by the registers.
+        """
+        return bytes([self.precision]) + bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Deserialize a sketch serialized with 'to_bytes()'.
+        """
+        sketch = cls(data[0])
+        if len(data) != len(sketch.registers) + 1:
+            raise ValueError("Invalid HyperLogLog sketch.")
+
+        sketch.registers = bytearray(data[1:])
+        return sketch
+
+
+def distinct_counter(mode='exact', precision=HLL_PRECISION):
+    """
+    Create a distinct counter: a set for exact counting, or a HyperLogLog sketch for approximate counting.
+
+    Parameters:
+        mode (str): 'exact' or 'hll'. Default is 'exact'.
+        precision (int): The precision of the HyperLogLog sketch. Default is 14.
+
+    Returns:
+        set or HyperLogLog: An empty counter, supporting 'add()', 'update()', 'len()' and '|'.
+    """
+    if mode == 'hll':
+        return HyperLogLog(precision)
+    if mode == 'exact':
+        return set()
+
+    raise ValueError(f"Unknown distinct counting mode: {mode}")
+
+
+# Default size of the quantile sketches: a rank error of about 1% with 200 items per compactor.
+QUANTILE_SKETCH_SIZE = 200
+
+
+class QuantileSketch:
+    """
+    KLL quantile sketch, estimating the quantiles of a stream of numbers in one pass and bounded memory.
+
+    Parameters:
+        k (int): The capacity of the top compactor. The sketch keeps O(k) numbers whatever the number of values
+                 added, with a rank error of about 1.7 / k. Default is 200.
+
+    The values are added to the first compactor. When a compactor is full, its values are sorted and every
+    other value is promoted to the next compactor with a doubled weight, so a value of the compactor of level
+    'h' stands for 2 ** h values. The lower compactors have geometrically smaller capacities, so most of the
+    memory goes to the heaviest, most accurate values.
+
+    Two sketches are merged by concatenating their compactors level by level, which gives the sketch of the
+    union of their values, so the quantiles of any union of periods are computed from the sketches of the
+    periods without their values. Sketches are serialized with 'to_dict()' to be kept in a JSON cache or column.
+    The promoted half alternates between compactions instead of being drawn at random, so a sketch is a
+    deterministic function of the values added to it. With fewer than 'k' values, the quantiles are exact.
+    """
+
+    def __init__(self, k=QUANTILE_SKETCH_SIZE):
+        self.k = k
+        self.compactors = [[]]
+        self.count = 0
+        self._offset = 0
+
+    def add(self, value):
+        """
+        Add a number to the sketch.
+        """
+        self.compactors[0].append(value)
+        self.count += 1
+        if len(self.compactors[0]) >= self._capacity(0):
+            self._compress()
+
+    def update(self, values):
+        """
+        Add several numbers to the sketch.
+        """
+        for value in values:
+            self.add(value)
+
+    def merge(self, other):
+        """
+        Merge another sketch into this one, in place.
+
+        Returns:
+            QuantileSketch: The sketch itself.
+        """
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for level, values in enumerate(other.compactors):
+            self.compactors[level].extend(values)
+        self.count += other.count
+        self._compress()
+        return self
+
+    def __or__(self, other):
+        return self.copy().merge(other)
+
+    def copy(self):
+        return QuantileSketch.from_dict(self.to_dict())
+
+    def __len__(self):
+        return self.count
+
+    def quantile(self, q):
+        """
+        Estimate a quantile of the values added to the sketch.
+
+        Parameters:
+            q (float): The quantile, between 0 and 1 (e.g. 0.9 for the 90th percentile).
+
+        Returns:
+            number or None: The smallest value whose rank is at least 'q' times the number of values (the
+                            nearest-rank quantile), or None if the sketch is empty.
+        """
+        return self.quantiles([q])[0]
+
+    def quantiles(self, qs):
+        """
+        Estimate several quantiles with a single sort of the values of the sketch.
+
+        Returns:
+            list: The quantile of each 'q' of 'qs', see 'quantile()'.
+        """
+        if not self.count:
+            return [None] * len(qs)
+
+        weighted = sorted((value, 1 << level) for level, values in enumerate(self.compactors) for value in values)
+        total = sum(weight for _, weight in weighted)
+
+        results = []
+        for q in qs:
+            target = max(1, math.ceil(q * total))
+            cumulated = 0
+            for value, weight in weighted:
+                cumulated += weight
+                if cumulated >= target:
+                    break
+            results.append(value)
+        return results
+
+    def to_dict(self):
+        """
+        Serialize the sketch as a JSON-compatible dictionary.
+        """
+        return {'k': self.k, 'count': self.count, 'offset': self._offset, 'compactors': self.compactors}
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Deserialize a sketch serialized with 'to_dict()'.
+        """
+        sketch = cls(data['k'])
+        sketch.count = data['count']
+        sketch._offset = data['offset']
+        sketch.compactors = [list(values) for values in data['compactors']] or [[]]
+        return sketch
+
+    def _capacity(self, level):
+        depth = len(self.compactors) - level - 1
+        return max(2, math.ceil(self.k * (2 / 3) ** depth))
+
+    def _compress(self):
+        # Compact the full compactors, from the lowest one, until every compactor is within its capacity.
+        level = 0
+        while level < len(self.compactors):
+            values = self.compactors[level]
+            if len(values) < self._capacity(level):
+                level += 1
+                continue
+
+            if level + 1 == len(self.compactors):
+                self.compactors.append([])
+
+            values.sort()
+            # With an odd number of values, the largest one stays in the compactor with its weight.
+            kept = [values.pop()] if len(values) % 2 else []
+            self.compactors[level + 1].extend(values[self._offset::2])
+            self.compactors[level] = kept
+            self._offset ^= 1
+            level = 0
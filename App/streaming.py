@@ -0,0 +1,129 @@
+import json
+
+_WHITESPACE = ' \t\n\r'
+_NUMBER_CHARACTERS = '0123456789+-.eE'
+
+_decoder = json.JSONDecoder()
+
+
+class _ChunkReader:
+    """
+    Cursor over a JSON document received as a sequence of text chunks.
+
+    Only the part of the document which was not consumed yet is kept in the buffer, so the memory held by
+    the reader is bounded by the size of the largest value decoded at once, not by the size of the document.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = ''
+        self.pos = 0
+
+    def fill(self):
+        """
+        Append the next chunk to the buffer, dropping the consumed part. Return False at the end of the document.
+        """
+        for chunk in self.chunks:
+            if chunk:
+                self.buffer = self.buffer[self.pos:] + chunk
+                self.pos = 0
+                return True
+        return False
+
+    def peek(self):
+        """
+        Skip the whitespace and return the next character, or an empty string at the end of the document.
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self.fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, characters):
+        """
+        Consume the next character, which must be one of 'characters', and return it.
+        """
+        character = self.peek()
+        if not character or character not in characters:
+            raise ValueError(f"Invalid JSON payload: expected one of {characters!r} at {character!r}")
+        self.pos += 1
+        return character
+
+    def decode(self):
+        """
+        Decode the next JSON value with 'raw_decode', reading more chunks until the value is complete.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+
+            # A number or a literal ending with the buffer, or followed by a character of a number (e.g. '7' of
+            # '7.5' split after the '7.'), may continue in the next chunk.
+            if not isinstance(value, (dict, list, str)) and (
+                    end == len(self.buffer) or self.buffer[end] in _NUMBER_CHARACTERS) and self.fill():
+                continue
+
+            self.pos = end
+            return value
+
+
+def iter_payload_records(chunks):
+    """
+    Decode a JSON payload incrementally and yield the items of its arrays one by one.
+
+    Parameters:
+        chunks (iterable): The text of the JSON document, in chunks of any size (e.g. the chunks of a streamed
+                           HTTP response).
+
+    Yields:
+        tuple: (key, item) for each item of each array of the top-level object, where 'key' is the key of the
+               array (e.g. 'claims'). If the document is an array, the key is None.
+
+    Raises:
+        ValueError: If the document is not a valid JSON object or array.
+
+    Each item is decoded with 'json.JSONDecoder.raw_decode' as soon as its text is received, and the text is
+    dropped once decoded. The document is never materialized as a whole, so the memory used while reading a
+    payload of any number of claims is bounded by the size of a chunk and of a single item. The top-level
+    values which are not arrays are skipped.
+    """
+    reader = _ChunkReader(chunks)
+
+    if reader.peek() == '[':
+        yield from _iter_array_items(reader, None)
+        return
+
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+
+    while True:
+        key = reader.decode()
+        reader.expect(':')
+
+        if reader.peek() == '[':
+            yield from _iter_array_items(reader, key)
+        else:
+            # Not an array of records: decode and drop it.
+            reader.decode()
+
+        if reader.expect(',}') == '}':
+            return
+
+
+def _iter_array_items(reader, key):
+    reader.expect('[')
+    if reader.peek() == ']':
+        reader.pos += 1
+        return
+
+    while True:
+        yield key, reader.decode()
+        if reader.expect(',]') == ']':
+            return
@@ -0,0 +1,171 @@
+from datetime import timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone as django_timezone
+
+from App import constants, repositories
+from App.rollups import RollupDeltas, add_claims
+from App.helpers import parse_timestamp, timestamp_to_datetime
+from App.models import Claim, Employee, Category, Department, SyncCursor
+
+# Columns of the stored claims updated when a claim is synchronized again.
+CLAIM_FIELDS = ['message', 'status', 'category', 'employee', 'publish_date', 'start_date', 'end_date', 'close_date',
+                'close', 'updated_at']
+
+# Model and updated columns of each resource of the payload.
+RESOURCE_MODELS = {
+    constants.CLAIMS: (Claim, CLAIM_FIELDS),
+    constants.USERS: (Employee, ['department']),
+    constants.CATEGORIES: (Category, ['name']),
+    constants.DEPARTMENTS: (Department, ['name']),
+}
+
+
+def sync_from_api(full=False):
+    """
+    Synchronize the claims, users, categories and departments of the API into the local store.
+
+    Parameters:
+        full (bool): If True, every record is requested, whatever the stored cursor. Default is False.
+
+    Returns:
+        dict: The number of records upserted by resource, and the new cursor under 'cursor'.
+
+    Only the records changed since the stored cursor of the claims are requested (see
+    'repositories.stream_records_from_api'). The records are streamed from the API and upserted in batches of
+    'SYNC_BATCH_SIZE' rows with a single 'INSERT ... ON CONFLICT DO UPDATE' statement per batch, so records
+    which were already stored are updated in place.
+
+    The cursor is the highest value of the 'SYNC_WATERMARK_FIELD' of the synchronized claims (e.g. their
+    'updated_at' date or their 'id'). It is saved in the same transaction as the records, so an interrupted
+    synchronization is retried from the previous cursor. Records deleted from the API are not deleted from
+    the store.
+
+    The daily and monthly rollups are updated in the same transaction: the contributions of the stored
+    versions of the synchronized claims are subtracted before they are overwritten, and the contributions
+    of the new versions are added once the users are synchronized, so the claims are counted in the
+    departments of their employees.
+    """
+    with transaction.atomic():
+        cursor, _ = SyncCursor.objects.select_for_update().get_or_create(resource=constants.CLAIMS)
+        watermark = cursor.value
+        counts = {resource: 0 for resource in RESOURCE_MODELS}
+        batches = {resource: [] for resource in RESOURCE_MODELS}
+        rollup_deltas = RollupDeltas()
+        claim_ids = set()
+
+        def flush(resource, batch):
+            if resource == constants.CLAIMS:
+                # The stored version of a claim received twice was already subtracted with the first one.
+                ids = {claim.id for claim in batch} - claim_ids
+                for stored_claim in Claim.objects.filter(pk__in=ids):
+                    rollup_deltas.subtract(stored_claim)
+                claim_ids.update(ids)
+            counts[resource] += upsert(resource, batch)
+
+        for resource, record in repositories.stream_records_from_api(since=None if full else cursor.value):
+            instance = build_instance(resource, record)
+            if instance is None:
+                continue
+
+            if resource == constants.CLAIMS:
+                watermark = max_watermark(watermark, record.get(settings.SYNC_WATERMARK_FIELD))
+
+            batch = batches[resource]
+            batch.append(instance)
+            if len(batch) >= settings.SYNC_BATCH_SIZE:
+                flush(resource, batch)
+                batch.clear()
+
+        for resource, batch in batches.items():
+            flush(resource, batch)
+
+        add_claims(rollup_deltas, claim_ids)
+        rollup_deltas.apply()
+
+        cursor.value = watermark
+        cursor.synced_at = django_timezone.now()
+        cursor.save()
+
+    return {**counts, 'cursor': watermark}
+
+
+def build_instance(resource, record):
+    """
+    Build the model instance of a record of the payload.
+
+    Returns:
+        Model or None: The unsaved instance, or None if the resource is unknown or the record has no id.
+    """
+    if resource not in RESOURCE_MODELS or record.get(constants.ID) is None:
+        return None
+
+    if resource == constants.CLAIMS:
+        return Claim(
+            id=record[constants.ID],
+            message=record.get('message'),
+            status=record.get('status'),
+            category=record.get(constants.CATEGORY),
+            employee=record.get(constants.EMPLOYEE),
+            publish_date=to_datetime(record.get(constants.PUBLISH_DATE)),
+            start_date=to_datetime(record.get(constants.START_DATE)),
+            end_date=to_datetime(record.get(constants.END_DATE)),
+            close_date=to_datetime(record.get(constants.CLOSE_DATE)),
+            close=bool(record.get(constants.CLOSE)),
+            updated_at=to_datetime(record.get('updated_at')),
+        )
+
+    if resource == constants.USERS:
+        return Employee(id=record[constants.ID], department=record.get(constants.DEPARTMENT))
+
+    model = RESOURCE_MODELS[resource][0]
+    return model(id=record[constants.ID], name=record.get('name') or '')
+
+
+def upsert(resource, instances):
+    """
+    Insert the instances of a resource, updating the rows which already exist.
+
+    Returns:
+        int: The number of upserted instances.
+    """
+    if not instances:
+        return 0
+
+    model, fields = RESOURCE_MODELS[resource]
+    model.objects.bulk_create(instances, batch_size=settings.SYNC_BATCH_SIZE, update_conflicts=True,
+                              unique_fields=['id'], update_fields=fields)
+    return len(instances)
+
+
+def to_datetime(date_str):
+    """
+    Parse a date-time of the API into an aware datetime in UTC, or return None for a missing date.
+    """
+    if not date_str:
+        return None
+
+    return timestamp_to_datetime(parse_timestamp(date_str)).replace(tzinfo=timezone.utc)
+
+
+def max_watermark(current, value):
+    """
+    Return the highest of two watermarks, which are ids or ISO 8601 date-times.
+
+    Returns:
+        str or None: The highest watermark, as a string, or the current one if 'value' is missing.
+    """
+    if value is None or value == '':
+        return current
+    if current is None:
+        return str(value)
+
+    return str(value) if _watermark_key(str(value)) > _watermark_key(current) else current
+
+
+def _watermark_key(value):
+    # Ids are compared as numbers, dates as timestamps, so '10' > '9' and offsets are taken into account.
+    if value.lstrip('-').isdigit():
+        return int(value)
+    return parse_timestamp(value)
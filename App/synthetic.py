@@ -0,0 +1,127 @@
+import itertools
+import random
+
+from App import constants
+from App.helpers import MICROSECONDS_PER_HOUR, MICROSECONDS_PER_DAY, current_timestamp, format_timestamp
+
+# Names of the categories of the synthetic claims, from the most to the least frequent.
+CATEGORY_NAMES = ('Conflits', 'Risques', 'Absences', 'Matériel', 'Sécurité', 'Formation', 'Paie', 'Horaires',
+                  'Transport', 'Hygiène', 'Communication', 'Autres')
+
+# Mean delays of the synthetic claims, in hours: from publication to start, from start to end and from end to close.
+MEAN_RESPONSE_HOURS = 8
+MEAN_PROCESSING_HOURS = 48
+MEAN_CLOSING_HOURS = 12
+
+# Shares of the synthetic claims: published, started among the published ones, ended among the started ones and
+# closed among the ended ones.
+PUBLISHED_SHARE = 0.98
+STARTED_SHARE = 0.85
+ENDED_SHARE = 0.75
+CLOSED_SHARE = 0.8
+
+
+def synthetic_payload(claims_count, seed=0, now=None, days=365):
+    """
+    Generate a realistic API payload, e.g. to benchmark the dashboard on large datasets.
+
+    Parameters:
+        claims_count (int): The number of claims, e.g. from 1,000 to 10,000,000.
+        seed (int): The seed of the random generator: the same seed gives the same payload. Default is 0.
+        now (int): The UTC timestamp of the generation, in microseconds. No date is after it. Default is now.
+        days (int): The number of days over which the claims are published, before 'now'. Default is 365.
+
+    Returns:
+        dict: A payload with the 'claims', 'users', 'categories' and 'departments' of the API, see
+              'iter_synthetic_records()'.
+
+    The payload is held in memory: each claim takes about 1 KiB, so 10,000,000 claims need about 10 GiB.
+    Larger datasets can be consumed record by record with 'iter_synthetic_records()'.
+    """
+    payload = {constants.CLAIMS: [], constants.USERS: [], constants.CATEGORIES: [], constants.DEPARTMENTS: []}
+    for resource, record in iter_synthetic_records(claims_count, seed, now, days):
+        payload[resource].append(record)
+    return payload
+
+
+def iter_synthetic_records(claims_count, seed=0, now=None, days=365):
+    """
+    Generate the records of a realistic API payload one by one.
+
+    Yields:
+        tuple: (resource, record) for each category, department, user and claim, like
+               'repositories.stream_records_from_api()'.
+
+    The numbers of employees (one per 50 claims) and departments (one per 40 employees) grow with the number of
+    claims. The categories and the employees follow Zipf-like distributions, so a few of them get most of the
+    claims. The claims are published uniformly over the last 'days' days; their start, end and close dates
+    follow with exponentially distributed delays, and the dates which would be in the future are left empty,
+    so the most recent claims are pending, like in the API. The claims are yielded by increasing id.
+    """
+    rng = random.Random(seed)
+    now = now if now is not None else current_timestamp()
+    employees_count = max(10, claims_count // 50)
+    departments_count = max(3, employees_count // 40)
+
+    for i, name in enumerate(CATEGORY_NAMES, start=1):
+        yield constants.CATEGORIES, {constants.ID: i, 'name': name}
+
+    for i in range(1, departments_count + 1):
+        yield constants.DEPARTMENTS, {constants.ID: i, 'name': f'Département {i}'}
+
+    for i in range(1, employees_count + 1):
+        yield constants.USERS, {constants.ID: i, constants.DEPARTMENT: rng.randint(1, departments_count)}
+
+    categories = range(1, len(CATEGORY_NAMES) + 1)
+    category_weights = list(itertools.accumulate(1 / rank for rank in categories))
+    employees = range(1, employees_count + 1)
+    employee_weights = list(itertools.accumulate(1 / rank ** 0.8 for rank in employees))
+    start = now - days * MICROSECONDS_PER_DAY
+
+    for i in range(1, claims_count + 1):
+        yield constants.CLAIMS, synthetic_claim(
+            i, rng.choices(categories, cum_weights=category_weights)[0],
+            rng.choices(employees, cum_weights=employee_weights)[0], rng, start, now)
+
+
+def synthetic_claim(claim_id, category, employee, rng, start, now):
+    """
+    Generate a claim of the synthetic payload, see 'iter_synthetic_records()'.
+
+    Returns:
+        dict: The claim, with its dates formatted like the API does.
+    """
+    publish_date = start_date = end_date = close_date = None
+    if rng.random() < PUBLISHED_SHARE:
+        publish_date = rng.randint(start, now)
+        if rng.random() < STARTED_SHARE:
+            start_date = _later_date(publish_date, MEAN_RESPONSE_HOURS, rng, now)
+        if start_date is not None and rng.random() < ENDED_SHARE:
+            end_date = _later_date(start_date, MEAN_PROCESSING_HOURS, rng, now)
+        if end_date is not None and rng.random() < CLOSED_SHARE:
+            close_date = _later_date(end_date, MEAN_CLOSING_HOURS, rng, now)
+
+    dates = [date for date in (publish_date, start_date, end_date, close_date) if date is not None]
+    return {
+        constants.ID: claim_id,
+        'message': f'Réclamation {claim_id}',
+        constants.CATEGORY: category,
+        constants.EMPLOYEE: employee,
+        'status': 'finish' if end_date is not None else 'proceed' if start_date is not None else 'pending',
+        constants.PUBLISH_DATE: _format_date(publish_date),
+        constants.START_DATE: _format_date(start_date),
+        constants.END_DATE: _format_date(end_date),
+        constants.CLOSE_DATE: _format_date(close_date),
+        constants.CLOSE: close_date is not None,
+        'updated_at': _format_date(max(dates)) if dates else None,
+    }
+
+
+def _later_date(date, mean_hours, rng, now):
+    # A date following another one after an exponentially distributed delay, or None if it is not reached yet.
+    later_date = date + int(rng.expovariate(1 / mean_hours) * MICROSECONDS_PER_HOUR)
+    return later_date if later_date <= now else None
+
+
+def _format_date(timestamp):
+    return format_timestamp(timestamp) if timestamp is not None else None
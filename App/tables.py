@@ -0,0 +1,520 @@
+from array import array
+from collections.abc import Sequence
+from datetime import timedelta
+
+from App import constants, kernels
+from App.helpers import parse_timestamp, format_timestamp, count_timestamps_by_month, top_n_by_key
+
+# Value of the timestamp columns when the date is missing.
+NULL_TIMESTAMP = -2 ** 63
+
+# Value of the code columns when the value is missing or unknown.
+NULL_CODE = -1
+
+# Bits of the 'flags' column.
+PUBLISHED = 1
+STARTED = 2
+ENDED = 4
+CLOSED = 8
+
+# Date keys of the claims and the flag set when the date is present.
+DATE_FLAGS = {
+    constants.PUBLISH_DATE: PUBLISHED,
+    constants.START_DATE: STARTED,
+    constants.END_DATE: ENDED,
+    constants.CLOSE_DATE: 0,
+}
+
+
+class Codes:
+    """
+    Dictionary encoding of the values of a column: each distinct value gets a small integer code.
+
+    Attributes:
+        values (list): The distinct values, indexed by their code.
+    """
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+
+    def encode(self, value):
+        """
+        Return the code of a value, assigning the next code to an unseen value.
+        """
+        if value is None:
+            return NULL_CODE
+
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def code(self, value):
+        """
+        Return the code of a value, or NULL_CODE if the value was never encoded.
+        """
+        return self._codes.get(value, NULL_CODE)
+
+    def decode(self, code):
+        """
+        Return the value of a code, or None for NULL_CODE.
+        """
+        return None if code == NULL_CODE else self.values[code]
+
+
+class ClaimTable:
+    """
+    Compact, column-oriented store of the claims of the API payload.
+
+    The claims are stored as typed 'array' columns instead of one dictionary per claim:
+    - 'ids': The ids of the claims.
+    - 'categories', 'employees', 'departments', 'statuses': Integer codes of the claim category, the
+      employee who published it, the department of that employee and the claim status.
+    - 'publish_dates', 'start_dates', 'end_dates', 'close_dates': UTC timestamps in microseconds,
+      NULL_TIMESTAMP when the date is missing.
+    - 'flags': A bitmask per claim of PUBLISHED, STARTED, ENDED and CLOSED.
+    - 'messages': The messages of the claims, the only column kept as Python objects.
+
+    The departments of the users are stored as codes as well, in 'user_departments'.
+
+    A table built with 'from_payload()' holds every claim. The methods 'published()', 'closed()', 'unclosed()',
+    'started()' and 'ended()' return views of the same columns restricted to the matching rows, without copying
+    the claims. The functions of the 'services' module accept a ClaimTable (or a view) in place of a list of claims,
+    and with 'UPSTREAM_COMPACT_CACHE', the cached API payload holds its claims and users in a ClaimTable (see
+    'compact_payload()').
+
+    The statistics are computed by the NumPy kernels of the 'kernels' module when NumPy is installed, and by
+    pure Python loops over the columns otherwise.
+    """
+
+    def __init__(self):
+        self.ids = array('q')
+        self.categories = array('l')
+        self.employees = array('l')
+        self.departments = array('l')
+        self.statuses = array('l')
+        self.publish_dates = array('q')
+        self.start_dates = array('q')
+        self.end_dates = array('q')
+        self.close_dates = array('q')
+        self.flags = array('B')
+        self.messages = []
+        self.user_departments = array('l')
+
+        self.category_codes = Codes()
+        self.employee_codes = Codes()
+        self.department_codes = Codes()
+        self.status_codes = Codes()
+
+        # Department code of each employee, filled by the users of the payload.
+        self.employee_departments = {}
+
+        # Rows of the view, or None when the table holds all its rows.
+        self.rows = None
+
+    @classmethod
+    def from_payload(cls, data):
+        """
+        Build a table from the API payload.
+
+        Parameters:
+            data (dict): The JSON payload returned by the API, containing claims and users.
+
+        Returns:
+            ClaimTable: The table holding every claim of the payload.
+        """
+        table = cls()
+
+        # Users first, so each claim gets the department of its employee.
+        for user in data[constants.USERS]:
+            table.add_user(user)
+
+        for claim in data[constants.CLAIMS]:
+            table.add_claim(claim)
+
+        return table
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Build a table from the records of the payload, received one by one.
+
+        Parameters:
+            records (iterable): (resource, record) tuples, e.g. ('claims', {...}), as yielded by
+                                'repositories.stream_records_from_api()'. Only claims and users are stored.
+
+        Returns:
+            ClaimTable: The table holding every claim of the records.
+
+        Unlike 'from_payload()', users may come after the claims of their employees: the departments of those
+        claims are resolved once all the records are read.
+        """
+        table = cls()
+
+        for resource, record in records:
+            if resource == constants.CLAIMS:
+                table.add_claim(record)
+            elif resource == constants.USERS:
+                table.add_user(record)
+
+        table.resolve_departments()
+        return table
+
+    def resolve_departments(self):
+        """
+        Set the department of the claims whose employee was unknown when they were added.
+        """
+        employees = self.employee_codes.values
+        for i, department in enumerate(self.departments):
+            if department == NULL_CODE and self.employees[i] != NULL_CODE:
+                self.departments[i] = self.employee_departments.get(employees[self.employees[i]], NULL_CODE)
+
+    def add_user(self, user):
+        """
+        Append the department of a user, and record it as the department of the employee.
+
+        Parameters:
+            user (dict): A dictionary containing user data.
+        """
+        department = self.department_codes.encode(user[constants.DEPARTMENT])
+        self.user_departments.append(department)
+        if constants.ID in user:
+            self.employee_departments[user[constants.ID]] = department
+
+    def add_claim(self, claim):
+        """
+        Append a claim to the columns.
+
+        Parameters:
+            claim (dict): A dictionary containing claim data.
+        """
+        flags = CLOSED if claim.get(constants.CLOSE) else 0
+        timestamps = []
+        for key, flag in DATE_FLAGS.items():
+            date_str = claim.get(key)
+            if date_str:
+                timestamps.append(parse_timestamp(date_str))
+                flags |= flag
+            else:
+                timestamps.append(NULL_TIMESTAMP)
+
+        # Closed claims are only counted among the published ones, like in the dashboard.
+        if not flags & PUBLISHED:
+            flags &= ~CLOSED
+
+        employee = claim.get(constants.EMPLOYEE)
+        self.ids.append(claim.get(constants.ID, 0))
+        self.categories.append(self.category_codes.encode(claim.get(constants.CATEGORY)))
+        self.employees.append(self.employee_codes.encode(employee))
+        self.departments.append(self.employee_departments.get(employee, NULL_CODE))
+        self.statuses.append(self.status_codes.encode(claim.get('status')))
+        self.publish_dates.append(timestamps[0])
+        self.start_dates.append(timestamps[1])
+        self.end_dates.append(timestamps[2])
+        self.close_dates.append(timestamps[3])
+        self.flags.append(flags)
+        self.messages.append(claim.get('message'))
+
+    def __len__(self):
+        return len(self.ids) if self.rows is None else len(self.rows)
+
+    def row_indexes(self):
+        """
+        Return the indexes of the rows of the table, or of the view.
+        """
+        return range(len(self.ids)) if self.rows is None else self.rows
+
+    def where(self, all_flags, no_flags=0):
+        """
+        Return a view of the rows having all the 'all_flags' bits and none of the 'no_flags' bits.
+
+        Parameters:
+            all_flags (int): The bits which must be set.
+            no_flags (int): The bits which must not be set. Default is 0.
+
+        Returns:
+            ClaimTable: A view sharing the columns of the table.
+        """
+        if kernels.available():
+            return self.view(kernels.flag_rows(self.flags, self.rows, all_flags, no_flags))
+
+        flags = self.flags
+        rows = array('l', (i for i in self.row_indexes() if flags[i] & all_flags == all_flags
+                           and not flags[i] & no_flags))
+        return self.view(rows)
+
+    def view(self, rows):
+        """
+        Return a view of the table restricted to the given row indexes.
+
+        Parameters:
+            rows (array or numpy.ndarray): The indexes of the rows of the view.
+
+        Returns:
+            ClaimTable: A view sharing the columns of the table.
+        """
+        view = object.__new__(ClaimTable)
+        view.__dict__.update(self.__dict__)
+        view.rows = rows
+        return view
+
+    def published(self):
+        return self.where(PUBLISHED)
+
+    def closed(self):
+        return self.where(PUBLISHED | CLOSED)
+
+    def unclosed(self):
+        return self.where(PUBLISHED, CLOSED)
+
+    def started(self):
+        return self.where(STARTED)
+
+    def ended(self):
+        return self.where(ENDED)
+
+    def sorted_rows(self, values, descending=False):
+        """
+        Return the indexes of the rows sorted by the values of a column (e.g. 'table.publish_dates').
+
+        Parameters:
+            values (array): The column to sort on.
+            descending (bool): True to sort the highest values first. Default is False.
+
+        Returns:
+            list or numpy.ndarray: The indexes of the rows. Rows sharing the same value keep their order.
+        """
+        if kernels.available():
+            return kernels.argsort(values, self.rows, descending)
+
+        return sorted(self.row_indexes(), key=values.__getitem__, reverse=descending)
+
+    def gather(self, values):
+        """
+        Return the values of a column for each row, in the order of the rows.
+        """
+        if kernels.available():
+            return kernels.gather(values, self.rows)
+
+        return [values[i] for i in self.row_indexes()]
+
+    def timestamps(self, date_key):
+        """
+        Return the timestamp column of a date key of the claims (e.g. 'publish_date').
+        """
+        return {
+            constants.PUBLISH_DATE: self.publish_dates,
+            constants.START_DATE: self.start_dates,
+            constants.END_DATE: self.end_dates,
+            constants.CLOSE_DATE: self.close_dates,
+        }[date_key]
+
+    def sort_column(self, key):
+        """
+        Return the column of a key the rows are sorted on: 'id' or a date key (e.g. 'publish_date').
+        """
+        return self.ids if key == constants.ID else self.timestamps(key)
+
+    def distinct_count(self, codes):
+        """
+        Count the distinct non-null codes of a code column over the rows (e.g. 'table.employees').
+        """
+        if kernels.available():
+            return kernels.distinct_count(codes, self.rows, NULL_CODE)
+
+        distinct = {codes[i] for i in self.row_indexes()}
+        distinct.discard(NULL_CODE)
+        return len(distinct)
+
+    def category_counts(self):
+        """
+        Count the rows of each category.
+
+        Returns:
+            dict: The number of rows by category id.
+        """
+        if kernels.available():
+            counts = kernels.value_counts(self.categories, self.rows, len(self.category_codes.values))
+        else:
+            counts = [0] * len(self.category_codes.values)
+            categories = self.categories
+            for i in self.row_indexes():
+                code = categories[i]
+                if code != NULL_CODE:
+                    counts[code] += 1
+        return {self.category_codes.values[code]: count for code, count in enumerate(counts) if count}
+
+    def count_between(self, date_key, start, end):
+        """
+        Count the rows whose date is between two timestamps (inclusive).
+        """
+        if kernels.available():
+            return kernels.count_between(self.timestamps(date_key), self.rows, start, end)
+
+        timestamps = self.timestamps(date_key)
+        return sum(1 for i in self.row_indexes() if start <= timestamps[i] <= end)
+
+    def sorted_timestamps(self, date_key):
+        """
+        Return the timestamps of a date of the rows, in ascending order.
+
+        Returns:
+            list: The sorted timestamps, NULL_TIMESTAMP first for the missing dates.
+        """
+        if kernels.available():
+            return kernels.sorted_values(self.timestamps(date_key), self.rows)
+
+        timestamps = self.timestamps(date_key)
+        return sorted(timestamps[i] for i in self.row_indexes())
+
+    def month_counts(self, date_key, months):
+        """
+        Count the rows by month of a date, over a range of months.
+
+        Parameters:
+            date_key (str): The date key of the claims (e.g. 'publish_date').
+            months (range): The month indexes of the buckets, as returned by 'helpers.month_range'.
+
+        Returns:
+            list: The number of rows of each month of the range.
+        """
+        if kernels.available():
+            return kernels.month_counts(self.timestamps(date_key), self.rows, months)
+
+        # The null timestamp is before any range, so missing dates are never counted.
+        timestamps = self.timestamps(date_key)
+        return count_timestamps_by_month((timestamps[i] for i in self.row_indexes()), months)
+
+    def mean_delta(self, start_date_key, end_date_key):
+        """
+        Calculate the mean time between two dates of the rows.
+
+        Returns:
+            timedelta: The mean delta time, or a zero timedelta if there are no rows.
+        """
+        rows = self.row_indexes()
+        if not len(rows):
+            return timedelta()
+
+        starts = self.timestamps(start_date_key)
+        ends = self.timestamps(end_date_key)
+        if kernels.available():
+            total = kernels.sum_deltas(starts, ends, self.rows)
+        else:
+            total = sum(ends[i] - starts[i] for i in rows)
+        return timedelta(microseconds=total) / len(rows)
+
+    def deltas(self, start_date_key, end_date_key):
+        """
+        Return the time between two dates of each row, in microseconds.
+        """
+        starts = self.timestamps(start_date_key)
+        ends = self.timestamps(end_date_key)
+        return [ends[i] - starts[i] for i in self.row_indexes()]
+
+    def top_rows(self, n, key=constants.ID):
+        """
+        Return the 'n' rows with the highest value of a column, as dictionaries like the API claims.
+
+        Parameters:
+            n (int): The maximum number of rows to return.
+            key (str): The column to sort on: 'id' or a date key. Default is 'id'.
+
+        Returns:
+            list: The claims of the selected rows, highest value first.
+        """
+        column = self.sort_column(key)
+        return [self.row(i) for i in top_n_by_key(self.row_indexes(), n, column.__getitem__)]
+
+    def row(self, index):
+        """
+        Rebuild the claim dictionary of a row.
+        """
+        claim = {
+            constants.ID: self.ids[index],
+            'message': self.messages[index],
+            'status': self.status_codes.decode(self.statuses[index]),
+            constants.CATEGORY: self.category_codes.decode(self.categories[index]),
+            constants.EMPLOYEE: self.employee_codes.decode(self.employees[index]),
+            constants.CLOSE: bool(self.flags[index] & CLOSED),
+        }
+        for key in DATE_FLAGS:
+            timestamp = self.timestamps(key)[index]
+            claim[key] = None if timestamp == NULL_TIMESTAMP else format_timestamp(timestamp)
+        return claim
+
+
+class TableRows(Sequence):
+    """
+    Read-only sequence of rows of a ClaimTable, read as claim dictionaries.
+
+    Parameters:
+        table (ClaimTable): The table holding the rows.
+        rows (sequence): The indexes of the rows, in the order of the sequence.
+
+    The claim dictionaries are rebuilt with 'ClaimTable.row()' only when they are read, so a sorted sequence of
+    rows, e.g. paginated by a Django 'Paginator', costs a single integer per claim.
+    """
+
+    def __init__(self, table, rows):
+        self.table = table
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.table.row(row) for row in self.rows[index]]
+        return self.table.row(self.rows[index])
+
+
+def compact_payload(data):
+    """
+    Convert an API payload to its compact form, kept in memory by the payload cache.
+
+    Parameters:
+        data (dict): The JSON payload returned by the API, containing claims, users, categories and departments.
+
+    Returns:
+        dict: The payload with the same keys, whose 'claims' and 'users' are a single ClaimTable holding both.
+              The categories and departments are kept as they are.
+
+    The functions of the 'services' module reading the cached payload accept both forms.
+    """
+    table = ClaimTable.from_payload(data)
+    return {
+        constants.CLAIMS: table,
+        constants.USERS: table,
+        constants.CATEGORIES: data[constants.CATEGORIES],
+        constants.DEPARTMENTS: data[constants.DEPARTMENTS],
+    }
+
+
+def compact_records(records):
+    """
+    Build the compact form of the payload from its records, received one by one.
+
+    Parameters:
+        records (iterable): (resource, record) tuples, e.g. ('claims', {...}), as yielded by
+                            'repositories.stream_records_from_api()'.
+
+    Returns:
+        dict: The compact payload, like 'compact_payload()'.
+
+    The claims and users go straight into the ClaimTable with 'ClaimTable.from_records()', so the payload is
+    never held as dictionaries: the peak memory is about the size of the table.
+    """
+    resources = {constants.CATEGORIES: [], constants.DEPARTMENTS: []}
+
+    def table_records():
+        for resource, record in records:
+            if resource in resources:
+                resources[resource].append(record)
+            else:
+                yield resource, record
+
+    table = ClaimTable.from_records(table_records())
+    return {constants.CLAIMS: table, constants.USERS: table, **resources}
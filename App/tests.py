@@ -1,17 +1,154 @@
-from datetime import datetime, timedelta
+import asyncio
+import calendar
+import copy
+import inspect
+import os
+import tempfile
+import time
+import json
+import math
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from urllib.parse import urlsplit, parse_qsl
+from datetime import datetime, timedelta, timezone
+from unittest import skipUnless
 from unittest.mock import patch
 
-from django.test import TestCase
+import httpx
+import requests
+from asgiref.sync import async_to_sync, sync_to_async
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
 from App import helpers
+from App import repositories
+from App import kernels
+from App import tables
 from App import services
+from App.aggregation import DashboardAggregator
+from App.benchmarks import BENCHMARKS, STREAMED_BENCHMARKS, EXCLUDED, run_benchmarks
+from App.concurrency import SingleFlight, AsyncSingleFlight
 from App.forms import ConfigForm
-from App.models import Configuration
+from App.metrics import Registry, Counter, Histogram, REGISTRY, UPSTREAM_CACHE_REQUESTS, UPSTREAM_ERRORS, \
+    UPSTREAM_RESPONSE_BYTES, STAGE_SECONDS, CLAIMS_PER_COMPUTATION
+from App.indexes import TimestampIndex, PerformanceIndex, HourlyPerformanceIndex, RangeSummaryTree, RecentClaimsIndex, \
+    ClaimsRangeIndex
+from App.models import Configuration, DashboardSnapshot, Claim, SyncCursor, DailyClaimRollup, MonthlyClaimRollup
+from App.streaming import iter_payload_records
+from App.synthetic import synthetic_payload
+from App.rollups import rebuild_rollups
+from App.sketches import HyperLogLog, QuantileSketch
+from App.sync import sync_from_api, max_watermark
+from App.tables import ClaimTable
+from App.timing import timed, start_collecting, stop_collecting, server_timing_header
 
 
 # Create your tests here.
 
+def format_test_datetime(hours_ago):
+    """
+    Format a datetime of the current year, 'hours_ago' hours before now, like the API does.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    date = max(now - timedelta(hours=hours_ago), datetime(now.year, 1, 1))
+    return date.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def build_test_payload():
+    """
+    Build an API payload mixing pending, proceeding, finished and closed claims.
+    """
+    claims = []
+    for i in range(1, 31):
+        started = i % 3 != 0
+        ended = started and i % 2 == 0
+        closed = ended and i % 4 == 0
+        claims.append({
+            'id': i,
+            'message': f'message{i}',
+            'category': i % 3 + 1,
+            'employee': i % 7,
+            'status': 'finish' if ended else 'proceed' if started else 'pending',
+            'publish_date': format_test_datetime(i * 20 + 5) if i != 30 else None,
+            'start_date': format_test_datetime(i * 20) if started and i != 30 else None,
+            'end_date': format_test_datetime(i * 20 - 2) if ended and i != 30 else None,
+            'close_date': format_test_datetime(i * 20 - 3) if closed else None,
+            'close': closed,
+        })
+
+    return {
+        'claims': claims,
+        'users': [{'id': i, 'department': i % 4} for i in range(10)],
+        'categories': [{'id': 1, 'name': 'Conflicts'}, {'id': 2, 'name': 'Risques'}, {'id': 3, 'name': 'Autres'}],
+        'departments': [{'id': i, 'name': f'department{i}'} for i in range(5)],
+    }
+
+
+def exact_time_percentiles(claims, date_key, percentiles=(50, 90, 99)):
+    """
+    Compute the nearest-rank percentiles of the time between the publish date and a date of the claims, by sorting.
+    """
+    durations = sorted(helpers.parse_timestamp(claim[date_key]) - helpers.parse_timestamp(claim['publish_date'])
+                       for claim in claims)
+    return [{'percentile': percentile, **helpers.format_timedelta(timedelta(microseconds=durations[
+        max(1, math.ceil(percentile / 100 * len(durations))) - 1] if durations else 0))}
+        for percentile in percentiles]
+
+
+def legacy_dashboard_data(data, config):
+    """
+    Compute the dashboard statistics with one pass per statistic, like the dashboard used to.
+    """
+    claims = data['claims']
+    published_claims = list(filter(lambda el: el['publish_date'], claims))
+    unclosed_claims = list(filter(lambda el: not el['close'], published_claims))
+    closed_claims = list(filter(lambda el: el['close'], published_claims))
+    ended_claims = list(filter(lambda el: el['end_date'], claims))
+    started_claims = list(filter(lambda el: el['start_date'], claims))
+
+    grouped_data = services.group_claims_by_publish_date(published_claims)
+    grouped_data_cummul = services.group_claims_by_publish_date_cumuli(published_claims)
+    activated_employees = services.count_activated_employees(published_claims, config.total_employees)
+    activated_units = services.count_activated_units(data['users'], len(data['departments']))
+    most_opened_claim_category = services.find_most_occurred_claim_category(published_claims, data['categories'])
+    most_closed_claim_category = services.find_most_occurred_claim_category(closed_claims, data['categories'])
+
+    return {
+        'activated_employees': activated_employees['number'],
+        'activated_employees_percentage': activated_employees['percentage'],
+        'total_employees': activated_employees['total'],
+        'activated_units': activated_units['number'],
+        'activated_units_percentage': activated_units['percentage'],
+        'total_units': activated_units['total'],
+        'mean_response_time': helpers.calculate_mean_multiple_delta_datetime_formatted(
+            started_claims, 'publish_date', 'start_date'),
+        'mean_ending_time': helpers.calculate_mean_multiple_delta_datetime_formatted(
+            ended_claims, 'publish_date', 'end_date'),
+        'response_time_percentiles': exact_time_percentiles(started_claims, 'start_date'),
+        'ending_time_percentiles': exact_time_percentiles(ended_claims, 'end_date'),
+        'most_opened_claim_category': most_opened_claim_category['category']['name'],
+        'most_opened_claim_category_times': most_opened_claim_category['times'],
+        'last_five_unclosed_claims': helpers.sort_by_key(unclosed_claims)[0:5],
+        'most_closed_claim_category': most_closed_claim_category['category']['name'],
+        'most_closed_claim_category_times': most_closed_claim_category['times'],
+        'last_five_closed_claims': helpers.sort_by_key(closed_claims)[0:5],
+        'opened_categories_ranking': services.rank_claim_categories(published_claims, data['categories'], 10, True),
+        'closed_categories_ranking': services.rank_claim_categories(closed_claims, data['categories'], 10, True),
+        'performance': services.calculate_best_performances_by_hours(closed_claims, published_claims,
+                                                                     config.performance_hours_offset),
+        'performance_curve': [services.calculate_best_performances_by_hours(closed_claims, published_claims, hours)
+                              for hours in [24, 48, 168, 720]],
+        'bar_chart': {'data': list(grouped_data.values()), 'labels': list(grouped_data.keys())},
+        'line_chart': {'data': list(grouped_data_cummul.values()), 'labels': list(grouped_data_cummul.keys())}
+    }
+
+
 class ServicesTest(TestCase):
     def test_count_activated_employees(self):
         claims = [{'employee': 1}, {'employee': 2}, {'employee': 1}]
@@ -69,6 +206,25 @@ class ServicesTest(TestCase):
         self.assertEqual('category one', category['category']['name'])
         self.assertEqual(2, category['times'])
 
+    def test_rank_claim_categories(self):
+        claims = [{'category': c} for c in [3, 1, 2, 3, 1, 3, 4, 4]]
+        categories = [{'name': 'one', 'id': 1}, {'name': 'two', 'id': 2}, {'name': 'three', 'id': 3},
+                      {'name': 'four', 'id': 4}, {'name': 'five', 'id': 5}]
+
+        ranking = services.rank_claim_categories(claims, categories)
+        self.assertEqual(['three', 'one', 'four', 'two'], [entry['category']['name'] for entry in ranking])
+        self.assertEqual([3, 2, 2, 1], [entry['times'] for entry in ranking])
+        self.assertEqual(['37.5%', '25%', '25%', '12.5%'], [entry['share'] for entry in ranking])
+
+        ranking = services.rank_claim_categories(claims + [{'category': 99}], categories, k=2, others=True)
+        self.assertEqual(['three', 'one', 'Others'], [entry['category']['name'] for entry in ranking])
+        self.assertEqual([3, 2, 4], [entry['times'] for entry in ranking])
+
+    def test_find_most_occurred_claim_category_with_unknown_categories(self):
+        category = services.find_most_occurred_claim_category([{'category': 9}], [{'name': 'one', 'id': 1}])
+
+        self.assertEqual({'category': {}, 'times': 0}, category)
+
     def test_calculate_best_performances_by_hours(self):
         empty_closed_claims = []
         empty_published_claims = []
@@ -101,6 +257,21 @@ class ServicesTest(TestCase):
         self.assertEqual("0%", performance['percentage'])
         self.assertEqual(performance_hour_offset, performance['hours'])
 
+    def test_calculate_best_performances_by_hours_uses_utc(self):
+        # Claims published and closed in the last hours, in UTC, are counted whatever the server timezone.
+        published_claims = [
+            {'publish_date': format_test_datetime(1), 'close_date': format_test_datetime(0.5)},
+            {'publish_date': format_test_datetime(2)},
+            {'publish_date': format_test_datetime(72)},
+        ]
+        closed_claims = published_claims[:1]
+
+        performance = services.calculate_best_performances_by_hours(closed_claims, published_claims, 48)
+
+        self.assertEqual(1, performance['counted_closed_claims'])
+        self.assertEqual(2, performance['counted_published_claims'])
+        self.assertEqual("50%", performance['percentage'])
+
     def test_group_claims_by_publish_date_cumuli(self):
         empty_published_claims = []
 
@@ -108,7 +279,7 @@ class ServicesTest(TestCase):
         self.assertEqual('Jan', list(data.keys())[0])
         self.assertEqual(0, data['Jan'])
 
-        # claim's date should be this year, otherwise it will not be counted
+        # claim's date should be in the displayed months, otherwise it will not be counted
         published_claims = [
             {'publish_date': '2023-01-01T14:33:25.557503Z'},
             {'publish_date': '2023-01-01T14:33:25.557503Z'},
@@ -119,9 +290,14 @@ class ServicesTest(TestCase):
         ]
 
         # Assuming the 'publish_date' attribute exists in each object
-        data = services.group_claims_by_publish_date_cumuli(published_claims)
+        end_timestamp = helpers.parse_timestamp('2023-08-31T00:00:00Z')
+        data = services.group_claims_by_publish_date_cumuli(published_claims, end_timestamp=end_timestamp)
         self.assertEqual('Jan', list(data.keys())[0])
-        self.assertEqual(6, data['Aug'])
+        self.assertEqual([3, 4, 5, 5, 6, 6, 6, 6], list(data.values()))
+
+        # Claims of 2023 are not counted in the months of the current year.
+        data = services.group_claims_by_publish_date_cumuli(published_claims)
+        self.assertEqual(0, data['Jan'])
 
     @patch('App.services.get_configuration')
     def test_existing_configuration(self, mock_get_configuration):
@@ -211,7 +387,1543 @@ class ServicesTest(TestCase):
             self.client.post(reverse('config_form'), data=form_data)
 
 
+class AggregationTest(TestCase):
+    def test_aggregate_dashboard_data_matches_legacy_computation(self):
+        config = Configuration(total_employees=12, total_units=4, performance_hours_offset=200)
+        data = build_test_payload()
+
+        expected = legacy_dashboard_data(copy.deepcopy(data), config)
+        result = services.aggregate_dashboard_data(data, config)
+
+        self.assertDictEqual(expected, result)
+
+    def test_aggregate_dashboard_data_with_empty_payload(self):
+        config = Configuration(total_employees=10, total_units=4, performance_hours_offset=48)
+        data = {'claims': [], 'users': [], 'categories': [], 'departments': []}
+
+        result = services.aggregate_dashboard_data(data, config)
+
+        self.assertEqual(0, result['activated_employees'])
+        self.assertEqual('0%', result['activated_units_percentage'])
+        self.assertEqual('No Category Found', result['most_opened_claim_category'])
+        self.assertEqual([], result['last_five_closed_claims'])
+        self.assertEqual({'days': 0, 'hours': 0, 'minutes': 0}, result['mean_ending_time'])
+        self.assertEqual(0, result['performance']['counted_published_claims'])
+
+    def test_aggregator_keeps_highest_ids(self):
+        aggregator = DashboardAggregator(performance_hours_offset=48, total_employees=1)
+        for claim_id in [4, 9, 1, 7, 12, 3, 8]:
+            aggregator.add_claim({'id': claim_id, 'employee': 1, 'category': 1, 'close': False,
+                                  'publish_date': format_test_datetime(1), 'start_date': None, 'end_date': None})
+
+        result = aggregator.result()
+
+        self.assertEqual([12, 9, 8, 7, 4], [claim['id'] for claim in result['last_five_unclosed_claims']])
+
+    def test_aggregator_last_claims_count_and_key(self):
+        aggregator = DashboardAggregator(performance_hours_offset=48, total_employees=1, last_claims_count=2,
+                                         last_claims_key='publish_date')
+        for claim_id, hours_ago in [(1, 5), (2, 1), (3, 9), (4, 3)]:
+            aggregator.add_claim({'id': claim_id, 'employee': 1, 'category': 1, 'close': False,
+                                  'publish_date': format_test_datetime(hours_ago), 'start_date': None,
+                                  'end_date': None})
+
+        result = aggregator.result()
+
+        self.assertEqual([2, 4], [claim['id'] for claim in result['last_five_unclosed_claims']])
+
+    @patch('App.aggregation.LAST_CLAIMS_BATCH', 3)
+    def test_aggregator_selects_last_claims_by_batch(self):
+        aggregator = DashboardAggregator(performance_hours_offset=48, total_employees=1, last_claims_count=3)
+        claims = [{'id': claim_id % 6, 'position': position, 'employee': 1, 'category': 1, 'close': False,
+                   'publish_date': format_test_datetime(1), 'start_date': None, 'end_date': None}
+                  for position, claim_id in enumerate([4, 9, 1, 7, 12, 3, 8, 5, 10, 2, 11, 6])]
+        for claim in claims:
+            aggregator.add_claim(claim)
+
+        result = aggregator.result()
+
+        # The candidates stay bounded, and claims sharing an id are kept in the order they were received.
+        self.assertLess(len(aggregator.last_unclosed_claims), 3 + 3)
+        self.assertEqual(helpers.sort_by_key(copy.deepcopy(claims))[0:3], result['last_five_unclosed_claims'])
+
+
+class PerformanceIndexTest(TestCase):
+    def test_timestamp_index_count_between(self):
+        index = TimestampIndex([30, 10, 20, 20, 40])
+
+        self.assertEqual(3, index.count_between(20, 30))
+        self.assertEqual(5, index.count_between(0, 100))
+        self.assertEqual(0, index.count_between(21, 29))
+        self.assertEqual(0, index.count_between(40, 10))
+
+    def test_curve_matches_performance_of_each_offset(self):
+        data = build_test_payload()
+        published_claims = [claim for claim in data['claims'] if claim['publish_date']]
+        closed_claims = [claim for claim in published_claims if claim['close']]
+        offsets = [1, 5, 24, 48, 168, 720]
+
+        curve = services.calculate_performance_curve(closed_claims, published_claims, offsets)
+
+        self.assertEqual([services.calculate_best_performances_by_hours(closed_claims, published_claims, hours)
+                          for hours in offsets], curve)
+        self.assertEqual(offsets, [point['hours'] for point in curve])
+
+    def test_index_of_table_matches_index_of_claims(self):
+        data = build_test_payload()
+        table = ClaimTable.from_payload(data)
+        published_claims = [claim for claim in data['claims'] if claim['publish_date']]
+        closed_claims = [claim for claim in published_claims if claim['close']]
+        now = helpers.current_timestamp()
+
+        claims_index = PerformanceIndex.from_claims(closed_claims, published_claims)
+        table_index = PerformanceIndex.from_claims(table.closed(), table.published())
+
+        self.assertEqual(claims_index.curve([24, 100, 720], now), table_index.curve([24, 100, 720], now))
+
+    def test_performance_without_closed_claims(self):
+        index = PerformanceIndex(TimestampIndex([1, 2, 3]), TimestampIndex([]))
+
+        self.assertEqual({'counted_closed_claims': 0, 'counted_published_claims': 3, 'percentage': '0%',
+                          'hours': 24}, index.performance(24))
+        self.assertEqual(index.performance(24), index.hourly().performance(24))
+
+    def test_hourly_index_matches_performance_of_each_offset(self):
+        rng = random.Random(0)
+        now = helpers.current_timestamp()
+        hour = helpers.MICROSECONDS_PER_HOUR
+        # Dates in the past and in the future, some of them exactly on the hours before 'now'.
+        published = [now - rng.randint(-5 * hour, 800 * hour) for _ in range(2000)]
+        published += [now - rng.randint(0, 800) * hour for _ in range(200)]
+        closed = rng.sample(published, 900)
+        index = PerformanceIndex(TimestampIndex(published), TimestampIndex(closed))
+        offsets = [0, 1, 2, 5, 24, 48, 168, 720, 801, 10000]
+
+        hourly = HourlyPerformanceIndex.from_dict(json.loads(json.dumps(index.hourly(now).as_dict())))
+
+        self.assertEqual(index.curve(offsets, now), [hourly.performance(hours) for hours in offsets])
+
+
+class RepositoriesTest(TestCase):
+    @override_settings(UPSTREAM_POOL_SIZE=4, UPSTREAM_MAX_RETRIES=2, UPSTREAM_RETRY_BACKOFF=0.1)
+    def test_create_http_session(self):
+        session = repositories.create_http_session()
+        adapter = session.get_adapter('https://api.example.com/')
+
+        self.assertEqual(4, adapter._pool_maxsize)
+        self.assertEqual(2, adapter.max_retries.total)
+        self.assertEqual(0.1, adapter.max_retries.backoff_factor)
+        self.assertIn('gzip', session.headers['Accept-Encoding'])
+
+    def test_get_http_session_is_shared(self):
+        self.assertIs(repositories.get_http_session(), repositories.get_http_session())
+
+    @override_settings(UPSTREAM_CONNECT_TIMEOUT=2, UPSTREAM_READ_TIMEOUT=9)
+    @patch('App.repositories.env', side_effect=lambda key: key.lower())
+    @patch('App.repositories.get_http_session')
+    def test_fetch_data_from_api_uses_timeouts(self, mock_get_http_session, mock_env):
+        mock_get_http_session.return_value.get.return_value.json.return_value = {'claims': []}
+
+        data = repositories.fetch_data_from_api()
+
+        self.assertEqual({'claims': []}, data)
+        mock_get_http_session.return_value.get.assert_called_once_with(
+            'base_url', headers={'Authorization': 'Token authorization_token'}, timeout=(2, 9))
+
+
+@override_settings(UPSTREAM_CACHE_TTL=60)
+class CachedDataTest(TestCase):
+    def setUp(self):
+        repositories.clear_cached_data()
+        self.addCleanup(repositories.clear_cached_data)
+
+    @patch('App.repositories.fetch_data_from_api')
+    def test_fresh_payload_is_served_from_cache(self, mock_fetch_data_from_api):
+        mock_fetch_data_from_api.return_value = {'claims': [1]}
+
+        self.assertEqual({'claims': [1]}, repositories.fetch_cached_data_from_api())
+        self.assertEqual({'claims': [1]}, repositories.fetch_cached_data_from_api())
+        self.assertEqual(1, mock_fetch_data_from_api.call_count)
+
+    @patch('App.repositories.time.monotonic')
+    @patch('App.repositories.fetch_data_from_api')
+    def test_stale_payload_is_served_while_refreshing(self, mock_fetch_data_from_api, mock_monotonic):
+        mock_fetch_data_from_api.side_effect = [{'claims': [1]}, {'claims': [2]}]
+        mock_monotonic.return_value = 1000
+        repositories.fetch_cached_data_from_api()
+
+        # Past the TTL, the stale payload is returned and refreshed in the background.
+        mock_monotonic.return_value = 1061
+        with patch('App.repositories.refresh_cached_data_in_background',
+                   wraps=repositories.refresh_cached_data_in_background) as mock_refresh:
+            self.assertEqual({'claims': [1]}, repositories.fetch_cached_data_from_api())
+            mock_refresh.assert_called_once()
+        repositories._refresh_thread.join()
+
+        self.assertEqual({'claims': [2]}, repositories.fetch_cached_data_from_api())
+        self.assertEqual(2, mock_fetch_data_from_api.call_count)
+
+    @override_settings(UPSTREAM_CACHE_TTL=0)
+    @patch('App.repositories.fetch_data_from_api')
+    def test_cache_disabled(self, mock_fetch_data_from_api):
+        repositories.fetch_cached_data_from_api()
+        repositories.fetch_cached_data_from_api()
+
+        self.assertEqual(2, mock_fetch_data_from_api.call_count)
+
+
+RESOURCE_URLS = {
+    'claims': 'https://api.example.com/claims',
+    'users': 'https://api.example.com/users',
+    'categories': 'https://api.example.com/categories',
+    'departments': 'https://api.example.com/departments',
+}
+
+
+class AsyncDashboardTest(TestCase):
+    def setUp(self):
+        repositories.clear_cached_data()
+        self.addCleanup(repositories.clear_cached_data)
+        repositories.invalidate_configuration_cache()
+        self.requests = []
+
+    def mock_client(self, responses, delay=0.0):
+        async def handler(request):
+            self.requests.append(str(request.url))
+            await asyncio.sleep(delay)
+            return httpx.Response(200, json=responses[str(request.url)])
+
+        return patch('App.repositories.create_async_http_client',
+                     side_effect=lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+    @override_settings(UPSTREAM_RESOURCE_URLS=RESOURCE_URLS)
+    @patch('App.repositories.env', side_effect=lambda key: key.lower())
+    def test_resources_are_fetched_concurrently(self, mock_env):
+        data = build_test_payload()
+        responses = {url: data[resource] for resource, url in RESOURCE_URLS.items()}
+        # A resource endpoint may also wrap its records in an object.
+        responses[RESOURCE_URLS['users']] = {'users': data['users']}
+
+        with self.mock_client(responses, delay=0.2):
+            started_at = time.monotonic()
+            payload = asyncio.run(repositories.afetch_data_from_api())
+            elapsed = time.monotonic() - started_at
+
+        self.assertEqual(data, payload)
+        self.assertEqual(sorted(RESOURCE_URLS.values()), sorted(self.requests))
+        self.assertLess(elapsed, 0.6)
+
+    @override_settings(UPSTREAM_RESOURCE_URLS={'claims': RESOURCE_URLS['claims']})
+    @patch('App.repositories.env', side_effect=lambda key: f'https://api.example.com/{key.lower()}')
+    def test_resources_without_endpoint_are_read_from_base_url(self, mock_env):
+        responses = {
+            'https://api.example.com/base_url': {'claims': [], 'users': [1], 'categories': [2], 'departments': [3]},
+            RESOURCE_URLS['claims']: [{'id': 1}],
+        }
+
+        with self.mock_client(responses):
+            payload = asyncio.run(repositories.afetch_data_from_api())
+
+        self.assertEqual({'claims': [{'id': 1}], 'users': [1], 'categories': [2], 'departments': [3]}, payload)
+
+    def test_async_single_flight_coalesces_concurrent_calls(self):
+        flights = AsyncSingleFlight()
+        calls = []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {'claims': []}
+
+        async def run():
+            return await asyncio.gather(*(flights.do('key', fetch) for _ in range(5)))
+
+        results = asyncio.run(run())
+
+        self.assertEqual(1, len(calls))
+        self.assertEqual([{'claims': []}] * 5, results)
+
+    def test_async_single_flight_shares_errors(self):
+        flights = AsyncSingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream error")
+
+        async def run():
+            return await asyncio.gather(*(flights.do('key', fail) for _ in range(3)), return_exceptions=True)
+
+        errors = asyncio.run(run())
+
+        self.assertEqual(3, len([error for error in errors if isinstance(error, ValueError)]))
+
+    @patch('App.repositories.afetch_data_from_api')
+    def test_async_dashboard_data_matches_dashboard_data(self, mock_afetch_data_from_api):
+        data = build_test_payload()
+        mock_afetch_data_from_api.return_value = data
+        config = Configuration.objects.create(total_employees=12, total_units=4, performance_hours_offset=200)
+
+        result = async_to_sync(services.adashboard_data)()
+
+        self.assertDictEqual(services.aggregate_dashboard_data(copy.deepcopy(data), config), result)
+        self.assertIs(data, repositories.fetch_cached_data_from_api())
+
+    def test_async_dashboard_data_without_configuration(self):
+        self.assertIsNone(async_to_sync(services.adashboard_data)())
+
+    @override_settings(SINGLE_FLIGHT_SHARED_TIMEOUT=1)
+    @patch('App.repositories.afetch_data_from_api', side_effect=AssertionError("API called"))
+    @patch('App.repositories.fetch_data_from_api', side_effect=AssertionError("API called"))
+    def test_async_dashboard_data_reuses_the_result_of_another_worker(self, mock_fetch, mock_afetch):
+        config = Configuration.objects.create(total_employees=12, total_units=4, performance_hours_offset=200)
+        self.addCleanup(cache.clear)
+        # Another worker is computing the same dashboard, and publishes its result.
+        key = services._dashboard_key(config)
+        cache.set(f'single_flight:{key}:lock', 'token', 5)
+        cache.set(f'single_flight:{key}:token', {'activated_employees': 7}, 5)
+
+        self.assertEqual({'activated_employees': 7}, async_to_sync(services.adashboard_data)())
+
+    def test_range_view_runs_outside_the_shared_sync_thread(self):
+        Configuration.objects.create(total_employees=12, total_units=4, performance_hours_offset=200)
+
+        with patch('App.views.sync_to_async', wraps=sync_to_async) as mock_sync_to_async, \
+                patch('App.views.range_dashboard_data', return_value=None):
+            self.client.get(reverse('dashboard'), {'from': '2024-01-01', 'to': '2024-01-31'})
+
+        self.assertFalse(mock_sync_to_async.call_args.kwargs['thread_sensitive'])
+
+
+class ConfigurationCacheTest(TestCase):
+    def setUp(self):
+        repositories.invalidate_configuration_cache()
+
+    def test_configuration_is_queried_once(self):
+        config = Configuration.objects.create(total_employees=12, total_units=4, performance_hours_offset=200)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(config, repositories.get_configuration())
+            self.assertEqual(config, repositories.get_configuration())
+        with self.assertNumQueries(0):
+            self.assertEqual(config, async_to_sync(repositories.aget_configuration)())
+
+    def test_cache_is_invalidated_on_save_and_delete(self):
+        self.assertIsNone(repositories.get_configuration())
+
+        config = Configuration.objects.create(total_employees=12, total_units=4, performance_hours_offset=200)
+        self.assertEqual(200, repositories.get_configuration().performance_hours_offset)
+
+        config.performance_hours_offset = 24
+        config.save()
+        self.assertEqual(24, repositories.get_configuration().performance_hours_offset)
+
+        config.delete()
+        self.assertIsNone(async_to_sync(repositories.aget_configuration)())
+
+    def test_outdated_copy_of_another_worker_is_not_served(self):
+        config = Configuration.objects.create(total_employees=12, total_units=4, performance_hours_offset=200)
+        repositories.get_configuration()
+
+        # Another worker renews the generation: the copy held in memory is outdated.
+        Configuration.objects.filter(pk=config.pk).update(performance_hours_offset=48)
+        cache.set(repositories.CONFIGURATION_GENERATION_KEY, 'other worker', None)
+
+        self.assertEqual(48, repositories.get_configuration().performance_hours_offset)
+
+    @override_settings(CONFIGURATION_CACHE_TTL=0.2)
+    def test_update_without_signal_is_seen_within_the_ttl(self):
+        config = Configuration.objects.create(total_employees=12, total_units=4, performance_hours_offset=200)
+        repositories.get_configuration()
+
+        # Another process updates the row without the signals, e.g. with a local cache or a bulk update.
+        Configuration.objects.filter(pk=config.pk).update(performance_hours_offset=48)
+        self.assertEqual(200, repositories.get_configuration().performance_hours_offset)
+
+        time.sleep(0.25)
+        self.assertEqual(48, repositories.get_configuration().performance_hours_offset)
+        self.assertEqual(48, async_to_sync(repositories.aget_configuration)().performance_hours_offset)
+
+    def test_saving_the_form_refreshes_the_configuration(self):
+        Configuration.objects.create(total_employees=12, total_units=4, performance_hours_offset=200)
+        repositories.get_configuration()
+
+        self.client.post(reverse('config_form'), {'total_employees_number': 20, 'total_unities_number': 5,
+                                             'performance_hours_offset': 72})
+
+        self.assertEqual(72, repositories.get_configuration().performance_hours_offset)
+
+
+class ConfigurationStatisticsTest(TestCase):
+    def setUp(self):
+        repositories.invalidate_configuration_cache()
+        self.data = build_test_payload()
+        self.config = Configuration.objects.create(total_employees=12, total_units=4, performance_hours_offset=200)
+        self.snapshot = repositories.save_dashboard_snapshot(self.as_json(
+            services.aggregate_dashboard_data(self.data, self.config)))
+
+    @staticmethod
+    def as_json(data):
+        return json.loads(json.dumps(data, cls=DjangoJSONEncoder))
+
+    def post_configuration(self, total_employees=12, total_units=4, performance_hours_offset=200):
+        with patch('App.repositories.fetch_data_from_api') as fetch:
+            self.client.post(reverse('config_form'), {'total_employees_number': total_employees,
+                                                      'total_unities_number': total_units,
+                                                      'performance_hours_offset': performance_hours_offset})
+        fetch.assert_not_called()
+
+    def test_dependent_statistics(self):
+        previous = Configuration(total_employees=12, total_units=4, performance_hours_offset=200)
+
+        self.assertEqual(set(), services.configuration_dependent_statistics(previous, previous))
+        self.assertEqual({'performance'}, services.configuration_dependent_statistics(
+            previous, Configuration(total_employees=12, total_units=4, performance_hours_offset=24)))
+        self.assertEqual({'total_employees', 'activated_employees_percentage', 'performance'},
+                         services.configuration_dependent_statistics(None, previous))
+
+    def test_only_affected_statistics_are_recomputed_from_the_cached_payload(self):
+        with patch('App.repositories.get_cached_data', return_value=self.data):
+            self.post_configuration(total_employees=20, performance_hours_offset=48)
+
+        snapshot = repositories.get_latest_dashboard_snapshot()
+        config = Configuration(total_employees=20, total_units=4, performance_hours_offset=48)
+        self.assertEqual(self.as_json(services.aggregate_dashboard_data(self.data, config)), snapshot.data)
+        self.assertEqual(self.snapshot.version + 1, snapshot.version)
+        self.assertEqual(self.snapshot.created_at, snapshot.created_at)
+
+    def test_unused_fields_do_not_update_the_snapshot(self):
+        self.post_configuration(total_units=9)
+
+        self.assertEqual(self.snapshot.version, repositories.get_latest_dashboard_snapshot().version)
+
+    def test_performance_is_kept_without_cached_payload_nor_counts(self):
+        with patch('App.repositories.get_cached_data', return_value=None):
+            self.post_configuration(total_employees=20, performance_hours_offset=48)
+
+        snapshot = repositories.get_latest_dashboard_snapshot()
+        config = Configuration(total_employees=20, total_units=4, performance_hours_offset=48)
+        expected = self.as_json(services.aggregate_dashboard_data(self.data, config))
+        self.assertEqual({**expected, 'performance': self.snapshot.data['performance']}, snapshot.data)
+        self.assertEqual(self.snapshot.version + 1, snapshot.version)
+
+    def test_performance_is_recomputed_from_the_snapshot_counts(self):
+        records = [(key, record) for key in ['claims', 'users', 'categories', 'departments']
+                   for record in self.data[key]]
+        config = Configuration(total_employees=12, total_units=4, performance_hours_offset=48)
+        expected = services.aggregate_dashboard_data(copy.deepcopy(self.data), config)['performance']
+
+        for streaming in [False, True]:
+            with self.subTest(streaming=streaming), override_settings(UPSTREAM_STREAMING=streaming), \
+                    patch('App.repositories.fetch_cacheable_data_from_api', return_value=copy.deepcopy(self.data)), \
+                    patch('App.repositories.stream_records_from_api', return_value=iter(copy.deepcopy(records))):
+                Configuration.objects.update(performance_hours_offset=200)
+                repositories.invalidate_configuration_cache()
+                snapshot = services.refresh_dashboard_snapshot()
+
+                # The web worker has no cached payload, the snapshot was computed by another process.
+                with patch('App.repositories.get_cached_data', return_value=None):
+                    self.post_configuration(performance_hours_offset=48)
+
+                recomputed = repositories.get_latest_dashboard_snapshot()
+                self.assertEqual(snapshot.version + 1, recomputed.version)
+                self.assertEqual(expected, recomputed.data['performance'])
+                self.assertEqual(snapshot.performance_counts, recomputed.performance_counts)
+
+
+class DistinctCountTest(TestCase):
+    def test_hyperloglog_estimate(self):
+        sketch = HyperLogLog(12)
+        sketch.update(range(20000))
+        sketch.update(range(10000))
+
+        self.assertAlmostEqual(20000, len(sketch), delta=20000 * 0.05)
+
+        small = HyperLogLog()
+        small.update([1, 2, 3, None, '1', 3])
+        self.assertEqual(5, len(small))
+
+    def test_merged_sketches_count_the_union(self):
+        first, second, union = HyperLogLog(10), HyperLogLog(10), HyperLogLog(10)
+        first.update(range(0, 3000))
+        second.update(range(2000, 5000))
+        union.update(range(0, 5000))
+
+        self.assertEqual(union.registers, (first | second).registers)
+        self.assertEqual(union.registers, HyperLogLog.from_bytes((first | second).to_bytes()).registers)
+        with self.assertRaises(ValueError):
+            first.merge(HyperLogLog(11))
+
+    def test_sketch_mode_matches_exact_counts(self):
+        data = build_test_payload()
+        config = Configuration(total_employees=12, total_units=4, performance_hours_offset=200)
+        published_claims = [claim for claim in data['claims'] if claim['publish_date']]
+
+        expected = services.aggregate_dashboard_data(copy.deepcopy(data), config)
+        with override_settings(DISTINCT_COUNT_MODE='hll'):
+            self.assertEqual(expected, services.aggregate_dashboard_data(copy.deepcopy(data), config))
+            self.assertEqual(7, services.count_activated_employees(published_claims, 12)['number'])
+            self.assertEqual(4, services.count_activated_units(data['users'], 5)['number'])
+
+    def test_activated_employees_by_group_are_merged(self):
+        published_claims = [claim for claim in build_test_payload()['claims'] if claim['publish_date']]
+
+        for mode in ['exact', 'hll']:
+            groups = services.group_activated_employees(published_claims, lambda claim: claim['category'], mode)
+
+            self.assertEqual([1, 2, 3], sorted(groups))
+            self.assertEqual(7, len(groups[1] | groups[2] | groups[3]), mode)
+
+
+class QuantileSketchTest(TestCase):
+    @staticmethod
+    def rank(sorted_values, value):
+        return sum(1 for v in sorted_values if v <= value) / len(sorted_values)
+
+    def test_quantiles_are_exact_below_the_sketch_size(self):
+        sketch = QuantileSketch(k=50)
+        sketch.update([5, 1, 4, 2, 3, 3])
+
+        self.assertEqual([1, 3, 3, 4, 5], sketch.quantiles([0, 0.5, 0.6, 0.7, 1]))
+        self.assertIsNone(QuantileSketch().quantile(0.5))
+
+    def test_quantiles_of_a_large_stream(self):
+        values = [(i * 7919) % 100003 for i in range(50000)]
+        sorted_values = sorted(values)
+        sketch = QuantileSketch()
+        sketch.update(values)
+
+        self.assertLess(sum(len(compactor) for compactor in sketch.compactors), 1000)
+        for q in [0.5, 0.9, 0.99]:
+            self.assertAlmostEqual(q, self.rank(sorted_values, sketch.quantile(q)), delta=0.02)
+
+    def test_merged_sketches_estimate_the_union(self):
+        values = [(i * 7919) % 100003 for i in range(40000)]
+        sorted_values = sorted(values)
+        first, second = QuantileSketch(), QuantileSketch()
+        first.update(values[:10000])
+        second.update(values[10000:])
+
+        # Sketches survive a round trip through JSON, e.g. a rollup column or a cache.
+        merged = QuantileSketch.from_dict(json.loads(json.dumps(first.to_dict()))) | second
+
+        self.assertEqual(40000, len(merged))
+        for q in [0.5, 0.9, 0.99]:
+            self.assertAlmostEqual(q, self.rank(sorted_values, merged.quantile(q)), delta=0.02)
+
+    def test_format_time_percentiles(self):
+        sketch = QuantileSketch()
+        sketch.update(helpers.MICROSECONDS_PER_HOUR * hours for hours in [1, 2, 3, 50])
+
+        self.assertEqual([{'percentile': 50, 'days': 0, 'hours': 2, 'minutes': 0},
+                          {'percentile': 99, 'days': 2, 'hours': 2, 'minutes': 0}],
+                         helpers.format_time_percentiles(sketch, [50, 99]))
+        self.assertEqual([{'percentile': 90, 'days': 0, 'hours': 0, 'minutes': 0}],
+                         helpers.format_time_percentiles(QuantileSketch(), [90]))
+
+
+class StubPaginatedAPI:
+    """
+    Local HTTP server paginating the resources of a payload, like a paginated upstream API.
+
+    '/<resource>?page=N&page_size=M' serves numbered pages with the total 'count', and '/<resource>?cursor=N'
+    serves the page starting at record N with the URL of the next page in 'next'. With 'max_page_size', the
+    requested page size is capped, like APIs ignoring or bounding it.
+    """
+
+    def __init__(self, data, delay=0.0, max_page_size=None):
+        self.data = data
+        self.delay = delay
+        self.max_page_size = max_page_size
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.handler_class())
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub.lock:
+                    stub.requests.append(self.path)
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                try:
+                    time.sleep(stub.delay)
+                    body = json.dumps(stub.page(self.path)).encode()
+                finally:
+                    with stub.lock:
+                        stub.in_flight -= 1
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def page(self, path):
+        parts = urlsplit(path)
+        if parts.path == '/':
+            # The whole payload, like the 'BASE_URL' of the API.
+            return self.data
+
+        records = self.data[parts.path.strip('/')]
+        query = dict(parse_qsl(parts.query))
+
+        if 'cursor' in query:
+            start = int(query['cursor'])
+            end = start + 7
+            next_url = f'{self.url}{parts.path}?cursor={end}' if end < len(records) else None
+            return {'results': records[start:end], 'next': next_url}
+
+        page, page_size = int(query['page']), int(query['page_size'])
+        page_size = min(page_size, self.max_page_size or page_size)
+        return {'count': len(records), 'results': records[(page - 1) * page_size:page * page_size]}
+
+    def resource_urls(self, cursor=False):
+        return {resource: f'{self.url}/{resource}' + ('?cursor=0' if cursor else '')
+                for resource in ['claims', 'users', 'categories', 'departments']}
+
+
+@patch('App.repositories.env', side_effect=lambda key: key.lower())
+class PaginatedUpstreamTest(TestCase):
+    def setUp(self):
+        self.data = build_test_payload()
+        # More claims, so the claims span many pages.
+        self.data['claims'] = [{**claim, 'id': claim['id'] + 100 * copy_number}
+                               for copy_number in range(4) for claim in self.data['claims']]
+
+    def test_pages_are_fetched_concurrently_and_merged_in_order(self, mock_env):
+        with StubPaginatedAPI(self.data, delay=0.05) as api:
+            with override_settings(UPSTREAM_RESOURCE_URLS=api.resource_urls(), UPSTREAM_PAGINATION='page',
+                                   UPSTREAM_PAGE_SIZE=10, UPSTREAM_PAGE_WORKERS=3):
+                payload = repositories.fetch_data_from_api()
+
+        self.assertEqual(self.data, payload)
+        self.assertEqual(12 + 1 + 1 + 1, len(api.requests))
+        # The pages following the first one are fetched by up to 3 workers at a time.
+        self.assertEqual(3, api.max_in_flight)
+
+    def test_cursor_pages_are_followed(self, mock_env):
+        with StubPaginatedAPI(self.data) as api:
+            with override_settings(UPSTREAM_RESOURCE_URLS=api.resource_urls(cursor=True),
+                                   UPSTREAM_PAGINATION='cursor'):
+                payload = repositories.fetch_data_from_api()
+
+        self.assertEqual(self.data, payload)
+        self.assertEqual(1, api.max_in_flight)
+
+    def test_pages_are_fetched_asynchronously(self, mock_env):
+        with StubPaginatedAPI(self.data, delay=0.05) as api:
+            with override_settings(UPSTREAM_RESOURCE_URLS=api.resource_urls(), UPSTREAM_PAGINATION='page',
+                                   UPSTREAM_PAGE_SIZE=10, UPSTREAM_PAGE_WORKERS=4):
+                payload = asyncio.run(repositories.afetch_data_from_api())
+
+        self.assertEqual(self.data, payload)
+        self.assertLessEqual(api.max_in_flight, 4 + 3)
+
+    def test_capped_page_size_fetches_every_page(self, mock_env):
+        with StubPaginatedAPI(self.data, max_page_size=7) as api:
+            with override_settings(UPSTREAM_RESOURCE_URLS=api.resource_urls(), UPSTREAM_PAGINATION='page',
+                                   UPSTREAM_PAGE_SIZE=10, UPSTREAM_PAGE_WORKERS=3):
+                payload = repositories.fetch_data_from_api()
+                apayload = asyncio.run(repositories.afetch_data_from_api())
+
+        self.assertEqual(self.data, payload)
+        self.assertEqual(self.data, apayload)
+        # 120 claims in pages of 7 records instead of 10.
+        self.assertEqual(2 * (18 + 2 + 1 + 1), len(api.requests))
+
+    def test_page_url_and_page_count(self, mock_env):
+        with override_settings(UPSTREAM_PAGE_SIZE=50):
+            self.assertEqual('https://api.example.com/claims?status=open&page=3&page_size=50',
+                             repositories.page_url('https://api.example.com/claims?status=open&page=1', 3))
+            self.assertEqual(3, repositories.page_count({'count': 101, 'results': [{}] * 50}))
+            self.assertEqual(6, repositories.page_count({'count': 101, 'results': [{}] * 20}))
+            self.assertEqual(3, repositories.page_count({'count': 101, 'results': []}))
+            self.assertEqual(1, repositories.page_count({'count': 0, 'results': []}))
+            self.assertEqual(7, repositories.page_count({'total_pages': 7, 'results': []}))
+
+
+class StreamingTest(TestCase):
+    @staticmethod
+    def chunked(text, size):
+        return (text[i:i + size] for i in range(0, len(text), size))
+
+    def test_records_are_decoded_from_chunks_of_any_size(self):
+        data = build_test_payload()
+        text = json.dumps(data, indent=1)
+        expected = [(key, record) for key in ['claims', 'users', 'categories', 'departments'] for record in data[key]]
+
+        for size in [1, 7, 64, len(text)]:
+            self.assertEqual(expected, list(iter_payload_records(self.chunked(text, size))), size)
+
+    def test_values_split_across_chunks(self):
+        text = '[123456, 7.5e3, true, null, "a \\"quoted\\" text", [], {}]'
+
+        self.assertEqual([(None, 123456), (None, 7.5e3), (None, True), (None, None), (None, 'a "quoted" text'),
+                          (None, []), (None, {})], list(iter_payload_records(self.chunked(text, 1))))
+
+    def test_values_which_are_not_arrays_are_skipped(self):
+        text = '{"count": 2, "meta": {"claims": [0]}, "claims": [{"id": 1}, {"id": 2}], "users": []}'
+
+        self.assertEqual([('claims', {'id': 1}), ('claims', {'id': 2})],
+                         list(iter_payload_records(self.chunked(text, 5))))
+
+    def test_invalid_payload(self):
+        for text in ['{"claims": [{"id": 1}', '{"claims": [1 2]}', '"claims"', '{"claims" [1]}']:
+            with self.assertRaises(ValueError):
+                list(iter_payload_records(self.chunked(text, 3)))
+
+    def test_table_from_records_resolves_departments_of_users_received_last(self):
+        data = build_test_payload()
+        records = [('claims', claim) for claim in data['claims']] + [('users', user) for user in data['users']]
+
+        table = ClaimTable.from_records(records)
+        expected = ClaimTable.from_payload(data)
+
+        self.assertEqual(list(expected.departments), list(table.departments))
+        self.assertEqual(list(expected.user_departments), list(table.user_departments))
+
+    @override_settings(UPSTREAM_STREAMING=True, UPSTREAM_STREAM_CHUNK_SIZE=256)
+    def test_snapshot_is_computed_while_payload_is_streamed(self):
+        data = build_test_payload()
+        config = Configuration.objects.create(total_employees=12, total_units=4, performance_hours_offset=200)
+
+        with StubPaginatedAPI(data) as api:
+            with patch('App.repositories.env', side_effect=lambda key: api.url if key == 'BASE_URL' else 'token'):
+                snapshot = services.refresh_dashboard_snapshot()
+
+        expected = json.loads(json.dumps(services.aggregate_dashboard_data(copy.deepcopy(data), config),
+                                         cls=DjangoJSONEncoder))
+        self.assertEqual(expected, snapshot.data)
+        self.assertEqual(['/'], api.requests)
+
+
+class SyncTest(TestCase):
+    def setUp(self):
+        self.data = build_test_payload()
+        for claim in self.data['claims']:
+            claim['updated_at'] = format_test_datetime(600 - claim['id'])
+        self.requested_since = []
+
+    def stream_records(self, since=None):
+        self.requested_since.append(since)
+        return ((key, copy.deepcopy(record)) for key in ['claims', 'users', 'categories', 'departments']
+                for record in self.data[key])
+
+    def sync(self, full=False):
+        with patch('App.sync.repositories.stream_records_from_api', side_effect=self.stream_records):
+            return sync_from_api(full=full)
+
+    @override_settings(SYNC_BATCH_SIZE=7)
+    def test_stored_statistics_match_the_aggregated_payload(self):
+        config = Configuration.objects.create(total_employees=12, total_units=4, performance_hours_offset=200)
+
+        counts = self.sync()
+
+        self.assertEqual({'claims': 30, 'users': 10, 'categories': 3, 'departments': 5,
+                          'cursor': self.data['claims'][-1]['updated_at']}, counts)
+        self.assertEqual(services.aggregate_dashboard_data(self.data, config), services.stored_dashboard_data(config))
+
+    def test_cursor_advances_and_updated_claims_are_upserted(self):
+        self.sync()
+        cursor = SyncCursor.objects.get(resource='claims').value
+
+        self.data['claims'][0].update(close=True, close_date=format_test_datetime(1),
+                                      updated_at=format_test_datetime(0))
+        counts = self.sync()
+
+        self.assertEqual([None, cursor], self.requested_since)
+        self.assertEqual(self.data['claims'][0]['updated_at'], counts['cursor'])
+        self.assertEqual(30, Claim.objects.count())
+        self.assertTrue(Claim.objects.get(pk=1).close)
+
+        self.sync(full=True)
+        self.assertIsNone(self.requested_since[-1])
+
+    @override_settings(DASHBOARD_SOURCE='store')
+    def test_snapshot_is_computed_from_the_store(self):
+        config = Configuration.objects.create(total_employees=12, total_units=4, performance_hours_offset=200)
+        self.sync()
+
+        with patch('App.repositories.fetch_data_from_api') as fetch:
+            snapshot = services.refresh_dashboard_snapshot()
+
+        fetch.assert_not_called()
+        expected = json.loads(json.dumps(services.aggregate_dashboard_data(self.data, config), cls=DjangoJSONEncoder))
+        self.assertEqual(expected, snapshot.data)
+
+    @override_settings(DASHBOARD_SOURCE='store')
+    def test_configuration_change_recomputes_the_performance_from_the_store(self):
+        previous = Configuration.objects.create(total_employees=12, total_units=4, performance_hours_offset=200)
+        self.sync()
+        services.refresh_dashboard_snapshot()
+        config = Configuration(pk=previous.pk, total_employees=12, total_units=4, performance_hours_offset=48)
+
+        snapshot = services.refresh_configuration_statistics(previous, config)
+
+        self.assertEqual(services.aggregate_dashboard_data(self.data, config)['performance'],
+                         snapshot.data['performance'])
+
+    @override_settings(DASHBOARD_SOURCE='store')
+    def test_dashboard_view_is_served_from_the_store(self):
+        config = Configuration.objects.create(total_employees=12, total_units=4, performance_hours_offset=200)
+        self.sync()
+
+        # There is no snapshot, and the API must not be called.
+        with patch('App.repositories.afetch_data_from_api', side_effect=AssertionError("API called")), \
+                patch('App.repositories.fetch_data_from_api', side_effect=AssertionError("API called")):
+            response = self.client.get(reverse('dashboard'))
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(services.aggregate_dashboard_data(self.data, config)['performance'],
+                         response.context['ctx']['performance'])
+        self.assertIsNone(response.context['ctx']['snapshot_version'])
+
+    def test_recent_claims_are_paged_from_the_store(self):
+        self.sync()
+        with patch('App.repositories.fetch_cached_data_from_api', return_value=self.data):
+            expected = [services.recent_claims_page(status, 2, page_size=4) for status in ['unclosed', 'closed']]
+
+        with override_settings(DASHBOARD_SOURCE='store'), \
+                patch('App.repositories.fetch_cached_data_from_api', side_effect=AssertionError("API called")):
+            self.assertEqual(expected, [services.recent_claims_page(status, 2, page_size=4)
+                                        for status in ['unclosed', 'closed']])
+
+    def rollup_rows(self, model):
+        return sorted(model.objects.values_list('period', 'category', 'department', 'published', 'closed',
+                                                'started', 'ended', 'response_time', 'ending_time'))
+
+    def test_rollups_are_updated_incrementally(self):
+        self.sync()
+        self.assertEqual(29, sum(MonthlyClaimRollup.objects.values_list('published', flat=True)))
+        self.assertEqual(29, sum(DailyClaimRollup.objects.values_list('published', flat=True)))
+
+        # Close a claim, move another one to a new category and unpublish a third one.
+        self.data['claims'][0].update(close=True, close_date=format_test_datetime(1))
+        self.data['claims'][1].update(category=9)
+        self.data['claims'][2].update(publish_date=None, start_date=None)
+        self.data['users'][1].update(department=8)
+        self.sync()
+
+        self.assertEqual({1: 8, 2: 10, 3: 9, 9: 1}, repositories.stored_category_counts())
+        self.assertEqual({2: 4, 3: 2}, repositories.stored_category_counts(closed=True))
+        self.assertEqual(28, Claim.objects.filter(department__isnull=False).exclude(publish_date=None).count())
+        self.assertEqual(5, Claim.objects.filter(department=8).count())
+
+        # The incremental updates give the same rows as a rebuild from the stored claims.
+        expected = self.rollup_rows(DailyClaimRollup), self.rollup_rows(MonthlyClaimRollup)
+        rebuild_rollups()
+        self.assertEqual(expected, (self.rollup_rows(DailyClaimRollup), self.rollup_rows(MonthlyClaimRollup)))
+
+    def test_daily_counts(self):
+        self.sync()
+        today = datetime.now(timezone.utc).date()
+        start = today - timedelta(days=40)
+
+        counts = repositories.stored_daily_counts(start, today)
+
+        published = [helpers.timestamp_to_datetime(helpers.parse_timestamp(claim['publish_date'])).date()
+                     for claim in self.data['claims'] if claim['publish_date']]
+        self.assertEqual([published.count(start + timedelta(days=i)) for i in range(41)], counts)
+        self.assertEqual([], repositories.stored_daily_counts(today, start))
+
+    def test_max_watermark(self):
+        self.assertEqual('10', max_watermark('9', 10))
+        self.assertEqual('9', max_watermark('9', None))
+        self.assertEqual('2024-01-01T10:00:00+01:00', max_watermark(None, '2024-01-01T10:00:00+01:00'))
+        self.assertEqual('2024-01-01T09:30:00Z', max_watermark('2024-01-01T10:00:00+01:00', '2024-01-01T09:30:00Z'))
+
+
+class RecentClaimsTest(TestCase):
+    def setUp(self):
+        self.data = build_test_payload()
+        patcher = patch('App.repositories.fetch_cached_data_from_api', return_value=self.data)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_recent_claims_pages(self):
+        response = self.client.get(reverse('recent_claims', args=['unclosed']), {'page': 2, 'page_size': 10})
+
+        self.assertEqual(200, response.status_code)
+        page = response.json()
+        self.assertEqual(2, page['page'])
+        self.assertEqual(24, page['count'])
+        self.assertEqual(3, page['num_pages'])
+        self.assertEqual([17, 15, 14, 13, 12, 11, 10, 9, 7, 6], [claim['id'] for claim in page['results']])
+
+        page = self.client.get(reverse('recent_claims', args=['closed'])).json()
+        self.assertEqual([28, 20, 16, 8, 4], [claim['id'] for claim in page['results']])
+
+    @override_settings(RECENT_CLAIMS_MAX_PAGE_SIZE=3)
+    def test_page_size_is_bounded(self):
+        page = services.recent_claims_page('closed', 'invalid', page_size=50)
+
+        self.assertEqual(1, page['page'])
+        self.assertEqual(3, len(page['results']))
+
+    def test_index_is_built_once_per_payload(self):
+        index = services.get_recent_claims_index(self.data)
+
+        self.assertIs(index, services.get_recent_claims_index(self.data))
+        self.assertIsNot(index, services.get_recent_claims_index(copy.deepcopy(self.data)))
+
+    def test_unknown_status(self):
+        response = self.client.get(reverse('recent_claims', args=['pending']))
+
+        self.assertEqual(404, response.status_code)
+
+
+class ServerTimingTest(TestCase):
+    def setUp(self):
+        repositories.invalidate_configuration_cache()
+        self.data = build_test_payload()
+        Configuration.objects.create(total_employees=12, total_units=4, performance_hours_offset=200)
+
+    @staticmethod
+    def stage_names(header):
+        return {metric.split(';')[0] for metric in header.split(', ')}
+
+    @override_settings(SERVER_TIMING=True)
+    def test_stages_of_the_async_dashboard_view(self):
+        with patch('App.repositories.fetch_cached_data_from_api', return_value=self.data), \
+                self.assertLogs('App.timing', 'INFO') as logs:
+            response = self.client.get(reverse('dashboard'), {'from': '2000-01-01'})
+
+        self.assertEqual(200, response.status_code)
+        # The stages run by 'sync_to_async' in a thread are collected with the stages of the view.
+        self.assertLessEqual({'total', 'configuration', 'range', 'count_activated_units', 'render'},
+                             self.stage_names(response['Server-Timing']))
+
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(('request_timings', '/', 200), (line['event'], line['path'], line['status']))
+        self.assertEqual(1, line['stages']['count_activated_units']['calls'])
+
+    @override_settings(SERVER_TIMING=True)
+    def test_stages_of_a_sync_view(self):
+        with patch('App.repositories.fetch_cached_data_from_api', return_value=self.data):
+            response = self.client.get(reverse('recent_claims', args=['closed']))
+
+        self.assertEqual({'total'}, self.stage_names(response['Server-Timing']))
+
+    def test_timings_are_not_collected_when_disabled(self):
+        with patch('App.repositories.fetch_cached_data_from_api', return_value=self.data):
+            response = self.client.get(reverse('recent_claims', args=['closed']))
+
+        self.assertNotIn('Server-Timing', response)
+
+        # Outside of a request, the stages are not timed.
+        with timed('stage'):
+            pass
+
+    def test_server_timing_header(self):
+        token, timings = start_collecting()
+        try:
+            for _ in range(2):
+                with timed('fetch'):
+                    pass
+        finally:
+            stop_collecting(token)
+
+        self.assertEqual(2, timings['fetch'][1])
+        self.assertEqual('fetch;dur=120.5;desc="1 call", render;dur=8.0;desc="2 calls"',
+                         server_timing_header({'fetch': [0.1205, 1], 'render': [0.008, 2]}))
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        repositories.invalidate_configuration_cache()
+        repositories.clear_cached_data()
+        REGISTRY.clear()
+        self.data = build_test_payload()
+        self.config = Configuration.objects.create(total_employees=12, total_units=4, performance_hours_offset=200)
+
+    def tearDown(self):
+        repositories.clear_cached_data()
+
+    def test_text_exposition_format(self):
+        registry = Registry()
+        counter = Counter('requests_total', 'Requests.', ['path'], registry=registry)
+        histogram = Histogram('size_bytes', 'Sizes.', buckets=(10, 100), registry=registry)
+        counter.inc(path='/a"b')
+        counter.inc(2, path='/a"b')
+        for value in (5, 50, 500):
+            histogram.observe(value)
+
+        self.assertEqual(
+            '# HELP requests_total Requests.\n'
+            '# TYPE requests_total counter\n'
+            'requests_total{path="/a\\"b"} 3\n'
+            '# HELP size_bytes Sizes.\n'
+            '# TYPE size_bytes histogram\n'
+            'size_bytes_bucket{le="10"} 1\n'
+            'size_bytes_bucket{le="100"} 2\n'
+            'size_bytes_bucket{le="+Inf"} 3\n'
+            'size_bytes_sum 555\n'
+            'size_bytes_count 3\n',
+            registry.render())
+
+        with self.assertRaises(ValueError):
+            counter.inc(method='GET')
+
+    @override_settings(UPSTREAM_CACHE_TTL=60)
+    @patch('App.repositories.fetch_data_from_api')
+    def test_payload_cache_results(self, mock_fetch_data_from_api):
+        mock_fetch_data_from_api.return_value = self.data
+        for _ in range(3):
+            repositories.fetch_cached_data_from_api()
+
+        self.assertEqual(1, UPSTREAM_CACHE_REQUESTS.value(result='miss'))
+        self.assertEqual(2, UPSTREAM_CACHE_REQUESTS.value(result='hit'))
+        self.assertEqual(0, UPSTREAM_CACHE_REQUESTS.value(result='stale'))
+
+    @patch('App.repositories.env', side_effect=lambda key: key.lower())
+    @patch('App.repositories.get_http_session')
+    def test_upstream_errors_and_payload_bytes(self, mock_get_http_session, mock_env):
+        mock_get_http_session.return_value.get.return_value.content = b'{"claims": []}'
+        mock_get_http_session.return_value.get.return_value.json.return_value = {'claims': []}
+        repositories.fetch_json('http://api.test/')
+        self.assertEqual(1, UPSTREAM_RESPONSE_BYTES.count(client='sync'))
+
+        mock_get_http_session.return_value.get.side_effect = requests.ConnectionError()
+        with self.assertRaises(requests.ConnectionError):
+            repositories.fetch_json('http://api.test/')
+        self.assertEqual(1, UPSTREAM_ERRORS.value(client='sync', error='ConnectionError'))
+
+    def test_metrics_are_disabled_by_default(self):
+        self.assertEqual(404, self.client.get(reverse('metrics')).status_code)
+
+    @override_settings(METRICS_ENABLED=True)
+    def test_metrics_endpoint(self):
+        repositories.save_dashboard_snapshot(services.aggregate_dashboard_data(self.data, self.config))
+        published = sum(1 for claim in self.data['claims'] if claim['publish_date'])
+
+        response = self.client.get(reverse('metrics'))
+
+        self.assertEqual(200, response.status_code)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertEqual(1, CLAIMS_PER_COMPUTATION.count(source='api'))
+        self.assertEqual(published, CLAIMS_PER_COMPUTATION.values[('api',)][1])
+        # The KPI functions and stages are timed outside of a request too.
+        self.assertEqual(1, STAGE_SECONDS.count(stage='aggregate'))
+
+        lines = response.content.decode().splitlines()
+        self.assertIn('# TYPE dashboard_snapshot_age_seconds gauge', lines)
+        self.assertIn('dashboard_snapshot_version 1', lines)
+        self.assertIn('dashboard_stage_seconds_count{stage="aggregate"} 1', lines)
+
+
+class BenchmarkTest(TestCase):
+    def test_synthetic_payload(self):
+        now = helpers.current_timestamp()
+        data = synthetic_payload(2000, seed=1, now=now)
+
+        self.assertEqual(data, synthetic_payload(2000, seed=1, now=now))
+        self.assertEqual(2000, len(data['claims']))
+        self.assertEqual(40, len(data['users']))
+        self.assertLessEqual({claim['employee'] for claim in data['claims']}, {user['id'] for user in data['users']})
+        self.assertLessEqual({user['department'] for user in data['users']},
+                             {department['id'] for department in data['departments']})
+
+        for claim in data['claims']:
+            dates = [helpers.parse_timestamp(claim[key]) for key in ('publish_date', 'start_date', 'end_date',
+                                                                     'close_date') if claim[key]]
+            # The dates are set in order, none of them after the generation.
+            self.assertEqual(sorted(dates), dates)
+            self.assertTrue(all(date <= now for date in dates))
+            self.assertEqual(bool(claim['close_date']), claim['close'])
+
+        config = Configuration(total_employees=40, total_units=4, performance_hours_offset=24)
+        result = services.aggregate_dashboard_data(data, config)
+        # Above the size of the quantile sketches, the percentiles are estimated.
+        approximate = {key: result[key]
+                       for key in ('response_time_percentiles', 'ending_time_percentiles', 'performance_curve')}
+        self.assertEqual(result, {**legacy_dashboard_data(data, config), **approximate})
+
+    def test_every_function_is_benchmarked(self):
+        functions = {f'{module.__name__.split(".")[-1]}.{name}'
+                     for module in (services, helpers)
+                     for name, function in inspect.getmembers(module, inspect.isfunction)
+                     if function.__module__ == module.__name__ and not name.startswith('_')}
+
+        benchmarked = {name for name in [*BENCHMARKS, *STREAMED_BENCHMARKS]
+                       if name.split('.')[0] in ('services', 'helpers')}
+
+        self.assertEqual(functions, benchmarked | set(EXCLUDED))
+        self.assertFalse(benchmarked & set(EXCLUDED))
+        self.assertFalse(set(BENCHMARKS) & set(STREAMED_BENCHMARKS))
+
+    @patch('App.benchmarks.MAX_PAYLOAD_CLAIMS', 100)
+    def test_large_payloads_run_the_streamed_benchmarks_only(self):
+        config = Configuration.objects.create(total_employees=10, total_units=1, performance_hours_offset=24)
+        names = ['services.dashboard_data', 'services.stream_dashboard_data', 'services.table_dashboard_data']
+
+        with patch('App.benchmarks.synthetic_payload', wraps=synthetic_payload) as payload:
+            results = list(run_benchmarks([100, 300], config, names, repeat=1))
+
+        self.assertEqual([('services.dashboard_data', 100), ('services.stream_dashboard_data', 100),
+                          ('services.table_dashboard_data', 100), ('services.stream_dashboard_data', 300),
+                          ('services.table_dashboard_data', 300)],
+                         [(result['function'], result['claims']) for result in results])
+        # Only the payload of 100 claims is materialized.
+        self.assertEqual([100], [call.args[0] for call in payload.call_args_list])
+
+    def test_benchmark_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'benchmark.json')
+            call_command('benchmark', sizes=[100, 300], functions=['services.dashboard_data', 'parse_timestamp'],
+                         repeat=1, output=output, stdout=StringIO())
+            with open(output) as file:
+                results = json.load(file)
+
+        self.assertEqual([('services.dashboard_data', 100), ('helpers.parse_timestamp', 100),
+                          ('services.dashboard_data', 300), ('helpers.parse_timestamp', 300)],
+                         [(result['function'], result['claims']) for result in results])
+        self.assertTrue(all(result['seconds'] > 0 and result['peak_memory'] >= 0 for result in results))
+        # The configuration created for the benchmarks is rolled back.
+        self.assertFalse(Configuration.objects.exists())
+        self.assertIsNone(repositories.get_cached_data())
+
+
+class DateRangeTest(TestCase):
+    def setUp(self):
+        self.data = build_test_payload()
+        self.config = Configuration.objects.create(total_employees=12, total_units=4, performance_hours_offset=200)
+
+    def test_unbounded_range_matches_aggregated_dashboard(self):
+        expected = services.aggregate_dashboard_data(copy.deepcopy(self.data), self.config)
+
+        with patch('App.repositories.fetch_cached_data_from_api', return_value=self.data):
+            result = services.range_dashboard_data()
+
+        self.assertIsNone(result.pop('range')['from'])
+        result.pop('as_of')
+        result.pop('snapshot_version')
+        self.assertDictEqual(expected, result)
+
+    def test_range_restricts_statistics_to_claims_published_in_range(self):
+        start = helpers.parse_timestamp(format_test_datetime(310))
+        end = helpers.parse_timestamp(format_test_datetime(100))
+        in_range = [claim for claim in self.data['claims']
+                    if claim['publish_date'] and start <= helpers.parse_timestamp(claim['publish_date']) <= end]
+        aggregator = DashboardAggregator(self.config.performance_hours_offset, self.config.total_employees, 10,
+                                         now=end, months=helpers.month_range(start, end))
+        expected = aggregator.feed({**copy.deepcopy(self.data), 'claims': copy.deepcopy(in_range)}).result()
+
+        with patch('App.repositories.fetch_cached_data_from_api', return_value=self.data):
+            result = services.range_dashboard_data(start, end)
+
+        self.assertEqual(list(range(5, 16)), sorted(claim['id'] for claim in in_range))
+        for key in ['activated_employees', 'activated_employees_percentage', 'mean_response_time', 'mean_ending_time',
+                    'most_opened_claim_category', 'most_closed_claim_category_times', 'last_five_unclosed_claims',
+                    'last_five_closed_claims', 'opened_categories_ranking', 'closed_categories_ranking',
+                    'bar_chart', 'line_chart']:
+            self.assertEqual(expected[key], result[key], key)
+
+    def test_claims_range_index_is_built_once_per_payload(self):
+        index = services.get_claims_range_index(self.data)
+
+        self.assertIs(index, services.get_claims_range_index(self.data))
+        self.assertIsNot(index, services.get_claims_range_index(copy.deepcopy(self.data)))
+
+    def test_dashboard_view_with_date_range(self):
+        today = datetime.now(timezone.utc).date().isoformat()
+
+        with patch('App.repositories.fetch_cached_data_from_api', return_value=self.data):
+            response = self.client.get(reverse('dashboard'), {'from': today, 'to': today})
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(helpers.parse_date_range(today, today)[1],
+                         helpers.parse_timestamp(response.context['ctx']['range']['to'].isoformat()))
+
+    def test_dashboard_view_rejects_invalid_date_range(self):
+        self.assertEqual(400, self.client.get(reverse('dashboard'), {'from': 'yesterday'}).status_code)
+        self.assertEqual(400, self.client.get(reverse('dashboard'), {'from': '2024-02-01', 'to': '2024-01-01'})
+                         .status_code)
+        self.assertEqual(400, self.client.get(reverse('dashboard'), {'to': '9999-12-31T23:00:00-05:00'}).status_code)
+
+    def test_dashboard_view_with_last_supported_date(self):
+        with patch('App.repositories.fetch_cached_data_from_api', return_value=self.data):
+            response = self.client.get(reverse('dashboard'), {'to': '9999-12-31'})
+
+        self.assertEqual(200, response.status_code)
+        self.assertEqual(12, len(response.context['ctx']['bar_chart']['labels']))
+        december = helpers.month_index(9999, 12)
+        self.assertEqual(helpers.month_index_timestamp(december) + 31 * helpers.MICROSECONDS_PER_DAY,
+                         helpers.month_index_timestamp(december + 1))
+
+    def test_range_summary_tree_matches_scan(self):
+        rng = random.Random(0)
+        count = 37
+        response_times = [rng.choice([None, rng.randint(0, 100)]) for _ in range(count)]
+        ending_times = [rng.choice([None, rng.randint(0, 100)]) for _ in range(count)]
+        closed = [rng.random() < 0.4 for _ in range(count)]
+        keys = [rng.randint(0, 9) for _ in range(count)]
+        tree = RangeSummaryTree(response_times, ending_times, closed, keys, last_claims_count=3, block_size=4)
+
+        for start in range(count + 1):
+            for stop in range(start, count + 1):
+                response_sketch, ending_sketch, unclosed, closed_positions = tree.query(start, stop)
+                positions = range(start, stop)
+                expected_unclosed = sorted((i for i in positions if not closed[i]), key=lambda i: (-keys[i], i))
+                expected_closed = sorted((i for i in positions if closed[i]), key=lambda i: (-keys[i], i))
+                self.assertEqual(expected_unclosed[:3], unclosed)
+                self.assertEqual(expected_closed[:3], closed_positions)
+                self.assertEqual(sorted(time for time in response_times[start:stop] if time is not None),
+                                 sorted(value for values in response_sketch.compactors for value in values))
+                self.assertEqual(len([time for time in ending_times[start:stop] if time is not None]),
+                                 len(ending_sketch))
+
+
+class SingleFlightTest(TestCase):
+    def test_concurrent_calls_share_one_execution(self):
+        flights = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return {'value': 42}
+
+        leader = threading.Thread(target=lambda: results.append(flights.do('key', compute)))
+        leader.start()
+        started.wait(5)
+
+        # Count the followers waiting for the in-flight call, to release the leader once they all wait.
+        call = flights._calls['key']
+        waiting = threading.Semaphore(0)
+        wait = call.done.wait
+        call.done.wait = lambda *args: (waiting.release(), wait(*args))[1]
+
+        followers = [threading.Thread(target=lambda: results.append(flights.do('key', compute))) for _ in range(5)]
+        for follower in followers:
+            follower.start()
+        for _ in followers:
+            self.assertTrue(waiting.acquire(timeout=5))
+        release.set()
+        for thread in [leader] + followers:
+            thread.join(5)
+
+        self.assertEqual(1, len(calls))
+        self.assertEqual(6, len(results))
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_error_is_raised_and_next_call_runs_again(self):
+        flights = SingleFlight()
+
+        with self.assertRaises(ValueError):
+            flights.do('key', lambda: (_ for _ in ()).throw(ValueError('upstream down')))
+
+        self.assertEqual(1, flights.do('key', lambda: 1))
+
+    def test_shared_call_reuses_result_of_another_worker(self):
+        flights = SingleFlight()
+        cache.set('single_flight:key:lock', 'token', 5)
+        cache.set('single_flight:key:token', 'from another worker', 5)
+        self.addCleanup(cache.clear)
+
+        self.assertEqual('from another worker', flights.do('key', lambda: 'computed', shared_timeout=1))
+
+    def test_shared_call_runs_when_no_other_worker(self):
+        flights = SingleFlight()
+        self.addCleanup(cache.clear)
+
+        self.assertEqual('computed', flights.do('key', lambda: 'computed', shared_timeout=1))
+        self.assertIsNone(cache.get('single_flight:key:lock'))
+
+
+class DashboardSnapshotTest(TestCase):
+    def setUp(self):
+        Configuration.objects.create(total_employees=12, total_units=4, performance_hours_offset=48)
+
+    @patch('App.repositories.fetch_data_from_api')
+    def test_refresh_dashboard_command_saves_versioned_snapshots(self, mock_fetch_data_from_api):
+        mock_fetch_data_from_api.return_value = build_test_payload()
+
+        call_command('refresh_dashboard', stdout=StringIO())
+        call_command('refresh_dashboard', stdout=StringIO())
+
+        self.assertEqual([1, 2], list(DashboardSnapshot.objects.order_by('version').values_list('version', flat=True)))
+        self.assertEqual(7, repositories.get_latest_dashboard_snapshot().data['activated_employees'])
+
+    def test_dashboard_view_renders_snapshot(self):
+        config = Configuration.objects.get()
+        repositories.save_dashboard_snapshot(services.aggregate_dashboard_data(build_test_payload(), config))
+
+        response = self.client.get(reverse('dashboard'))
+
+        self.assertEqual(200, response.status_code)
+        self.assertContains(response, 'Opened Claims by Category')
+        self.assertContains(response, 'Risques')
+
+    @override_settings(DASHBOARD_SNAPSHOTS_KEPT=2)
+    def test_old_snapshots_are_pruned(self):
+        for _ in range(4):
+            repositories.save_dashboard_snapshot({})
+
+        self.assertEqual([3, 4], list(DashboardSnapshot.objects.order_by('version').values_list('version', flat=True)))
+
+    @patch('App.services.adashboard_data')
+    def test_recent_snapshot_is_served(self, mock_dashboard_data):
+        snapshot = repositories.save_dashboard_snapshot({'activated_employees': 3})
+
+        data = async_to_sync(services.alatest_dashboard_data)()
+
+        self.assertEqual(3, data['activated_employees'])
+        self.assertEqual(snapshot.created_at, data['as_of'])
+        self.assertEqual(1, data['snapshot_version'])
+        self.assertFalse(mock_dashboard_data.called)
+
+    @override_settings(DASHBOARD_SNAPSHOT_MAX_AGE=60)
+    @patch('App.services.adashboard_data')
+    def test_outdated_snapshot_is_not_served(self, mock_dashboard_data):
+        mock_dashboard_data.return_value = {'activated_employees': 5}
+        snapshot = repositories.save_dashboard_snapshot({'activated_employees': 3})
+        DashboardSnapshot.objects.filter(pk=snapshot.pk).update(created_at=snapshot.created_at - timedelta(minutes=2))
+
+        data = async_to_sync(services.alatest_dashboard_data)()
+
+        self.assertEqual(5, data['activated_employees'])
+        self.assertIsNone(data['snapshot_version'])
+
+
+class ClaimTableTest(TestCase):
+    def test_table_dashboard_data_matches_aggregation(self):
+        config = Configuration(total_employees=12, total_units=4, performance_hours_offset=200)
+        data = build_test_payload()
+        table = ClaimTable.from_payload(data)
+
+        expected = services.aggregate_dashboard_data(data, config)
+        result = services.table_dashboard_data(table, data['categories'], len(data['departments']), config)
+
+        for key in ['last_five_unclosed_claims', 'last_five_closed_claims']:
+            self.assertEqual([claim['id'] for claim in expected.pop(key)], [claim['id'] for claim in result.pop(key)])
+        self.assertDictEqual(expected, result)
+
+    def test_views(self):
+        table = ClaimTable.from_payload(build_test_payload())
+
+        self.assertEqual(30, len(table))
+        self.assertEqual(29, len(table.published()))
+        self.assertEqual(5, len(table.closed()))
+        self.assertEqual(24, len(table.unclosed()))
+        self.assertEqual(10, len(table.where(tables.STARTED, tables.ENDED)))
+
+    def test_row_rebuilds_claim(self):
+        claim = {'id': 7, 'message': 'message', 'status': 'proceed', 'category': 2, 'employee': 3, 'close': False,
+                 'publish_date': '2023-08-01T14:33:25.557503Z', 'start_date': '2023-08-01T15:33:25.557503Z',
+                 'end_date': None, 'close_date': None}
+        table = ClaimTable.from_payload({'claims': [claim], 'users': [{'id': 3, 'department': 1}]})
+
+        self.assertDictEqual(claim, table.row(0))
+        self.assertEqual(0, table.departments[0])
+
+    def test_services_accept_table(self):
+        claims = [{'id': i, 'employee': i % 2, 'category': 1 if i < 3 else 2, 'close': False,
+                   'publish_date': format_test_datetime(i), 'start_date': None, 'end_date': None}
+                  for i in range(1, 6)]
+        categories = [{'name': 'category one', 'id': 1}, {'name': 'category two', 'id': 2}]
+        table = ClaimTable.from_payload({'claims': claims, 'users': []})
+
+        self.assertEqual(services.count_activated_employees(claims, 4), services.count_activated_employees(table, 4))
+        self.assertEqual(services.find_most_occurred_claim_category(claims, categories),
+                         services.find_most_occurred_claim_category(table, categories))
+        self.assertEqual(services.group_claims_by_publish_date_cumuli(claims),
+                         services.group_claims_by_publish_date_cumuli(table))
+
+
+class CompactCacheTest(TestCase):
+    def setUp(self):
+        self.data = build_test_payload()
+        self.compact = tables.compact_payload(copy.deepcopy(self.data))
+        self.config = Configuration.objects.create(total_employees=12, total_units=4, performance_hours_offset=200)
+        repositories.clear_cached_data()
+        self.addCleanup(repositories.clear_cached_data)
+
+    @staticmethod
+    def claim_ids(claims):
+        return [claim['id'] for claim in claims]
+
+    @override_settings(UPSTREAM_COMPACT_CACHE=True)
+    def test_cached_payload_is_compact(self):
+        with patch('App.repositories.fetch_data_from_api', return_value=self.data):
+            payload = repositories.fetch_cached_data_from_api()
+
+        self.assertIsInstance(payload['claims'], ClaimTable)
+        self.assertIs(payload['claims'], payload['users'])
+        self.assertEqual(self.data['categories'], payload['categories'])
+        self.assertEqual(30, len(payload['claims']))
+
+    @override_settings(UPSTREAM_COMPACT_CACHE=True)
+    def test_async_refresh_keeps_compact_payload(self):
+        async def fetch():
+            return self.data
+
+        with patch('App.repositories.afetch_data_from_api', side_effect=fetch):
+            payload = async_to_sync(repositories.arefresh_cached_data)()
+
+        self.assertIsInstance(payload['claims'], ClaimTable)
+        self.assertIs(payload, repositories.get_cached_data())
+
+    @override_settings(UPSTREAM_COMPACT_CACHE=True, UPSTREAM_STREAMING=True)
+    def test_streamed_payload_is_compacted_record_by_record(self):
+        # The users come after the claims, so the departments of the claims are resolved at the end.
+        records = [(resource, record) for resource in ['categories', 'claims', 'departments', 'users']
+                   for record in self.data[resource]]
+
+        with patch('App.repositories.stream_records_from_api', return_value=iter(records)), \
+                patch('App.repositories.fetch_data_from_api') as fetch_data_from_api:
+            payload = repositories.fetch_cached_data_from_api()
+
+        self.assertFalse(fetch_data_from_api.called)
+        self.assertEqual(self.data['departments'], payload['departments'])
+        self.assertEqual(list(self.compact['claims'].departments), list(payload['claims'].departments))
+        self.assertEqual(services.aggregate_dashboard_data(self.compact, self.config),
+                         services.aggregate_dashboard_data(payload, self.config))
+
+    def test_dashboard_data_of_compact_payload(self):
+        expected = services.aggregate_dashboard_data(self.data, self.config)
+        result = services.aggregate_dashboard_data(self.compact, self.config)
+
+        for key in ['last_five_unclosed_claims', 'last_five_closed_claims']:
+            self.assertEqual(self.claim_ids(expected.pop(key)), self.claim_ids(result.pop(key)))
+        self.assertDictEqual(expected, result)
+
+    def test_range_dashboard_data_of_compact_payload(self):
+        start = helpers.parse_timestamp(format_test_datetime(310))
+        end = helpers.parse_timestamp(format_test_datetime(100))
+
+        with patch('App.repositories.fetch_cached_data_from_api', return_value=self.data):
+            expected = services.range_dashboard_data(start, end)
+        with patch('App.repositories.fetch_cached_data_from_api', return_value=self.compact):
+            result = services.range_dashboard_data(start, end)
+
+        for key in ['last_five_unclosed_claims', 'last_five_closed_claims']:
+            self.assertEqual(self.claim_ids(expected.pop(key)), self.claim_ids(result.pop(key)))
+        expected.pop('as_of')
+        result.pop('as_of')
+        self.assertDictEqual(expected, result)
+
+    def test_recent_claims_of_compact_payload(self):
+        for status in ['unclosed', 'closed']:
+            with patch('App.repositories.fetch_cached_data_from_api', return_value=self.data):
+                expected = services.recent_claims_page(status, 2, page_size=4)
+            with patch('App.repositories.fetch_cached_data_from_api', return_value=self.compact):
+                result = services.recent_claims_page(status, 2, page_size=4)
+
+            self.assertEqual(self.claim_ids(expected.pop('results')), self.claim_ids(result.pop('results')))
+            self.assertEqual(expected, result)
+
+
+@skipUnless(kernels.np is not None, "NumPy is not installed")
+class KernelsTest(TestCase):
+    def compute_statistics(self, numpy_enabled):
+        with patch.object(kernels, 'ENABLED', numpy_enabled):
+            self.assertEqual(numpy_enabled, kernels.available())
+            table = ClaimTable.from_payload(self.data)
+            published = table.published()
+            statistics = {
+                'rows': [list(map(int, view.row_indexes())) for view in
+                         [published, table.closed(), table.unclosed(), published.where(tables.STARTED, tables.ENDED)]],
+                'distinct': [published.distinct_count(table.employees), table.distinct_count(table.departments)],
+                'categories': [published.category_counts(), table.closed().category_counts()],
+                'between': [published.count_between('publish_date', self.now - 100 * helpers.MICROSECONDS_PER_HOUR,
+                                                    self.now),
+                            table.closed().count_between('close_date', 0, self.now)],
+                'sorted': [published.sorted_timestamps('publish_date'), table.sorted_timestamps('close_date')],
+                'months': [published.month_counts('publish_date', helpers.month_range(0, self.now)),
+                           table.month_counts('close_date', helpers.month_range())],
+                'means': [table.started().mean_delta('publish_date', 'start_date'),
+                          table.ended().mean_delta('publish_date', 'end_date'),
+                          table.closed().where(tables.CLOSED, tables.CLOSED).mean_delta('publish_date', 'end_date')],
+                'dashboard': services.table_dashboard_data(table, self.data['categories'], 5, self.config),
+                'order': [list(map(int, published.sorted_rows(table.publish_dates))),
+                          list(map(int, table.unclosed().sorted_rows(table.ids, descending=True)))],
+                'recent': [list(RecentClaimsIndex(table).claims(status)) for status in ['unclosed', 'closed']],
+            }
+            range_index = ClaimsRangeIndex(table, last_claims_count=3)
+            response_sketch, ending_sketch, unclosed, closed = range_index.summary()
+            statistics['range'] = [list(range_index.claims), range_index.response_time_prefix,
+                                   range_index.ending_time_prefix, range_index.closed_prefix,
+                                   range_index.category_counts(closed=True), range_index.employees_count(),
+                                   response_sketch.to_dict(), ending_sketch.to_dict(), unclosed, closed]
+        return statistics
+
+    def setUp(self):
+        self.data = build_test_payload()
+        # Add claims of the previous years, with dates far apart, to check month and delta computations.
+        for i, year in enumerate([1999, 2010, 2021]):
+            self.data['claims'].append({
+                'id': 100 + i, 'message': 'old', 'category': 9, 'employee': None, 'status': 'finish',
+                'publish_date': f'{year}-0{i + 1}-15T10:00:00Z', 'start_date': f'{year}-12-31T23:59:59.5Z',
+                'end_date': f'{year + 20}-06-01T00:00:00Z', 'close_date': None, 'close': False,
+            })
+        self.config = Configuration(total_employees=12, total_units=4, performance_hours_offset=200)
+        self.now = helpers.current_timestamp()
+
+    def test_numpy_kernels_match_python_implementation(self):
+        python_statistics = self.compute_statistics(numpy_enabled=False)
+        numpy_statistics = self.compute_statistics(numpy_enabled=True)
+
+        self.assertEqual(python_statistics, numpy_statistics)
+
+    def test_argsort_keeps_the_order_of_equal_values(self):
+        table = ClaimTable()
+        for claim_id in [3, 1, 3, 2, 1]:
+            table.add_claim({'id': claim_id})
+
+        for numpy_enabled in [False, True]:
+            with patch.object(kernels, 'ENABLED', numpy_enabled):
+                self.assertEqual([1, 4, 3, 0, 2], list(map(int, table.sorted_rows(table.ids))))
+                self.assertEqual([0, 2, 3, 1, 4], list(map(int, table.sorted_rows(table.ids, descending=True))))
+                self.assertEqual([2, 0, 3, 4, 1], list(map(int, table.view([4, 3, 2, 1, 0]).sorted_rows(
+                    table.ids, descending=True))))
+
+    def test_kernels_on_empty_table(self):
+        table = ClaimTable.from_payload({'claims': [], 'users': []})
+
+        self.assertEqual(0, len(table.published()))
+        self.assertEqual(0, table.distinct_count(table.employees))
+        months = range(helpers.month_index(2023, 1), helpers.month_index(2024, 1))
+        self.assertEqual([0] * 12, table.month_counts('publish_date', months))
+        self.assertEqual(timedelta(), table.ended().mean_delta('publish_date', 'end_date'))
+
+
 class HelpersTest(TestCase):
+    def test_top_n_by_key(self):
+        the_list = [{'id': i % 7, 'position': i} for i in range(20)]
+        original = copy.deepcopy(the_list)
+
+        self.assertEqual(helpers.sort_by_key(copy.deepcopy(the_list))[0:5], helpers.top_n_by_key(the_list))
+        self.assertEqual(helpers.sort_by_key(copy.deepcopy(the_list), 'position', desc=False)[0:3],
+                         helpers.top_n_by_key(the_list, 3, 'position', desc=False))
+        self.assertEqual(original, the_list)
+
+    def test_top_n_by_key_with_key_function(self):
+        values = [3, 9, 1, 9, 4]
+
+        self.assertEqual([1, 3, 4], helpers.top_n_by_key(range(len(values)), 3, values.__getitem__))
+        self.assertEqual([2, 0], helpers.top_n_by_key(range(len(values)), 2, values.__getitem__, desc=False))
+
     def test_format_percentage(self):
         self.assertEqual('33.33', helpers.format_percentage(33.33))
         self.assertEqual('33', helpers.format_percentage(33.0))
@@ -279,9 +1991,53 @@ class HelpersTest(TestCase):
         ]
 
         # Assuming the 'publish_date' attribute exists in each object
-        data = helpers.group_data_by_month(published_claims, 'publish_date')
+        data = helpers.group_data_by_month(published_claims, 'publish_date',
+                                           end_timestamp=helpers.parse_timestamp('2023-12-31T23:59:59Z'))
         self.assertEqual('Jan', list(data.keys())[0])
         self.assertEqual(3, data['Jan'])
+        self.assertEqual(12, len(data))
+
+    def test_group_data_by_month_over_several_years(self):
+        published_claims = [
+            {'publish_date': '2022-11-30T23:59:59.999999Z'},
+            {'publish_date': '2022-12-01T00:00:00Z'},
+            {'publish_date': '2023-01-15T10:00:00Z'},
+            {'publish_date': '2023-01-31T23:59:59Z'},
+            {'publish_date': '2023-03-01T00:00:00Z'},
+            {'publish_date': '2023-03-01T00:00:00+01:00'},
+        ]
+
+        data = helpers.group_data_by_month(published_claims, 'publish_date',
+                                           helpers.parse_timestamp('2022-12-10T00:00:00Z'),
+                                           helpers.parse_timestamp('2023-02-28T23:59:59Z'))
+
+        # Dates before the first month and after the last month are ignored.
+        self.assertEqual({'Dec 2022': 1, 'Jan 2023': 2, 'Feb 2023': 1}, data)
+
+    def test_parse_date_range(self):
+        self.assertEqual((None, None), helpers.parse_date_range('', None))
+        self.assertEqual((helpers.parse_timestamp('2024-01-01T00:00:00Z'),
+                          helpers.parse_timestamp('2024-01-31T23:59:59.999999Z')),
+                         helpers.parse_date_range('2024-01-01', '2024-01-31'))
+        self.assertEqual((helpers.parse_timestamp('2024-01-01T10:00:00Z'), None),
+                         helpers.parse_date_range('2024-01-01T12:00:00+02:00', None))
+
+        for start, end in [('2024-02-01', '2024-01-31'), ('2024-13-01', None), ('today', None)]:
+            with self.assertRaises(ValueError):
+                helpers.parse_date_range(start, end)
+
+    def test_month_range(self):
+        months = helpers.month_range(helpers.parse_timestamp('2021-11-01T00:00:00Z'),
+                                     helpers.parse_timestamp('2022-02-01T00:00:00Z'))
+
+        self.assertEqual(['Nov 2021', 'Dec 2021', 'Jan 2022', 'Feb 2022'], helpers.month_labels(months))
+        self.assertEqual(helpers.parse_timestamp('2021-11-01T00:00:00Z'), helpers.month_index_timestamp(months[0]))
+        self.assertEqual(helpers.parse_timestamp('2022-03-01T00:00:00Z'), helpers.month_index_timestamp(months[-1] + 1))
+
+        # By default, the range covers the current year up to the current month.
+        current_month = datetime.now(timezone.utc).month
+        self.assertEqual([calendar.month_abbr[month] for month in range(1, current_month + 1)],
+                         helpers.current_year_month_keys())
 
     """
        Test case for the 'sub_hours_from_datetime' function.
@@ -359,6 +2115,35 @@ class HelpersTest(TestCase):
         # Check if the result returned by the function matches the expected result.
         self.assertEqual(date_obj, expected_date_obj)
 
+    def test_parse_string_datetime_with_offset(self):
+        date_obj = helpers.parse_string_datetime('2023-08-03T14:34:56.789+02:00')
+
+        self.assertEqual(datetime(2023, 8, 3, 12, 34, 56, 789000), date_obj)
+
+    def test_parse_timestamp(self):
+        self.assertEqual(0, helpers.parse_timestamp('1970-01-01T00:00:00Z'))
+        self.assertEqual(1690900405557503, helpers.parse_timestamp('2023-08-01T14:33:25.557503Z'))
+        self.assertEqual(helpers.parse_timestamp('2023-08-01T14:33:25Z'),
+                         helpers.parse_timestamp('2023-08-01T16:33:25+02:00'))
+
+        for invalid in ['2023-08-03 12:34:56', '2023-13-03T12:34:56Z', '2023-08-03T12:34:56.Z', '', None]:
+            with self.assertRaises(ValueError):
+                helpers.parse_timestamp(invalid)
+
+    def test_parse_timestamp_fractions(self):
+        # Fractions of any number of digits are accepted, whatever the version of Python.
+        second = helpers.parse_timestamp('2023-08-01T14:33:25Z')
+        self.assertEqual(second + 500000, helpers.parse_timestamp('2023-08-01T14:33:25.5Z'))
+        self.assertEqual(second + 120000, helpers.parse_timestamp('2023-08-01T14:33:25.12Z'))
+        self.assertEqual(second + 123456, helpers.parse_timestamp('2023-08-01T14:33:25.123456789Z'))
+        self.assertEqual(second + 500000 - 2 * 3600 * 1000000,
+                         helpers.parse_timestamp('2023-08-01T14:33:25.5+02:00'))
+        self.assertEqual(second + 120000, helpers.parse_timestamp('2023-08-01T14:33:25.12'))
+
+    def test_timestamp_month(self):
+        self.assertEqual(1, helpers.timestamp_month(helpers.parse_timestamp('2023-01-31T23:59:59.999999Z')))
+        self.assertEqual(2, helpers.timestamp_month(helpers.parse_timestamp('2023-02-01T00:00:00Z')))
+
     def test_parse_string_datetime_invalid_format(self):
         # Test data: an invalid datetime string that does not match any of the formats.
         date_str = '2023-08-03 12:34:56'
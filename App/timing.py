@@ -0,0 +1,180 @@
+import functools
+import json
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from App.metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Durations of the stages timed during the current request, as {name: [total seconds, calls]}, or None when the
+# timings are not collected.
+_timings = ContextVar('timings', default=None)
+
+
+@contextmanager
+def timed(name):
+    """
+    Time a stage of the current request.
+
+    Parameters:
+        name (str): The name of the stage (e.g. 'fetch', 'aggregate', 'render'), used as the Server-Timing metric
+                    name. The durations of the stages sharing a name are summed.
+
+    When no timings are collected (the 'SERVER_TIMING' setting is off, or the code does not run in a request)
+    and the 'METRICS_ENABLED' setting is off, the stage is not timed, so the instrumentation costs a context
+    variable lookup. With 'METRICS_ENABLED', every duration is also observed by the 'dashboard_stage_seconds'
+    histogram of the '/metrics' endpoint, including the stages run outside of a request.
+
+    The timings are shared with the threads running 'sync_to_async' functions and with the tasks started by
+    the request, which copy the context of the request. Threads started with a 'ThreadPoolExecutor' do not, so
+    their stages are timed by the caller.
+    """
+    timings = _timings.get()
+    observed = settings.METRICS_ENABLED
+    if timings is None and not observed:
+        yield
+        return
+
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started_at
+        if timings is not None:
+            record(timings, name, seconds)
+        if observed:
+            STAGE_SECONDS.observe(seconds, stage=name)
+
+
+def timed_function(name=None):
+    """
+    Decorate a function to time each of its calls as a stage, see 'timed()'.
+
+    Parameters:
+        name (str): The name of the stage. Default is the name of the function.
+    """
+    def decorator(fn):
+        stage = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def record(timings, name, seconds):
+    """
+    Add the duration of a call of a stage to the timings.
+    """
+    entry = timings.get(name)
+    if entry is None:
+        timings[name] = [seconds, 1]
+    else:
+        entry[0] += seconds
+        entry[1] += 1
+
+
+def start_collecting():
+    """
+    Start collecting the timings of the stages run in the current context.
+
+    Returns:
+        tuple: The (token, timings) to pass to 'stop_collecting()'.
+    """
+    timings = {}
+    return _timings.set(timings), timings
+
+
+def stop_collecting(token):
+    """
+    Stop collecting the timings started with the token of 'start_collecting()'.
+    """
+    _timings.reset(token)
+
+
+def server_timing_header(timings):
+    """
+    Format timings as the value of a 'Server-Timing' header.
+
+    Parameters:
+        timings (dict): The timings, as {name: [total seconds, calls]}.
+
+    Returns:
+        str: The metrics separated by commas, e.g. 'fetch;dur=120.5;desc="1 call", render;dur=8.2;desc="1 call"',
+             with the durations in milliseconds.
+    """
+    return ', '.join(f'{name};dur={seconds * 1000:.1f};desc="{calls} call{"s" if calls > 1 else ""}"'
+                     for name, (seconds, calls) in timings.items())
+
+
+class ServerTimingMiddleware:
+    """
+    Middleware timing the stages of each request, with the 'SERVER_TIMING' setting.
+
+    The duration of the request ('total') and of each stage timed with 'timed()' or 'timed_function()' are sent
+    in the 'Server-Timing' header of the response, shown by the network panel of the browsers, and logged as a
+    structured JSON line by the 'App.timing' logger. The middleware supports both synchronous and asynchronous
+    views, so the asynchronous dashboard view is not run in a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        if not settings.SERVER_TIMING:
+            return self.get_response(request)
+
+        token, timings = start_collecting()
+        started_at = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            stop_collecting(token)
+
+        return self.emit(request, response, timings, time.perf_counter() - started_at)
+
+    async def __acall__(self, request):
+        if not settings.SERVER_TIMING:
+            return await self.get_response(request)
+
+        token, timings = start_collecting()
+        started_at = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stop_collecting(token)
+
+        return self.emit(request, response, timings, time.perf_counter() - started_at)
+
+    @staticmethod
+    def emit(request, response, timings, total_seconds):
+        record(timings, 'total', total_seconds)
+        response['Server-Timing'] = server_timing_header(timings)
+
+        logger.info(json.dumps({
+            'event': 'request_timings',
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'stages': {name: {'ms': round(seconds * 1000, 3), 'calls': calls}
+                       for name, (seconds, calls) in timings.items()},
+        }))
+        return response
@@ -1,35 +1,72 @@
 import json
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import BadRequest
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import render, redirect
 
-from App.services import dashboard_data, save_or_update_configuration, init_configuration_form, dashboard_fake_data
+from App.helpers import parse_date_range
+from App.repositories import aget_configuration
+from App.timing import timed
+from App.services import alatest_dashboard_data, save_or_update_configuration, init_configuration_form, \
+    dashboard_fake_data, recent_claims_page, range_dashboard_data, collect_metrics
 
 
-def dashboard_view(request):
+async def dashboard_view(request):
     """
     Generate and render the dashboard view.
 
     Args:
-        request (HttpRequest): The HTTP request object.
+        request (HttpRequest): The HTTP request object, with optional 'from' and 'to' query parameters (dates such
+                               as '2024-01-31' or ISO 8601 date-times) selecting the date range of the dashboard.
 
     Returns:
         HttpResponse: The rendered dashboard view.
 
-    The function generates the data required for the dashboard using the 'dashboard_data()' function from the 'services' module.
+    Raises:
+        BadRequest: If the date range is invalid.
+
+    The function reads the data required for the dashboard using the 'alatest_dashboard_data()' function from the
+    'services' module, which serves the latest snapshot materialized by the 'refresh_dashboard' command when it is
+    recent enough.
+    The view is asynchronous: under ASGI, waiting for the database or the API does not hold a worker thread, so a
+    single process serves many requests to a slow API at the same time.
+    When a date range is selected, the statistics of the claims published in the range are computed by the
+    'range_dashboard_data()' function instead, from indexes built once per API payload. The configuration is
+    read with the asynchronous ORM API, and the statistics are computed in a worker thread of their own, so a
+    slow API or a large index does not hold up the other requests.
     If the data is available, it renders the 'dashboard.html' template with the context containing the dashboard data and
     JSON-encoded data for the bar chart and line chart visualizations.
     If the data is not available, it redirects the user to the 'config_form' view to provide the necessary configuration data.
     """
-    # Generate the dashboard data using the 'dashboard_data()' function.
-    data = dashboard_data()
+    range_from = request.GET.get('from', '')
+    range_to = request.GET.get('to', '')
+
+    if range_from or range_to:
+        # Compute the dashboard data of the selected date range.
+        try:
+            start_timestamp, end_timestamp = parse_date_range(range_from, range_to)
+        except ValueError:
+            raise BadRequest("Invalid date range")
+        with timed('configuration'):
+            config = await aget_configuration()
+        data = await sync_to_async(range_dashboard_data, thread_sensitive=False)(
+            start_timestamp, end_timestamp, config) if config else None
+    else:
+        # Read the dashboard data using the 'alatest_dashboard_data()' function.
+        data = await alatest_dashboard_data()
 
     if data:
         # If data is available, render the 'dashboard.html' template with the dashboard data and JSON-encoded chart data.
-        return render(request, 'dashboard.html', {
-            'ctx': data,
-            'bar_chart': json.dumps(data['bar_chart']),
-            'line_chart': json.dumps(data['line_chart'])
-        })
+        with timed('render'):
+            return render(request, 'dashboard.html', {
+                'ctx': data,
+                'range_from': range_from,
+                'range_to': range_to,
+                'bar_chart': json.dumps(data['bar_chart']),
+                'line_chart': json.dumps(data['line_chart'])
+            })
     else:
         # If data is not available, redirect the user to the 'config_form' view to provide configuration data.
         return redirect('config_form')
@@ -64,3 +101,53 @@ def config_form_view(request):
 
     # Render the 'config_form.html' template with the form data.
     return render(request, 'config_form.html', {'form': form})
+
+
+def recent_claims_view(request, status):
+    """
+    Return a page of the most recent unclosed or closed claims as JSON.
+
+    Args:
+        request (HttpRequest): The HTTP request object, with optional 'page' and 'page_size' query parameters.
+        status (str): 'unclosed' or 'closed'.
+
+    Returns:
+        JsonResponse: The claims of the page and the pagination information.
+
+    Raises:
+        Http404: If the status is unknown.
+
+    The claims are read from a sorted index built once per API payload by the 'recent_claims_page()' function
+    from the 'services' module, so paging does not sort the claims again.
+    """
+    if status not in ('unclosed', 'closed'):
+        raise Http404("Unknown claims status")
+
+    try:
+        page_size = int(request.GET.get('page_size', 0))
+    except ValueError:
+        page_size = 0
+
+    return JsonResponse(recent_claims_page(status, request.GET.get('page', 1), page_size))
+
+
+def metrics_view(request):
+    """
+    Expose the metrics of the dashboard internals for Prometheus.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        HttpResponse: The metrics in the Prometheus text exposition format.
+
+    Raises:
+        Http404: If the 'METRICS_ENABLED' setting is off.
+
+    The metrics are rendered by the 'collect_metrics()' function from the 'services' module. They are kept in the
+    memory of each worker process, so each worker is scraped as its own instance.
+    """
+    if not settings.METRICS_ENABLED:
+        raise Http404("Metrics are disabled")
+
+    return HttpResponse(collect_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'App.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -131,6 +132,101 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 env = environ.Env()
 environ.Env.read_env()
 
+# Cache shared by the worker processes (e.g. 'rediscache://127.0.0.1:6379/1'), in-process memory by default
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://')
+}
+
+# Seconds a worker waits for another worker computing the same dashboard, 0 to coalesce in-process only
+SINGLE_FLIGHT_SHARED_TIMEOUT = env.float('SINGLE_FLIGHT_SHARED_TIMEOUT', default=0)
+
+# Seconds a worker serves the configuration it holds in memory before reading it again from the database. Saving
+# the configuration invalidates the copies of the workers sharing the cache at once, this bounds the staleness of the
+# others (e.g. with the default in-process cache) and of the updates made without the model signals
+CONFIGURATION_CACHE_TTL = env.float('CONFIGURATION_CACHE_TTL', default=30)
+
+# Upstream API HTTP client: connection pool size, timeouts (in seconds) and retry policy
+UPSTREAM_POOL_SIZE = env.int('UPSTREAM_POOL_SIZE', default=10)
+UPSTREAM_CONNECT_TIMEOUT = env.float('UPSTREAM_CONNECT_TIMEOUT', default=3.05)
+UPSTREAM_READ_TIMEOUT = env.float('UPSTREAM_READ_TIMEOUT', default=30)
+UPSTREAM_MAX_RETRIES = env.int('UPSTREAM_MAX_RETRIES', default=3)
+UPSTREAM_RETRY_BACKOFF = env.float('UPSTREAM_RETRY_BACKOFF', default=0.5)
+
+# Separate endpoints of the resources of the API payload, called concurrently by the asynchronous dashboard.
+# The resources without an endpoint of their own are read from the payload of BASE_URL.
+UPSTREAM_RESOURCE_URLS = {
+    'claims': env.str('UPSTREAM_CLAIMS_URL', default=''),
+    'users': env.str('UPSTREAM_USERS_URL', default=''),
+    'categories': env.str('UPSTREAM_CATEGORIES_URL', default=''),
+    'departments': env.str('UPSTREAM_DEPARTMENTS_URL', default=''),
+}
+
+# Pagination of the resource endpoints: '' (not paginated), 'page' (numbered pages, fetched concurrently by up to
+# UPSTREAM_PAGE_WORKERS workers) or 'cursor' (each page gives the URL of the next one in 'next')
+UPSTREAM_PAGINATION = env.str('UPSTREAM_PAGINATION', default='')
+UPSTREAM_PAGE_SIZE = env.int('UPSTREAM_PAGE_SIZE', default=500)
+UPSTREAM_PAGE_PARAM = env.str('UPSTREAM_PAGE_PARAM', default='page')
+UPSTREAM_PAGE_SIZE_PARAM = env.str('UPSTREAM_PAGE_SIZE_PARAM', default='page_size')
+UPSTREAM_PAGE_WORKERS = env.int('UPSTREAM_PAGE_WORKERS', default=4)
+
+# Decode the API payload while it is received when refreshing the dashboard snapshots (and the cached payload, with
+# UPSTREAM_COMPACT_CACHE), instead of loading it whole, reading the responses in chunks of UPSTREAM_STREAM_CHUNK_SIZE
+# bytes
+UPSTREAM_STREAMING = env.bool('UPSTREAM_STREAMING', default=False)
+UPSTREAM_STREAM_CHUNK_SIZE = env.int('UPSTREAM_STREAM_CHUNK_SIZE', default=64 * 1024)
+
+# Seconds during which the API payload is served from the cache without being refreshed
+UPSTREAM_CACHE_TTL = env.int('UPSTREAM_CACHE_TTL', default=60)
+
+# Keep the cached API payload in its compact form, the claims and users being stored in a ClaimTable
+UPSTREAM_COMPACT_CACHE = env.bool('UPSTREAM_COMPACT_CACHE', default=False)
+
+# Dashboard snapshots: maximum age in seconds of a snapshot served by the dashboard, and number of versions kept
+DASHBOARD_SNAPSHOT_MAX_AGE = env.int('DASHBOARD_SNAPSHOT_MAX_AGE', default=600)
+DASHBOARD_SNAPSHOTS_KEPT = env.int('DASHBOARD_SNAPSHOTS_KEPT', default=10)
+
+# Number of categories shown by the categories distribution of the dashboard, the others are summed up
+DASHBOARD_TOP_CATEGORIES = env.int('DASHBOARD_TOP_CATEGORIES', default=10)
+
+# Last claims lists of the dashboard: number of claims and key they are selected on (highest first)
+DASHBOARD_LAST_CLAIMS_COUNT = env.int('DASHBOARD_LAST_CLAIMS_COUNT', default=5)
+DASHBOARD_LAST_CLAIMS_KEY = env.str('DASHBOARD_LAST_CLAIMS_KEY', default='id')
+
+# Offsets in hours of the performance curve of the dashboard (last 24 hours, 48 hours, 7 days and 30 days)
+DASHBOARD_PERFORMANCE_OFFSETS = env.list('DASHBOARD_PERFORMANCE_OFFSETS', cast=int, default=[24, 48, 168, 720])
+
+# Percentiles of the response and solving times shown by the dashboard, estimated with quantile sketches keeping
+# about QUANTILE_SKETCH_SIZE durations each
+DASHBOARD_TIME_PERCENTILES = env.list('DASHBOARD_TIME_PERCENTILES', cast=int, default=[50, 90, 99])
+QUANTILE_SKETCH_SIZE = env.int('QUANTILE_SKETCH_SIZE', default=200)
+
+# Default and maximum number of claims per page of the recent claims endpoints
+RECENT_CLAIMS_PAGE_SIZE = env.int('RECENT_CLAIMS_PAGE_SIZE', default=20)
+RECENT_CLAIMS_MAX_PAGE_SIZE = env.int('RECENT_CLAIMS_MAX_PAGE_SIZE', default=100)
+
+# Claims synchronized into the local store by the 'sync_claims' command: rows upserted per statement, field of the
+# claims used as the sync cursor, and query parameter sending the cursor to the API
+SYNC_BATCH_SIZE = env.int('SYNC_BATCH_SIZE', default=500)
+SYNC_WATERMARK_FIELD = env.str('SYNC_WATERMARK_FIELD', default='updated_at')
+UPSTREAM_SYNC_PARAM = env.str('UPSTREAM_SYNC_PARAM', default='updated_after')
+
+# Source of the dashboard statistics: 'api' computes them from the API payload, 'store' from the synchronized claims
+# (and pages the recent claims from them). The statistics of a date range are always computed from the API payload
+DASHBOARD_SOURCE = env.str('DASHBOARD_SOURCE', default='api')
+
+# Counting of the distinct activated employees and units: 'exact' with sets, or 'hll' with HyperLogLog sketches of
+# 2 ** HLL_PRECISION registers (about 0.8% of error with the default precision), for very large datasets
+DISTINCT_COUNT_MODE = env.str('DISTINCT_COUNT_MODE', default='exact')
+HLL_PRECISION = env.int('HLL_PRECISION', default=14)
+
+# Time the stages of each request (upstream calls, JSON decoding, aggregation, KPI functions, rendering) and send
+# them in the 'Server-Timing' header of the responses and in the logs of the 'App.timing' logger
+SERVER_TIMING = env.bool('SERVER_TIMING', default=False)
+
+# Expose the counters and histograms of the dashboard internals (upstream calls, payload cache, snapshot age, stage
+# and KPI durations, claims per computation) in the Prometheus text format at '/metrics'
+METRICS_ENABLED = env.bool('METRICS_ENABLED', default=False)
+
 TAILWIND_APP_NAME = 'theme'
 
 INTERNAL_IPS = [
@@ -17,11 +17,13 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 
-from App.views import dashboard_view, config_form_view
+from App.views import dashboard_view, config_form_view, recent_claims_view, metrics_view
 
 urlpatterns = [
     path('', dashboard_view, name='dashboard'),
     path('config/', config_form_view, name='config_form'),
+    path('claims/<str:status>/', recent_claims_view, name='recent_claims'),
+    path('metrics', metrics_view, name='metrics'),
     path('admin/', admin.site.urls),
 
     path("__reload__/", include("django_browser_reload.urls")),